@@ -12,6 +12,13 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Hugging Face Configuration
 HUGGINGFACE_API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
 
+# LLM provider: "live" (Gemini / Hugging Face) or "stub" (local deterministic stand-in for load tests and CI)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "live").lower()
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "800"))  # median time to the first token
+LLM_STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0.5"))  # log-normal spread of that latency (0 = fixed)
+LLM_STUB_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "60"))  # generation rate after the first token (0 = instant)
+LLM_STUB_RESPONSE_TOKENS = int(os.getenv("LLM_STUB_RESPONSE_TOKENS", "250"))  # words per stub response
+
 # File Upload Settings
 UPLOAD_DIR = "static"
 ALLOWED_PDF_EXTENSIONS = {".pdf"}
@@ -29,3 +36,58 @@ DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL", "mysql+mysqldb://root:passwo
 SECRET_KEY = os.getenv("secret_key", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("algorithm", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("access_token_expire_minutes", "1440"))
+
+# RAG Indexing Job Queue
+# Uploads enqueue an IndexJob row; `python worker.py` claims and runs them.
+INDEX_WORKER_POLL_INTERVAL = float(os.getenv("INDEX_WORKER_POLL_INTERVAL", "2.0"))  # seconds between queue polls
+INDEX_JOB_STALE_AFTER = int(os.getenv("INDEX_JOB_STALE_AFTER", "1800"))  # RUNNING jobs silent this long are requeued
+INDEX_JOB_MAX_ATTEMPTS = int(os.getenv("INDEX_JOB_MAX_ATTEMPTS", "3"))
+
+# RAG Ingestion Settings
+RAG_VECTORSTORE_DIR = os.getenv("RAG_VECTORSTORE_DIR", os.path.join(UPLOAD_DIR, "vectordb"))  # Chroma persistence
+RAG_CHROMA_HOST = os.getenv("RAG_CHROMA_HOST", "")  # Chroma server shared by the API and index workers (empty = embedded)
+RAG_CHROMA_PORT = int(os.getenv("RAG_CHROMA_PORT", "8001"))
+RAG_SINGLE_COLLECTION = os.getenv("RAG_SINGLE_COLLECTION", "false").lower() == "true"  # all books in one collection, filtered by book_id
+RAG_LIBRARY_COLLECTION = os.getenv("RAG_LIBRARY_COLLECTION", "library")  # collection name in single-collection mode
+RAG_EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+RAG_EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
+RAG_EMBEDDING_QUANTIZATION = os.getenv("RAG_EMBEDDING_QUANTIZATION", "avx2")  # onnx-int8 kernels: arm64 | avx2 | avx512 | avx512_vnni
+RAG_EMBEDDING_PARITY_CHECK = os.getenv("RAG_EMBEDDING_PARITY_CHECK", "false").lower() == "true"  # compare ONNX output to PyTorch at startup
+RAG_EMBEDDING_PARITY_TOLERANCE = float(os.getenv("RAG_EMBEDDING_PARITY_TOLERANCE", "0.02"))  # min cosine = 1 - tolerance
+RAG_EMBEDDING_CACHE_ENABLED = os.getenv("RAG_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+RAG_EMBEDDING_CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE_PATH", os.path.join(UPLOAD_DIR, "embedding_cache", "embeddings.sqlite3"))
+RAG_EXTRACT_WORKERS = int(os.getenv("RAG_EXTRACT_WORKERS", str(os.cpu_count() or 1)))  # PDF extraction processes
+RAG_EXTRACT_PAGES_PER_TASK = int(os.getenv("RAG_EXTRACT_PAGES_PER_TASK", "0"))  # 0 = auto-size page ranges
+RAG_EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", "0"))  # >1: embedding process pool during ingestion (one model copy each)
+RAG_EMBED_THREADS_PER_WORKER = int(os.getenv("RAG_EMBED_THREADS_PER_WORKER", "0"))  # 0 = cores / workers
+RAG_EMBED_SHARD_SIZE = int(os.getenv("RAG_EMBED_SHARD_SIZE", "64"))  # max texts per pool task
+RAG_INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "256"))  # chunks embedded + upserted per batch (bounds peak memory)
+RAG_NEAR_DEDUP_ENABLED = os.getenv("RAG_NEAR_DEDUP_ENABLED", "true").lower() == "true"
+RAG_NEAR_DEDUP_THRESHOLD = float(os.getenv("RAG_NEAR_DEDUP_THRESHOLD", "0.9"))  # estimated Jaccard similarity of word shingles
+RAG_NEAR_DEDUP_NUM_PERM = int(os.getenv("RAG_NEAR_DEDUP_NUM_PERM", "128"))  # MinHash permutations
+RAG_BOILERPLATE_FILTER_ENABLED = os.getenv("RAG_BOILERPLATE_FILTER_ENABLED", "true").lower() == "true"
+RAG_BOILERPLATE_BAND_LINES = int(os.getenv("RAG_BOILERPLATE_BAND_LINES", "3"))  # top/bottom lines per page inspected
+RAG_BOILERPLATE_MIN_PAGE_FRACTION = float(os.getenv("RAG_BOILERPLATE_MIN_PAGE_FRACTION", "0.5"))  # repeat on >= this share of pages
+RAG_PAGE_STAGE_WINDOW = int(os.getenv("RAG_PAGE_STAGE_WINDOW", "50"))  # pages per cross-page stage window
+RAG_VECTORSTORE_CACHE_SIZE = int(os.getenv("RAG_VECTORSTORE_CACHE_SIZE", "128"))  # open per-book Chroma handles kept (LRU)
+RAG_QUERY_THREADS = int(os.getenv("RAG_QUERY_THREADS", "8"))  # threads for query-time embedding + vector search
+RAG_LLM_MAX_CONCURRENCY = int(os.getenv("RAG_LLM_MAX_CONCURRENCY", "16"))  # outstanding LLM calls per API process
+RAG_SEMANTIC_CACHE_ENABLED = os.getenv("RAG_SEMANTIC_CACHE_ENABLED", "true").lower() == "true"  # reuse answers of paraphrased questions
+RAG_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.95"))  # min question cosine similarity
+RAG_SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SEMANTIC_CACHE_MAX_ENTRIES", "100"))  # questions kept per book and num_chunks
+RAG_SINGLE_FLIGHT_ENABLED = os.getenv("RAG_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"  # one LLM call per identical in-flight question
+RAG_SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("RAG_SINGLE_FLIGHT_LOCK_TTL", "120"))  # seconds; also the longest a waiter waits
+RAG_SINGLE_FLIGHT_POLL_MS = int(os.getenv("RAG_SINGLE_FLIGHT_POLL_MS", "100"))  # waiters re-check the answer cache this often
+RAG_HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "false").lower() == "true"  # fuse BM25 with MMR vector search (RRF)
+RAG_LEXICAL_INDEX_DIR = os.getenv("RAG_LEXICAL_INDEX_DIR", os.path.join(UPLOAD_DIR, "lexical_index"))  # per-book BM25 indexes
+RAG_HYBRID_RRF_K = int(os.getenv("RAG_HYBRID_RRF_K", "60"))  # reciprocal rank fusion constant
+RAG_LEXICAL_CACHE_SIZE = int(os.getenv("RAG_LEXICAL_CACHE_SIZE", "32"))  # BM25 indexes kept in memory (LRU)
+RAG_PASSAGE_CACHE_SIZE = int(os.getenv("RAG_PASSAGE_CACHE_SIZE", "1024"))  # cached /passages results (LRU)
+RAG_PASSAGE_CACHE_TTL = int(os.getenv("RAG_PASSAGE_CACHE_TTL", "300"))  # seconds a cached /passages result is served
+RAG_BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "50"))  # questions per batch query request
+RAG_BATCH_LLM_CONCURRENCY = int(os.getenv("RAG_BATCH_LLM_CONCURRENCY", "4"))  # LLM calls in flight per batch request
+RAG_MULTI_BOOK_MAX_BOOKS = int(os.getenv("RAG_MULTI_BOOK_MAX_BOOKS", "10"))  # books one multi-book query may fan out to
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "2000"))  # max prompt context tokens per answer (0 = no limit)
+CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE_ENABLED", "true").lower() == "true"  # in-process tier in front of Redis for summary / Q&A / audio
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # per API process
+CONTENT_CACHE_TTL = int(os.getenv("CONTENT_CACHE_TTL", "300"))  # seconds an in-process copy is served (backstop for lost invalidations)
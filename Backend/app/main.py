@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routes import auth, admin_books, student_books, student_generation, borrow, rag, otp
+from app.services.index_jobs import create_index_job_table, resume_inline_jobs
 import os
 import logging
 import cProfile
@@ -74,6 +75,16 @@ app.include_router(rag.router)
 app.include_router(otp.router)
 
 
+@app.on_event("startup")
+def start_index_jobs():
+    """
+    Create the indexing job table if needed; without a Chroma server, indexing jobs run in this
+    process, so pick up any left queued
+    """
+    create_index_job_table()
+    resume_inline_jobs()
+
+
 @app.get("/")
 def root():
     """Root endpoint"""
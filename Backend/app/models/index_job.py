@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Float
+from datetime import datetime, timezone
+import enum
+from app.config.database import Base
+
+
+class IndexJobStatus(str, enum.Enum):
+    """RAG indexing job status enumeration"""
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class IndexJob(Base):
+    """Durable queue entry for background RAG indexing of a book PDF"""
+    __tablename__ = "rag_index_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    book_id = Column(Integer, ForeignKey('books.book_id', ondelete='CASCADE'), nullable=False, index=True)
+    pdf_path = Column(String(500), nullable=False)
+
+    # Progress tracking
+    status = Column(Enum(IndexJobStatus), default=IndexJobStatus.QUEUED, nullable=False, index=True)
+    stage = Column(String(50), nullable=True)  # e.g. "loading", "chunking", "embedding"
+    progress = Column(Float, default=0.0, nullable=False)  # 0.0 - 1.0
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    stats_json = Column(Text, nullable=True)  # process_pdf result on success
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
@@ -7,6 +7,7 @@ from app.schemas.book_schemas import BookResponseSchema, BookCreateSchema, BookU
 from app.models.books import Books
 from app.models.admin import Admin
 from app.services.rag_service import rag_service
+from app.services.index_jobs import enqueue_index_job, serialize_index_job
 from app.services.auth import get_current_admin
 
 
@@ -40,7 +41,7 @@ def list_all_books(
     return books_list
 
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
 def create_book(
     title: str = Form(...),
     author: str = Form(...),
@@ -55,7 +56,8 @@ def create_book(
     Create a new book with full processing:
     - Uploads PDF and cover image
     - Generates summary, Q&A, podcast script, and audio (static content)
-    - Indexes PDF for RAG chat (vector embeddings)
+    - Queues the PDF for RAG indexing (vector embeddings) and returns 202 with the job
+    - Poll `index_job.status_url` for indexing progress
     
     Categories should be comma-separated (e.g., "Fiction,Self-Help,Business")
     
@@ -77,7 +79,7 @@ def create_book(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.post("/quick-add", status_code=status.HTTP_201_CREATED)
+@router.post("/quick-add", status_code=status.HTTP_202_ACCEPTED)
 def create_book_without_static_content(
     title: str = Form(...),
     author: str = Form(...),
@@ -91,7 +93,7 @@ def create_book_without_static_content(
     """
     Create a new book with ONLY RAG indexing (FAST):
     - Uploads PDF and cover image
-    - Indexes PDF for RAG chat (vector embeddings)
+    - Queues the PDF for RAG indexing (vector embeddings) and returns 202 with the job
     - SKIPS: summary, Q&A, podcast generation (saves time)
     
     Categories should be comma-separated (e.g., "Fiction,Self-Help,Business")
@@ -130,6 +132,7 @@ async def update_book(
     """
     Update book details. All fields are optional.
     Can update: title, author, total_copies, available_copies, PDF file, or cover image.
+    A new PDF queues an incremental RAG reindex (only changed chunks are re-embedded).
     """
     import os
     
@@ -168,6 +171,7 @@ async def update_book(
         book.available_copies = available_copies
     
     # Update PDF file if provided
+    pdf_replaced = False
     if pdf_file and pdf_file.filename:
         try:
             # Use static/pdfs directory
@@ -186,6 +190,7 @@ async def update_book(
                 f.write(content)
             
             book.pdf_url = pdf_path
+            pdf_replaced = True
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -230,6 +235,9 @@ async def update_book(
     db.commit()
     db.refresh(book)
     
+    # Diff-based reindex in the background; the current index keeps serving queries meanwhile
+    index_job = enqueue_index_job(db, book_id, book.pdf_url) if pdf_replaced else None
+    
     return {
         "message": "Book updated successfully",
         "book_id": book.book_id,
@@ -238,7 +246,8 @@ async def update_book(
         "total_copies": book.total_copies,
         "available_copies": book.available_copies,
         "pdf_url": book.pdf_url,
-        "cover_image": book.cover_image
+        "cover_image": book.cover_image,
+        "index_job": serialize_index_job(index_job) if index_job else None
     }
 
 
@@ -4,13 +4,18 @@ Handles document Q&A and chat functionality
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.config.database import get_db
 from app.models.books import Books
+from app.models.category import Category
 from app.services.rag_service import rag_service
+from app.services.index_jobs import enqueue_index_job, get_index_job, serialize_index_job
+from app.config.settings import RAG_BATCH_MAX_QUESTIONS, RAG_MULTI_BOOK_MAX_BOOKS
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 import time 
+import json
 import logging
 import os
 import datetime
@@ -33,6 +38,20 @@ class QueryRequest(BaseModel):
     num_chunks: Optional[int] = 5  # Number of chunks to retrieve
 
 
+class BatchQueryRequest(BaseModel):
+    """Request schema for asking many questions about one book"""
+    questions: List[str]
+    num_chunks: Optional[int] = 5
+
+
+class MultiBookQueryRequest(BaseModel):
+    """Request schema for asking one question across several books"""
+    question: str
+    book_ids: Optional[List[int]] = None
+    category: Optional[str] = None  # all indexed books of this category
+    num_chunks: Optional[int] = 5  # Chunks used as context across all books
+
+
 class QueryResponse(BaseModel):
     """Response schema for book queries"""
     book_title: str
@@ -42,6 +61,13 @@ class QueryResponse(BaseModel):
     chunks_used: int
 
 
+class SearchRequest(BaseModel):
+    """Request schema for searching across books"""
+    query: str
+    book_ids: Optional[List[int]] = None  # None = whole library
+    k: Optional[int] = 10  # Number of passages to return
+
+
 @router.post("/books/{book_id}/query")
 async def query_book(
     book_id: int,
@@ -109,6 +135,307 @@ async def query_book(
     return response_data
 
 
+@router.post("/books/{book_id}/query/stream")
+async def query_book_stream(
+    book_id: int,
+    request: QueryRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Ask a question about a book and stream the answer as server-sent events
+    
+    - `sources`: retrieved chunks (page + preview), sent as soon as retrieval finishes
+    - `token`: the next piece of the answer (JSON string)
+    - `done`: `{"num_chunks_used": n, "cached": bool}`, or `error`: `{"error": "..."}`
+    
+    The completed answer is cached, so the same question on `/query` is a cache hit.
+    """
+    book = db.query(Books).filter(Books.book_id == book_id).first()
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book with ID {book_id} not found"
+        )
+    
+    num_chunks = request.num_chunks if request.num_chunks is not None else 5
+    
+    async def event_stream():
+        async for event in rag_service.stream_query_book(book_id, request.question, num_chunks):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/books/{book_id}/query/batch")
+async def query_book_batch(
+    book_id: int,
+    request: BatchQueryRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Ask many questions about one book in a single request (e.g. quiz preparation)
+    
+    - Questions are embedded together and retrieved with one vector search
+    - Answers are generated concurrently (bounded) and returned in question order
+    - Each result has `cache`: `hit` (exact), `semantic` (paraphrase) or `miss` (generated now)
+    
+    **Example:**
+    ```json
+    {
+        "questions": ["What is 2NF?", "What is 3NF?", "What is BCNF?"],
+        "num_chunks": 5
+    }
+    ```
+    """
+    questions = [question.strip() for question in request.questions]
+    if not questions or any(not question for question in questions):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide at least one question and no empty questions"
+        )
+    if len(questions) > RAG_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {RAG_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    book = db.query(Books).filter(Books.book_id == book_id).first()
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book with ID {book_id} not found"
+        )
+    
+    rag_start = time.time()
+    num_chunks = request.num_chunks if request.num_chunks is not None else 5
+    result = await rag_service.query_book_batch(book_id, questions, num_chunks)
+    rag_time = time.time() - rag_start
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result["error"]
+        )
+    
+    cache_summary = {status_name: 0 for status_name in ("hit", "semantic", "miss")}
+    for item in result["results"]:
+        cache_summary[item["cache"]] += 1
+    logger.info(f"Batch RAG Query - Book {book_id}: {len(questions)} questions rag={rag_time:.4f}s cache={cache_summary}")
+    
+    return {
+        "book_id": book_id,
+        "book_title": book.title,
+        "results": result["results"],
+        "total": len(result["results"]),
+        "cache_summary": cache_summary
+    }
+
+
+@router.post("/query")
+async def query_books(request: MultiBookQueryRequest, db: Session = Depends(get_db)):
+    """
+    Ask one question across several books, given by ID or by category
+    
+    - Every book is searched concurrently and the candidates are re-ranked together
+    - One answer is generated, citing sources as [n]; each source carries its book and page
+    - Books without an index are skipped and listed in `books_skipped`
+    
+    **Example:**
+    ```json
+    {
+        "question": "How do the books define serializability?",
+        "category": "Databases",
+        "num_chunks": 8
+    }
+    ```
+    """
+    if not request.question.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question must not be empty"
+        )
+    if bool(request.book_ids) == bool(request.category):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either book_ids or category"
+        )
+    
+    if request.book_ids:
+        book_ids = set(request.book_ids)
+        books = db.query(Books.book_id, Books.title).filter(Books.book_id.in_(book_ids)).all()
+        missing = sorted(book_ids - {book_id for book_id, _ in books})
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Books not found: {missing}"
+            )
+    else:
+        books = (
+            db.query(Books.book_id, Books.title)
+            .join(Books.categories)
+            .filter(Category.name == request.category, Books.rag_indexed == 1)
+            .all()
+        )
+        if not books:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No indexed books in category '{request.category}'"
+            )
+    if len(books) > RAG_MULTI_BOOK_MAX_BOOKS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {RAG_MULTI_BOOK_MAX_BOOKS} books per query ({len(books)} selected)"
+        )
+    
+    rag_start = time.time()
+    num_chunks = request.num_chunks if request.num_chunks is not None else 5
+    result = await rag_service.query_books(dict(books), request.question, num_chunks)
+    rag_time = time.time() - rag_start
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result["error"]
+        )
+    
+    logger.info(f"Multi-book RAG Query - {len(books)} books: rag={rag_time:.4f}s skipped={result['books_skipped']}")
+    return {
+        "question": result["question"],
+        "answer": result["answer"],
+        "sources": result["sources"],
+        "chunks_used": result["num_chunks_used"],
+        "books_searched": result["books_searched"],
+        "books_skipped": result["books_skipped"]
+    }
+
+
+@router.get("/books/{book_id}/passages")
+def get_book_passages(book_id: int, q: str, k: int = 5, db: Session = Depends(get_db)):
+    """
+    Find where a book talks about something - matching passages only, no LLM call
+    
+    - Top-k chunks by vector similarity, each with its page number and score
+    - Repeated searches are served from a small in-process cache
+    
+    **Example:** `GET /rag/books/16/passages?q=two-phase%20locking&k=5`
+    """
+    if not q.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Query must not be empty"
+        )
+    if not 1 <= k <= 50:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="k must be between 1 and 50"
+        )
+    
+    book = db.query(Books.book_id).filter(Books.book_id == book_id).first()
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book with ID {book_id} not found"
+        )
+    
+    search_start = time.time()
+    result = rag_service.search_book(book_id, q, k)
+    search_time = time.time() - search_start
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result["error"]
+        )
+    
+    logger.info(f"Passage search - Book {book_id}: k={k} time={search_time * 1000:.1f}ms cached={result['cached']}")
+    return {
+        "book_id": book_id,
+        "query": q,
+        "results": result["results"],
+        "total": len(result["results"]),
+        "cached": result["cached"]
+    }
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    RAG cache counters
+    
+    - `llm_calls`: LLM calls made by this process; `llm_calls_all_processes`: by every API process (Redis)
+    - `semantic`: hits / misses of the paraphrase answer cache (shared across workers via Redis)
+    - `vectorstores`: this process's LRU of open collections
+    - `passages`: this process's LRU of retrieval-only passage results
+    """
+    try:
+        return await rag_service.cache_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read cache stats: {str(e)}"
+        )
+
+
+@router.post("/search")
+def search_library(request: SearchRequest, db: Session = Depends(get_db)):
+    """
+    Semantic search across many books (or the whole library) in one vector search
+    
+    - Returns the best-matching passages, each with its book, page and similarity
+    - No LLM call: use /rag/books/{book_id}/query for generated answers
+    - One filtered search in single-collection mode (RAG_SINGLE_COLLECTION=true)
+    
+    **Example:**
+    ```json
+    {
+        "query": "two-phase locking",
+        "book_ids": [3, 7, 12],
+        "k": 10
+    }
+    ```
+    """
+    if not request.query.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Query must not be empty"
+        )
+    k = request.k if request.k is not None else 10
+    if not 1 <= k <= 50:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="k must be between 1 and 50"
+        )
+    
+    search_start = time.time()
+    result = rag_service.search_library(request.query, request.book_ids or None, k)
+    search_time = time.time() - search_start
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result["error"]
+        )
+    
+    # Attach book titles for display
+    book_ids = {hit["book_id"] for hit in result["results"] if hit["book_id"] is not None}
+    titles = dict(db.query(Books.book_id, Books.title).filter(Books.book_id.in_(book_ids)).all()) if book_ids else {}
+    for hit in result["results"]:
+        hit["book_title"] = titles.get(hit["book_id"])
+    
+    logger.info(f"Library search: {len(result['results'])} hits from {result['collections_searched']} collections in {search_time:.4f}s")
+    
+    return {
+        "query": result["query"],
+        "book_ids": result["book_ids"],
+        "results": result["results"],
+        "total": len(result["results"])
+    }
+
+
 @router.get("/books/{book_id}/index-status")
 def get_index_status(book_id: int, db: Session = Depends(get_db)):
     """
@@ -127,31 +454,48 @@ def get_index_status(book_id: int, db: Session = Depends(get_db)):
             detail=f"Book with ID {book_id} not found"
         )
     
-    # Check if vectorstore exists
-    import os
-    collection_name = f"book_{book_id}"
-    vectorstore_path = os.path.join("static/vectordb", collection_name)
-    
-    indexed = os.path.exists(vectorstore_path)
+    # Check the collection itself (reindexing never empties it, so this stays true during a reindex)
+    index_status = rag_service.check_index_status(book_id)
     
     return {
         "book_id": book_id,
         "book_title": book.title,
-        "indexed": indexed,
-        "collection_name": collection_name,
-        "has_pdf": book.pdf_file_path is not None,
-        "pdf_path": book.pdf_file_path
+        "indexed": index_status["indexed"],
+        "collection_name": index_status["collection_name"],
+        "document_count": index_status["document_count"],
+        "has_pdf": book.pdf_url is not None,
+        "pdf_path": book.pdf_url
     }
 
 
-@router.post("/books/{book_id}/reindex")
+@router.get("/books/{book_id}/index-jobs/{job_id}")
+def get_index_job_status(book_id: int, job_id: int, db: Session = Depends(get_db)):
+    """
+    Check progress of a background RAG indexing job
+    
+    Returns:
+    - status: QUEUED, RUNNING, COMPLETED or FAILED
+    - stage / progress: current pipeline stage and percentage complete
+    - stats: processing statistics once the job has completed
+    """
+    job = get_index_job(db, book_id, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Index job {job_id} not found for book {book_id}"
+        )
+    
+    return serialize_index_job(job)
+
+
+@router.post("/books/{book_id}/reindex", status_code=status.HTTP_202_ACCEPTED)
 def reindex_book(book_id: int, db: Session = Depends(get_db)):
     """
     Re-index a book (useful if PDF was updated or indexing failed)
     
-    - Deletes old index
-    - Re-processes PDF
-    - Creates new vector embeddings
+    - Queues an incremental reindex job and returns it (202)
+    - Only chunks whose text changed are embedded; vanished chunks are deleted afterwards
+    - The existing index stays queryable while the job runs
     """
     # Verify book exists
     book = db.query(Books).filter(Books.book_id == book_id).first()
@@ -161,35 +505,19 @@ def reindex_book(book_id: int, db: Session = Depends(get_db)):
             detail=f"Book with ID {book_id} not found"
         )
     
-    if not book.pdf_file_path:
+    if not book.pdf_url:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Book has no PDF file to index"
         )
     
-    # Delete old index if exists
-    rag_service.delete_book_index(book_id)
-    
-    # Re-process PDF
-    result = rag_service.process_pdf(book.pdf_file_path, book_id)
-    
-    if not result["success"]:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=result["error"]
-        )
+    job = enqueue_index_job(db, book_id, book.pdf_url)
     
     return {
-        "message": "Book re-indexed successfully",
+        "message": "Book re-index queued",
         "book_id": book_id,
         "book_title": book.title,
-        "stats": {
-            "total_pages": result["total_pages"],
-            "total_chunks": result["total_chunks"],
-            "unique_chunks": result["unique_chunks"],
-            "deduplication": f"{result['deduplication_percentage']}%",
-            "collection_name": result["collection_name"]
-        }
+        "index_job": serialize_index_job(job)
     }
 
 
@@ -7,7 +7,8 @@ from app.services.student_books import (
     search_books,
     get_or_generate_summary,
     get_or_generate_qa,
-    get_or_generate_audio
+    get_or_generate_audio,
+    content_cache
 )
 from app.config.database import get_db
 from typing import List
@@ -73,6 +74,17 @@ def search_books_by_filters(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/cache/stats")
+def get_content_cache_stats():
+    """
+    Hit rates of the summary / Q&A / audio cache in this worker process
+    
+    - `local`: in-process LRU (share of all lookups it answered, size in bytes, invalidations received)
+    - `redis`: shared tier, for the lookups the local tier missed
+    """
+    return content_cache.stats()
+
+
 @router.get("/{book_id}/summary")
 def get_book_summary(book_id: int, db: Session = Depends(get_db)):
     """
@@ -10,6 +10,7 @@ from app.models.books import Books
 from app.models.static_content import StaticContent
 from app.services.gemini_ai import generate_summary, generate_qa_pairs, generate_podcast_script
 from app.services.audio_generation import generate_podcast_audio
+from app.services.cache_versions import bump_generation, get_generation, versioned_key
 import redis
 import hashlib
 import json
@@ -22,15 +23,15 @@ redis_client= redis.Redis(host='localhost', port=6379, db=0)
 
 def make_cache_keys_summary(book_id: int):
     raw_key = f"student_book_{book_id}"
-    return hashlib.sha3_256(raw_key.encode()).hexdigest()
+    return versioned_key(hashlib.sha3_256(raw_key.encode()).hexdigest(), get_generation(redis_client, book_id))
 
 def make_cache_keys_qa(book_id: int):
     raw_key = f"student_book_{book_id}"
-    return hashlib.sha3_256(raw_key.encode()).hexdigest()
+    return versioned_key(hashlib.sha3_256(raw_key.encode()).hexdigest(), get_generation(redis_client, book_id))
 
 def make_cache_keys_podcast(book_id: int):
     raw_key = f"student_book_{book_id}"
-    return hashlib.sha3_256(raw_key.encode()).hexdigest()
+    return versioned_key(hashlib.sha3_256(raw_key.encode()).hexdigest(), get_generation(redis_client, book_id))
 
 @router.post("/books/{book_id}/summary")
 def generate_summary_student(book_id: int, db: Session = Depends(get_db)):
@@ -100,8 +101,7 @@ def generate_summary_student(book_id: int, db: Session = Depends(get_db)):
     
     # Phase 6: Cache invalidation
     invalidate_start = time.time()
-    admin_cache_key = f"summary_{book_id}"
-    redis_client.delete(admin_cache_key)
+    bump_generation(redis_client, book_id)
     invalidate_time = time.time() - invalidate_start
     
     total_time = cache_time + db_time + content_check_time + ai_time + save_time + invalidate_time
@@ -179,8 +179,7 @@ def generate_qa_student(book_id: int, db: Session = Depends(get_db)):
     
     # Phase 6: Cache invalidation
     invalidate_start = time.time()
-    admin_cache_key = f"qa_{book_id}"
-    redis_client.delete(admin_cache_key)
+    bump_generation(redis_client, book_id)
     invalidate_time = time.time() - invalidate_start
     
     total_time = cache_time + db_time + content_check_time + ai_time + save_time + invalidate_time
@@ -263,10 +262,7 @@ def generate_podcast_student(book_id: int, db: Session = Depends(get_db)):
     
     # Phase 6: Cache invalidation
     invalidate_start = time.time()
-    podcast_cache_key = f"podcast_{book_id}"
-    audio_cache_key = f"audio_url_{book_id}"
-    redis_client.delete(podcast_cache_key)
-    redis_client.delete(audio_cache_key)
+    bump_generation(redis_client, book_id)
     invalidate_time = time.time() - invalidate_start
     
     total_time = db_time + content_check_time + script_time + audio_time + save_time + invalidate_time
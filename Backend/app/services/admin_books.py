@@ -4,7 +4,7 @@ from app.models.category import Category
 import app.schemas.book_schemas as schemas_books
 from app.utils.storage import save_file
 from app.services.static_content_service import create_static_content
-from app.services.rag_service import rag_service
+from app.services.index_jobs import enqueue_index_job, serialize_index_job
 from fastapi import UploadFile
 from typing import List
 import os
@@ -83,41 +83,11 @@ def add_book_with_files(
         db.commit()
         db.refresh(new_book)
         
-        # Generate RAG index ONLY (no automatic AI content)
-        rag_indexed = False
-        rag_stats = {}
-        try:
-            print(f"Starting RAG indexing for book {new_book.book_id}...")
-            rag_result = rag_service.process_pdf(pdf_path, new_book.book_id)
-            rag_indexed = rag_result.get("success", False)
-            
-            if rag_indexed:
-                # Update book's rag_indexed flag in database using direct query
-                db.query(Books).filter(Books.book_id == new_book.book_id).update({"rag_indexed": 1})
-                db.commit()
-                db.refresh(new_book)
-                print(f"✓ RAG indexed successfully: {rag_result.get('unique_chunks', 0)} chunks")
-                rag_stats = {
-                    "indexed": rag_indexed,
-                    "num_chunks": rag_result.get("unique_chunks", 0),
-                    "collection": rag_result.get("collection_name", "")
-                }
-            else:
-                print(f"✗ RAG indexing failed: {rag_result.get('error', 'Unknown error')}")
-                rag_stats = {"error": rag_result.get("error", "Unknown error")}
-        except Exception as e:
-            print(f"✗ RAG indexing exception: {str(e)}")
-            rag_indexed = False
-            rag_stats = {"error": str(e)}
-        
-        # Build success message
-        if rag_indexed:
-            content_message = "✓ Book added successfully with RAG indexing. Students can generate AI content on-demand and use chat feature!"
-        else:
-            content_message = "✓ Book added successfully. RAG indexing failed - students will need to retry or contact admin."
+        # Queue RAG indexing ONLY (no automatic AI content) - embedded in the background
+        index_job = enqueue_index_job(db, new_book.book_id, pdf_path)
         
         return {
-            "message": content_message,
+            "message": "✓ Book added successfully. RAG indexing has been queued - students can use the chat feature once the index job completes.",
             "book_id": new_book.book_id,
             "title": new_book.title,
             "author": new_book.author,
@@ -126,8 +96,8 @@ def add_book_with_files(
             "cover_image": cover_path,
             "is_public": new_book.is_public,
             "content_generated": False,
-            "rag_indexed": rag_indexed,
-            "rag_stats": rag_stats,
+            "rag_indexed": False,
+            "index_job": serialize_index_job(index_job),
             "note": "AI content (Summary/Q&A/Podcast) will be generated on-demand by students"
         }
             
@@ -197,36 +167,9 @@ def add_book_without_static_content(
         db.commit()
         db.refresh(new_book)
         
-        # Generate RAG index ONLY (skip static content generation)
-        rag_indexed = False
-        rag_stats = {}
-        message = "Book added"
-        try:
-            print(f"Starting RAG indexing for book {new_book.book_id}...")
-            rag_result = rag_service.process_pdf(pdf_path, new_book.book_id)
-            rag_indexed = rag_result.get("success", False)
-            
-            if rag_indexed:
-                # Update book's rag_indexed flag in database using direct query
-                db.query(Books).filter(Books.book_id == new_book.book_id).update({"rag_indexed": 1})
-                db.commit()
-                db.refresh(new_book)
-                print(f"✓ RAG indexed successfully: {rag_result.get('unique_chunks', 0)} chunks")
-                message = "Book added and RAG indexed successfully (confidential - students cannot generate AI content)"
-                rag_stats = {
-                    "indexed": rag_indexed,
-                    "num_chunks": rag_result.get("unique_chunks", 0),
-                    "collection": rag_result.get("collection_name", "")
-                }
-            else:
-                print(f"✗ RAG indexing failed: {rag_result.get('error', 'Unknown error')}")
-                message = f"Book added but RAG indexing failed: {rag_result.get('error', 'Unknown error')}"
-                rag_stats = {"error": rag_result.get("error", "Unknown error")}
-        except Exception as e:
-            print(f"✗ RAG indexing exception: {str(e)}")
-            rag_indexed = False
-            rag_stats = {"error": str(e)}
-            message = f"Book added but RAG indexing failed: {str(e)}"
+        # Queue RAG index ONLY (skip static content generation)
+        index_job = enqueue_index_job(db, new_book.book_id, pdf_path)
+        message = "Book added and RAG indexing queued (confidential - students cannot generate AI content)"
         
         return {
             "message": message,
@@ -237,8 +180,8 @@ def add_book_without_static_content(
             "pdf_url": pdf_path,
             "cover_image": cover_path,
             "content_generated": False,  # Explicitly False
-            "rag_indexed": rag_indexed,
-            "rag_stats": rag_stats,
+            "rag_indexed": False,
+            "index_job": serialize_index_job(index_job),
             "note": "Static content (summary, Q&A, podcast) NOT generated. Use /rag/books/{book_id}/query for chat."
         }
     
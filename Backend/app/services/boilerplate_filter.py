@@ -0,0 +1,64 @@
+"""
+Cross-page boilerplate removal for RAG ingestion
+Running headers, footers, watermarks and journal lines repeat in the top or bottom
+lines of many pages. Counting how often each (normalized) band line occurs across a
+window of pages finds them statistically, without a regex per publisher.
+"""
+from collections import Counter
+from typing import Dict, List
+import math
+import re
+
+
+class RepeatedLineFilter:
+    """Page stage that strips lines repeating in the top/bottom band of many pages"""
+
+    name = "repeated_lines"
+
+    def __init__(self, band_lines: int = 3, min_page_fraction: float = 0.5, min_pages: int = 4):
+        """
+        Args:
+            band_lines: How many non-empty lines at the top and bottom of a page form the band
+            min_page_fraction: A band line must appear on at least this fraction of the window's pages
+            min_pages: Windows with fewer pages are left untouched (not enough evidence)
+        """
+        self.band_lines = band_lines
+        self.min_page_fraction = min_page_fraction
+        self.min_pages = min_pages
+
+    @staticmethod
+    def normalize_line(line: str) -> str:
+        """Normalize so "Page 12" and "Page 13" (or "Vol. 4, p. 17") count as the same line"""
+        line = re.sub(r'\d+', '#', line.lower())
+        return re.sub(r'\s+', ' ', line).strip()
+
+    def _band(self, lines: List[str]) -> List[int]:
+        """Indexes of the non-empty lines in the top and bottom band of a page"""
+        non_empty = [i for i, line in enumerate(lines) if line.strip()]
+        if len(non_empty) <= 2 * self.band_lines:
+            return non_empty
+        return non_empty[:self.band_lines] + non_empty[-self.band_lines:]
+
+    def process(self, texts: List[str], stats: Dict) -> List[str]:
+        """Strip repeated band lines from a window of raw page texts"""
+        if len(texts) < self.min_pages:
+            return texts
+
+        pages = [text.split("\n") for text in texts]
+        counts = Counter()
+        for lines in pages:
+            counts.update({self.normalize_line(lines[i]) for i in self._band(lines)})
+
+        min_count = max(2, math.ceil(self.min_page_fraction * len(texts)))
+        repeated = {line for line, count in counts.items() if line and count >= min_count}
+        if not repeated:
+            return texts
+
+        stripped = []
+        for lines in pages:
+            drop = {i for i in self._band(lines) if self.normalize_line(lines[i]) in repeated}
+            if len(drop) == sum(1 for line in lines if line.strip()):
+                drop = set()  # never blank a page: short pages that only differ by numbers aren't boilerplate
+            stats["boilerplate_lines_removed"] = stats.get("boilerplate_lines_removed", 0) + len(drop)
+            stripped.append("\n".join(line for i, line in enumerate(lines) if i not in drop))
+        return stripped
@@ -0,0 +1,244 @@
+"""
+Bulk library ingestion (see `python ingest.py --help`)
+Scans a directory of PDFs, registers each one as a book and indexes the books
+across a process pool. Progress is checkpointed to a JSON state file after
+every book, so a crashed or interrupted run resumes where it stopped; books
+that were half-indexed only re-embed what the embedding cache doesn't hold.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+
+from app.config.database import SessionLocal
+from app.config.settings import RAG_VECTORSTORE_DIR
+from app.models.books import Books
+from app.services.admin_books import get_or_create_categories
+from app.services.chroma_client import create_chroma_client, uses_chroma_server
+from app.services.pdf_extraction import count_pages
+from app.utils.storage import BASE_DIR
+
+STATE_VERSION = 1
+
+
+def scan_pdfs(directory: str, recursive: bool = True) -> List[str]:
+    """Absolute paths of the PDFs under a directory, in a stable order"""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        found.extend(os.path.abspath(os.path.join(root, name)) for name in sorted(files)
+                     if name.lower().endswith(".pdf"))
+        if not recursive:
+            break
+    return found
+
+
+def title_author_from_filename(pdf_path: str) -> Tuple[str, str]:
+    """"Author - Title.pdf" -> (Title, Author); anything else -> (file name, "Unknown")"""
+    stem = os.path.splitext(os.path.basename(pdf_path))[0].replace("_", " ").strip()
+    if " - " in stem:
+        author, title = stem.split(" - ", 1)
+        return title.strip(), author.strip()
+    return stem, "Unknown"
+
+
+class IngestState:
+    """JSON checkpoint of a bulk run: source PDF -> {book_id, status, ...}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.books: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STATE_VERSION:
+                raise ValueError(f"Unsupported ingest state version in {path}")
+            self.books = data.get("books", {})
+
+    def save(self):
+        """Write atomically (temp file + rename) so a crash never leaves a torn state file"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "books": self.books}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def update(self, source: str, **fields):
+        self.books.setdefault(source, {}).update(fields)
+        self.save()
+
+    def pending(self, retry_failed: bool = False) -> List[str]:
+        """Sources that are registered but not indexed yet"""
+        statuses = {"registered", "failed"} if retry_failed else {"registered"}
+        return [source for source, entry in self.books.items() if entry.get("status") in statuses]
+
+
+def register_books(sources: List[str], state: IngestState, categories: List[str],
+                   is_public: bool, total_copies: int) -> int:
+    """
+    Create a Books row (PDF copied into static/pdfs) for every source not in the state yet.
+    Each book id is checkpointed immediately, so a crash can't create duplicates on resume.
+    """
+    created = 0
+    db = SessionLocal()
+    try:
+        for source in sources:
+            if source in state.books:
+                continue
+            title, author = title_author_from_filename(source)
+            book = db.query(Books).filter((Books.title == title) & (Books.author == author)).first()
+            if book is None:
+                pdf_dir = os.path.join(BASE_DIR, "pdfs")
+                os.makedirs(pdf_dir, exist_ok=True)
+                pdf_path = os.path.join(pdf_dir, f"{datetime.now(timezone.utc).timestamp()}_{os.path.basename(source)}")
+                shutil.copyfile(source, pdf_path)
+                book = Books(
+                    title=title,
+                    author=author,
+                    pdf_url=pdf_path,
+                    total_copies=total_copies,
+                    available_copies=total_copies,
+                    is_public=1 if is_public else 0
+                )
+                db.add(book)
+                db.flush()
+                book.categories = get_or_create_categories(db, categories)
+                db.commit()
+                created += 1
+            else:
+                logging.info(f"'{title}' by {author} already exists (book {book.book_id}), indexing it")
+            try:
+                pages, status, error = count_pages(book.pdf_url), "registered", None
+            except Exception as e:
+                pages, status, error = 0, "failed", f"Unreadable PDF: {str(e)}"
+            state.update(source, book_id=book.book_id, pdf_path=book.pdf_url, title=title,
+                         pages=pages, status=status, error=error)
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _init_index_worker(threads: int):
+    """
+    Pool initializer: parallelism is across books, so keep each book single-process.
+    Settings were already imported while unpickling this initializer, so the overrides go
+    on the service itself rather than into the environment.
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    torch.set_num_threads(threads)
+
+    # Imported here so the model loads once per worker, after the thread limits above
+    from app.services.rag_service import rag_service
+    rag_service.extract_workers = 1
+    rag_service.embed_workers = 0
+
+
+def _worker_parallelism() -> Tuple[int, int]:
+    """(extraction processes, embedding workers) process_pdf uses in this process"""
+    from app.services.rag_service import rag_service
+    return rag_service.extract_workers, rag_service.embed_workers
+
+
+def _index_book(book_id: int, pdf_path: str) -> Dict:
+    from app.services.rag_service import rag_service
+    return rag_service.process_pdf(pdf_path, book_id)
+
+
+def _mark_indexed(book_id: int):
+    db = SessionLocal()
+    try:
+        db.query(Books).filter(Books.book_id == book_id).update({"rag_indexed": 1})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def run_bulk_ingest(
+    directory: str,
+    state_path: str,
+    workers: Optional[int] = None,
+    categories: Optional[List[str]] = None,
+    is_public: bool = True,
+    total_copies: int = 1,
+    retry_failed: bool = False,
+    recursive: bool = True
+) -> Dict:
+    """
+    Register and index every PDF under a directory, resuming from the state file.
+    Prints one progress line per finished book with throughput and ETA.
+    """
+    state = IngestState(state_path)
+    sources = scan_pdfs(directory, recursive)
+    created = register_books(sources, state, categories or [], is_public, total_copies)
+    queue = state.pending(retry_failed)
+    done_before = sum(1 for entry in state.books.values() if entry.get("status") == "indexed")
+    print(f"Found {len(sources)} PDFs: {created} new books, {len(queue)} to index, {done_before} already indexed")
+    if not queue:
+        return {"indexed": 0, "failed": 0, "skipped": done_before}
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(queue)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    total_pages = sum(state.books[source]["pages"] for source in queue)
+    pages_done, indexed, failed = 0, 0, 0
+    started = time.perf_counter()
+
+    # Open the Chroma store up front: workers initialising a fresh store concurrently race on its schema
+    create_chroma_client(RAG_VECTORSTORE_DIR)
+    if not uses_chroma_server():
+        print("Note: RAG_CHROMA_HOST is not set, so a running API only sees these books after a restart")
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_index_worker, initargs=(threads,)) as executor:
+        futures = {
+            executor.submit(_index_book, state.books[source]["book_id"], state.books[source]["pdf_path"]): source
+            for source in queue
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            entry = state.books[source]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": f"Worker crashed: {str(e)}"}
+
+            if result.get("success"):
+                _mark_indexed(entry["book_id"])
+                state.update(source, status="indexed", chunks=result.get("unique_chunks"),
+                             cache_hit_rate=result.get("embedding_cache_hit_rate"), error=None)
+                indexed += 1
+            else:
+                state.update(source, status="failed", error=result.get("error"))
+                failed += 1
+
+            pages_done += entry["pages"]
+            elapsed = time.perf_counter() - started
+            pages_per_second = pages_done / elapsed if elapsed else 0.0
+            eta = (total_pages - pages_done) / pages_per_second if pages_per_second else 0.0
+            outcome = f"{result.get('unique_chunks', 0)} chunks" if result.get("success") else f"FAILED: {result.get('error')}"
+            print(
+                f"[{indexed + failed}/{len(queue)}] {entry['title']} - {outcome} | "
+                f"{pages_per_second:.1f} pages/s, {(indexed + failed) / elapsed * 60:.1f} books/min | "
+                f"elapsed {_format_duration(elapsed)}, ETA {_format_duration(eta)}"
+            )
+
+    print(f"Done: {indexed} indexed, {failed} failed in {_format_duration(time.perf_counter() - started)}")
+    return {"indexed": indexed, "failed": failed, "skipped": done_before}
@@ -0,0 +1,97 @@
+"""
+Per-book cache generations
+Cached answers and generated content are stored under keys that include the book's
+generation, a counter kept in Redis at cache_gen:{book_id} (missing = 0). Reindexing,
+deleting a book or regenerating its content bumps the counter with one INCR: every key
+built from the old generation is then unreachable and simply expires with its TTL,
+with no SCAN over opaque digest keys.
+
+Every bump is also published on INVALIDATION_CHANNEL (payload: the book id) so processes that
+keep copies in memory (content_cache.py, rag_service.py's handle and chain LRUs) can drop them;
+start_invalidation_listener runs the subscriber for them.
+
+Both the sync (redis.Redis) and async (redis.asyncio) clients are used in the app,
+so each operation has a sync and an async variant.
+"""
+from typing import Callable, Dict, Iterable
+import logging
+import threading
+import time
+
+INVALIDATION_CHANNEL = "cache_gen:invalidate"
+RECONNECT_MAX_DELAY = 30  # seconds between resubscribe attempts, at most
+
+
+def generation_key(book_id: int) -> str:
+    return f"cache_gen:{book_id}"
+
+
+def versioned_key(base_key: str, generation: int) -> str:
+    """A cache key scoped to one generation of its book"""
+    return f"{base_key}:g{generation}"
+
+
+def get_generation(redis_client, book_id: int) -> int:
+    value = redis_client.get(generation_key(book_id))
+    return int(value) if value else 0
+
+
+def bump_generation(redis_client, book_id: int) -> int:
+    """Invalidate every cached entry of a book; returns the new generation"""
+    generation = redis_client.incr(generation_key(book_id))
+    redis_client.publish(INVALIDATION_CHANNEL, book_id)
+    logging.info(f"Cache generation of book {book_id} is now {generation}")
+    return generation
+
+
+async def aget_generation(redis_client, book_id: int) -> int:
+    value = await redis_client.get(generation_key(book_id))
+    return int(value) if value else 0
+
+
+async def aget_generations(redis_client, book_ids: Iterable[int]) -> Dict[int, int]:
+    """Generations of many books with one MGET"""
+    book_ids = list(book_ids)
+    values = await redis_client.mget([generation_key(book_id) for book_id in book_ids]) if book_ids else []
+    return {book_id: int(value) if value else 0 for book_id, value in zip(book_ids, values)}
+
+
+async def abump_generation(redis_client, book_id: int) -> int:
+    """Invalidate every cached entry of a book; returns the new generation"""
+    generation = await redis_client.incr(generation_key(book_id))
+    await redis_client.publish(INVALIDATION_CHANNEL, book_id)
+    logging.info(f"Cache generation of book {book_id} is now {generation}")
+    return generation
+
+
+def start_invalidation_listener(redis_client, on_invalidate: Callable[[int], None],
+                                on_subscription: Callable[[bool], None], name: str) -> threading.Thread:
+    """
+    Daemon thread calling on_invalidate(book_id) for every published bump. on_subscription(True)
+    runs each time the subscription is (re)established and on_subscription(False) when it is lost:
+    messages published in between are missed, so in-memory copies must not outlive the gap.
+    """
+    def listen():
+        delay = 1
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        on_subscription(True)
+                        delay = 1
+                        logging.info(f"{name} subscribed to cache invalidations")
+                    elif message["type"] == "message":
+                        on_invalidate(int(message["data"]))
+            except Exception as e:
+                logging.warning(f"{name} invalidation listener failed: {e}")
+            finally:
+                on_subscription(False)
+                pubsub.close()
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    listener = threading.Thread(target=listen, name=f"{name} invalidations", daemon=True)
+    listener.start()
+    return listener
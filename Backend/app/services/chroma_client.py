@@ -0,0 +1,22 @@
+"""
+Chroma client selection
+Embedded by default: a PersistentClient on RAG_VECTORSTORE_DIR inside each process.
+chromadb keeps an in-memory view of every index it opened, so chunks written by another
+process (the index worker, bulk ingest) stay invisible to queries of a running API process
+until it restarts - a new client in the same process shares the stale view. With
+RAG_CHROMA_HOST set, the API and the workers all talk to one Chroma server
+(`chroma run --path static/vectordb --port 8001`) and see each other's writes immediately.
+"""
+import chromadb
+
+from app.config.settings import RAG_CHROMA_HOST, RAG_CHROMA_PORT, RAG_VECTORSTORE_DIR
+
+
+def uses_chroma_server() -> bool:
+    return bool(RAG_CHROMA_HOST)
+
+
+def create_chroma_client(path: str = RAG_VECTORSTORE_DIR):
+    if uses_chroma_server():
+        return chromadb.HttpClient(host=RAG_CHROMA_HOST, port=RAG_CHROMA_PORT)
+    return chromadb.PersistentClient(path=path)
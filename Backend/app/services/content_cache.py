@@ -0,0 +1,135 @@
+"""
+Two-tier cache for generated book content (summary, Q&A, audio URL)
+Every page view of a popular book used to do a Redis GET plus a json.loads of a
+multi-kilobyte text. ContentCache keeps the parsed values of recently used keys in process
+memory, in an LRU bounded by the JSON size of its entries, and serves each copy for at most
+CONTENT_CACHE_TTL seconds. Redis stays the shared tier behind it.
+
+Coherence across workers: bumping a book's cache generation publishes the book id on
+INVALIDATION_CHANNEL (see cache_versions.py). Every process runs a listener thread that drops
+its local copies of that book. The local tier is only used while the listener is subscribed:
+when the connection drops, the tier is cleared and bypassed until the subscription is back, so
+a missed message cannot leave a stale copy behind. A value loaded while an invalidation arrived
+is returned but not kept locally.
+"""
+from typing import Any, Callable, Dict, Hashable, Tuple
+import json
+import threading
+import time
+
+from app.config.settings import CONTENT_CACHE_ENABLED, CONTENT_CACHE_MAX_BYTES, CONTENT_CACHE_TTL
+from app.services.cache_versions import get_generation, start_invalidation_listener, versioned_key
+from app.utils.lru_cache import LRUCache
+
+MAX_ENTRY_FRACTION = 4  # entries above max_bytes / 4 skip the local tier instead of flushing it
+
+
+def _hit_rate(hits: int, lookups: int) -> float:
+    return round(hits / lookups * 100, 2) if lookups else 0.0
+
+
+class ContentCache:
+    """In-process LRU/TTL tier in front of Redis for `{name}_{book_id}` content keys"""
+
+    def __init__(self, redis_client, max_bytes: int = CONTENT_CACHE_MAX_BYTES,
+                 ttl: int = CONTENT_CACHE_TTL, enabled: bool = CONTENT_CACHE_ENABLED):
+        self.redis_client = redis_client
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        # (name, book_id) -> (expires_at, size in bytes, value)
+        self.local = LRUCache(max_bytes, weigh=lambda entry: entry[1])
+        self.subscribed = False
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._epoch = 0  # bumped on every invalidation; loads that started in an older epoch are not kept
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def get_or_load(self, name: str, book_id: int, load: Callable[[], Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+        """
+        Value of `{name}_{book_id}` for the book's current cache generation: from process memory,
+        else from Redis, else from load(), which returns (value, Redis TTL in seconds)
+        """
+        local_key = (name, book_id)
+        if self._local_enabled():
+            entry = self.local.get(local_key)
+            if entry is not None:
+                if time.monotonic() < entry[0]:
+                    self.local_hits += 1
+                    return dict(entry[2])
+                self.local.pop(local_key)
+
+        epoch = self._epoch
+        cache_key = versioned_key(f"{name}_{book_id}", get_generation(self.redis_client, book_id))
+        cached_data = self.redis_client.get(cache_key)
+        if cached_data:
+            self.redis_hits += 1
+            value = json.loads(cached_data)
+            self._store(local_key, epoch, len(cached_data), self.ttl, value)
+            return dict(value)
+
+        self.misses += 1
+        value, ttl = load()
+        payload = json.dumps(value)
+        self.redis_client.setex(cache_key, ttl, payload)
+        self._store(local_key, epoch, len(payload), ttl, value)
+        return dict(value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rates per tier: `redis` counts only the lookups the local tier did not answer"""
+        redis_lookups = self.redis_hits + self.misses
+        lookups = self.local_hits + redis_lookups
+        return {
+            "enabled": self.enabled,
+            "subscribed": self.subscribed,
+            "lookups": lookups,
+            "local": {
+                "hits": self.local_hits,
+                "hit_rate": _hit_rate(self.local_hits, lookups),
+                "entries": len(self.local),
+                "bytes": self.local.weight,
+                "max_bytes": self.max_bytes,
+                "evictions": self.local.evictions,
+                "invalidations": self.invalidations
+            },
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.redis_hits, redis_lookups)
+            },
+            "hit_rate": _hit_rate(self.local_hits + self.redis_hits, lookups)
+        }
+
+    def _local_enabled(self) -> bool:
+        if not self.enabled:
+            return False
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = start_invalidation_listener(
+                        self.redis_client, self._invalidate, self._reset, "Content cache"
+                    )
+        return self.subscribed
+
+    def _store(self, key: Hashable, epoch: int, size: int, ttl: int, value: Dict[str, Any]):
+        if not self._local_enabled() or size > self.max_bytes // MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            if self._epoch == epoch:
+                self.local.put(key, (time.monotonic() + min(ttl, self.ttl), size, value))
+
+    def _invalidate(self, book_id: int):
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            self.local.pop_where(lambda key: key[1] == book_id)
+
+    def _reset(self, subscribed: bool):
+        """Subscription (re)established or lost: anything cached around the gap may be stale"""
+        with self._lock:
+            self._epoch += 1
+            self.subscribed = subscribed
+            self.local.clear()
@@ -0,0 +1,146 @@
+"""
+Token-budgeted prompt context for RAG answers
+Retrieved chunks overlap (the splitter repeats up to 100 chars between neighbours)
+and sometimes repeat each other, and all of it used to be sent to the LLM verbatim.
+The assembler:
+- merges chunks from the same page whose ends overlap, keeping the overlap once
+- drops chunks contained in, or nearly identical to, a better-ranked one
+- keeps sections in retrieval rank order until the token budget is spent
+Tokens are counted locally with the embedding model's tokenizer (an estimate of the
+LLM's count, good enough for budgeting), or ~4 chars per token without one.
+"""
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional, Tuple
+import copy
+import re
+
+from langchain_core.documents import Document
+
+MIN_OVERLAP = 20  # shortest shared text treated as splitter overlap rather than coincidence
+MAX_OVERLAP = 200  # chunk_overlap is 100 chars; allow for whitespace the splitter kept
+NEAR_DUPLICATE_RATIO = 0.9
+MIN_TRIMMED_TOKENS = 32  # a shorter tail of the last section is dropped rather than sent
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def token_counter(embeddings) -> Callable[[str], int]:
+    """
+    Token count function from the embedding model's tokenizer, falling back to an estimate.
+    Uses a private copy of the tokenizer so counting never races the embedding threads.
+    """
+    model = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return estimate_tokens
+    tokenizer = copy.deepcopy(tokenizer)
+    return lambda text: len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+
+def overlap_length(first: str, second: str) -> int:
+    """Length of the longest end of `first` that `second` starts with (0 below MIN_OVERLAP)"""
+    for length in range(min(len(first), len(second), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+def _is_redundant(text: str, kept: SequenceMatcher) -> bool:
+    """Whether text is inside, or nearly identical to, the kept section (the matcher's second sequence)"""
+    if text in kept.b:
+        return True
+    kept.set_seq1(text)
+    # Cheap upper bounds first: most pairs fail on length or character counts
+    return (kept.real_quick_ratio() >= NEAR_DUPLICATE_RATIO and kept.quick_ratio() >= NEAR_DUPLICATE_RATIO
+            and kept.ratio() >= NEAR_DUPLICATE_RATIO)
+
+
+def merge_sections(docs: List[Document]) -> List[Tuple[str, List[Document]]]:
+    """
+    Texts to send, best-ranked first: same-page overlapping chunks joined, redundant ones dropped.
+    Each text comes with the chunks it was built from, in retrieval order.
+    """
+    # [(book_id, page), text, chunks], in the order of each section's best-ranked chunk
+    sections: List[list] = []
+    for doc in docs:
+        text = doc.page_content.strip()
+        location = (doc.metadata.get("book_id"), doc.metadata.get("page"))
+        for section in sections:
+            if section[0] != location:
+                continue
+            overlap = overlap_length(section[1], text)
+            if overlap:
+                section[1] = section[1] + text[overlap:]
+                section[2].append(doc)
+                break
+            overlap = overlap_length(text, section[1])
+            if overlap:
+                section[1] = text + section[1][overlap:]
+                section[2].append(doc)
+                break
+        else:
+            sections.append([location, text, [doc]])
+
+    # One matcher per kept section, so its index of the section text is built once
+    kept: List[Tuple[SequenceMatcher, List[Document]]] = []
+    for _, text, section_docs in sections:
+        if not any(_is_redundant(text, other) for other, _ in kept):
+            kept.append((SequenceMatcher(None, b=text, autojunk=False), section_docs))
+    return [(matcher.b, section_docs) for matcher, section_docs in kept]
+
+
+def _trim(text: str, tokens: int, budget: int) -> str:
+    """Cut text to roughly `budget` tokens, at a sentence (else word) boundary"""
+    cut = text[:len(text) * budget // tokens]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    return re.sub(r"\s+\S*$", "", cut)
+
+
+def assemble_context(docs: List[Document], count_tokens: Callable[[str], int], token_budget: int = 0,
+                     header: Optional[Callable[[int, Document], str]] = None) -> Tuple[str, List[List[Document]], Dict]:
+    """
+    Prompt context from retrieved chunks (in retrieval order) and its token accounting.
+
+    Args:
+        docs: Retrieved chunks, best first
+        count_tokens: Token count function (see token_counter)
+        token_budget: Most tokens of context to send; 0 = no limit
+        header: Label line for the n-th section (from 1), given its best-ranked chunk;
+                counted against the budget
+
+    Returns: (context, the chunks each section in the context was built from,
+              {"sections", "tokens_before", "tokens_after", "tokens_saved"})
+    Chunks dropped as redundant or over budget are in neither, so sources built from
+    the kept chunks match what the LLM saw.
+    """
+    tokens_before = count_tokens("\n\n".join(doc.page_content for doc in docs)) if docs else 0
+    parts: List[str] = []
+    kept: List[List[Document]] = []
+    used = 0
+    for text, section_docs in merge_sections(docs):
+        label = f"{header(len(parts) + 1, section_docs[0])}\n" if header else ""
+        tokens = count_tokens(label + text)
+        remaining = token_budget - used
+        if token_budget and tokens > remaining:
+            # Always send something, even if the best section alone is over budget
+            if remaining >= MIN_TRIMMED_TOKENS or not parts:
+                text_tokens = count_tokens(text)
+                budget = max(remaining - (tokens - text_tokens), MIN_TRIMMED_TOKENS)
+                parts.append(label + _trim(text, text_tokens, budget))
+                kept.append(section_docs)
+            break
+        parts.append(label + text)
+        kept.append(section_docs)
+        used += tokens
+    context = "\n\n".join(parts)
+    tokens_after = count_tokens(context) if context else 0
+    return context, kept, {
+        "sections": len(parts),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after
+    }
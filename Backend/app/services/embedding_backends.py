@@ -0,0 +1,150 @@
+"""
+Selectable embedding backends for RAG
+- torch: sentence-transformers on full-precision PyTorch (the original setup)
+- onnx: the same model exported to ONNX Runtime
+- onnx-int8: ONNX Runtime with dynamically int8-quantized weights
+
+All backends are LangChain `Embeddings` (embed_documents / embed_query), so
+RAGService, Chroma and the embedding cache don't care which one is active.
+ONNX backends need `pip install sentence-transformers[onnx]` (optimum + onnxruntime).
+"""
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+from typing import Dict, List, Optional, Sequence
+import logging
+import math
+import os
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Files written by sentence-transformers' export_dynamic_quantized_onnx_model (and shipped
+# pre-built in the sentence-transformers/* Hub repos) for each quantization config
+QUANTIZED_FILES = {
+    "arm64": "onnx/model_qint8_arm64.onnx",
+    "avx2": "onnx/model_quint8_avx2.onnx",
+    "avx512": "onnx/model_qint8_avx512.onnx",
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+}
+
+# Fixed sample used by the startup parity check
+PARITY_SAMPLE = [
+    "Normalization decomposes relations to remove update anomalies.",
+    "A B-tree index keeps keys sorted so lookups touch few disk pages.",
+    "Two-phase locking guarantees conflict serializable schedules.",
+    "Photosynthesis converts light energy into chemical energy in plants.",
+    "The French Revolution began in 1789 with the storming of the Bastille.",
+    "What is the difference between a process and a thread?",
+]
+
+
+def embedding_model_id(model_name: str, backend: str, quantization: str) -> str:
+    """
+    Identity of the vectors a backend produces, used to namespace the embedding cache.
+    Quantized vectors differ slightly from PyTorch ones, so they must not share entries.
+    """
+    if backend == "torch":
+        return model_name
+    if backend == "onnx-int8":
+        return f"{model_name}@onnx-int8-{quantization}"
+    return f"{model_name}@{backend}"
+
+
+def _quantized_model_kwargs(model_name: str, quantization: str, export_dir: str) -> Dict:
+    """
+    model_kwargs for an int8 ONNX model: use the pre-quantized file when the model
+    repo ships one, otherwise quantize once into export_dir and load it from there.
+    """
+    file_name = QUANTIZED_FILES[quantization]
+    if os.path.isdir(model_name):
+        shipped = os.path.exists(os.path.join(model_name, file_name))
+    else:
+        try:
+            from huggingface_hub import file_exists
+            shipped = file_exists(model_name, file_name)
+        except Exception as e:
+            logging.warning(f"Could not check {model_name} for {file_name}: {str(e)}")
+            shipped = False
+    if shipped:
+        return {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+    local_path = os.path.join(export_dir, model_name.replace("/", "__"))
+    if not os.path.exists(os.path.join(local_path, file_name)):
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        logging.info(f"No pre-quantized {file_name} for {model_name}, quantizing into {local_path}")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(local_path)
+        export_dynamic_quantized_onnx_model(model, quantization, local_path)
+    return {"model_name": local_path, "backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+
+def create_embeddings(
+    model_name: str,
+    backend: str = "torch",
+    quantization: str = "avx2",
+    batch_size: int = 64,
+    export_dir: str = "static/embedding_models",
+    intra_op_threads: Optional[int] = None
+) -> Embeddings:
+    """
+    Build the embedding model for a backend (see module docstring).
+
+    Args:
+        model_name: sentence-transformers model name or local path
+        backend: One of BACKENDS
+        quantization: int8 kernel set for onnx-int8 (arm64 / avx2 / avx512 / avx512_vnni)
+        batch_size: Encode batch size
+        export_dir: Where locally quantized models are written
+        intra_op_threads: Thread cap for ONNX Runtime sessions (torch threads are process-wide,
+            set them with torch.set_num_threads)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "onnx-int8" and quantization not in QUANTIZED_FILES:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {', '.join(QUANTIZED_FILES)}")
+
+    model_kwargs = {"device": "cpu"}  # Use 'cuda' if you have GPU (torch backend)
+    if backend == "onnx":
+        model_kwargs["backend"] = "onnx"
+    elif backend == "onnx-int8":
+        options = _quantized_model_kwargs(model_name, quantization, export_dir)
+        model_name = options.pop("model_name", model_name)
+        model_kwargs.update(options)
+    if backend != "torch" and intra_op_threads:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = intra_op_threads
+        session_options.inter_op_num_threads = 1
+        model_kwargs.setdefault("model_kwargs", {})["session_options"] = session_options
+
+    logging.info(f"Loading embedding model {model_name} ({backend})")
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size}
+    )
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def check_parity(reference: Embeddings, candidate: Embeddings, texts: List[str] = PARITY_SAMPLE,
+                 tolerance: float = 0.01) -> Dict:
+    """
+    Compare a candidate backend against the reference (PyTorch) output.
+    Passes when every document and query vector has cosine similarity >= 1 - tolerance.
+    """
+    pairs = list(zip(reference.embed_documents(texts), candidate.embed_documents(texts)))
+    pairs.append((reference.embed_query(texts[0]), candidate.embed_query(texts[0])))
+    similarities = [cosine_similarity(a, b) for a, b in pairs]
+
+    return {
+        "passed": min(similarities) >= 1 - tolerance,
+        "min_cosine": round(min(similarities), 6),
+        "mean_cosine": round(sum(similarities) / len(similarities), 6),
+        "tolerance": tolerance
+    }
@@ -0,0 +1,105 @@
+"""
+Persistent, content-addressed embedding cache
+Chunk embeddings are stored in SQLite as packed float32 arrays, keyed by the
+embedding model name and a stable digest of the normalized chunk text, so
+reindexes and re-uploads only embed text that actually changed.
+"""
+from array import array
+from typing import Dict, Iterable, List, Sequence
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Canonical form of a chunk for hashing (unicode NFC, collapsed whitespace)"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize("NFC", text)).strip()
+
+
+def chunk_digest(text: str) -> str:
+    """
+    Stable content digest of a chunk.
+    Unlike built-in hash(), this is identical across processes and restarts.
+    """
+    return hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store shared by all processes on the host"""
+
+    def __init__(self, db_path: str, model_name: str):
+        self.db_path = db_path
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        # WAL lets the API process read while ingestion workers write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _pack(vector: Sequence[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up cached vectors; missing digests are simply absent from the result"""
+        digests = list(dict.fromkeys(digests))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(digests), 500):
+                batch = digests[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = self._unpack(blob)
+        return found
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]):
+        """Store vectors by digest (existing entries are overwritten)"""
+        if not vectors:
+            return
+        rows = [
+            (self.model_name, digest, len(vector), self._pack(vector))
+            for digest, vector in vectors.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, digest, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        """Number of vectors cached for the current model"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", [self.model_name]
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
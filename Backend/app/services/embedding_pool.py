@@ -0,0 +1,145 @@
+"""
+Multi-process embedding executor for bulk ingestion
+One PyTorch process does not scale across many cores (intra-op threading flattens
+out), so chunk batches are sharded across N worker processes. Each worker loads
+its own copy of the model with a pinned thread count and vectors are streamed
+back in submission order for upsert.
+
+Kept free of heavy top-level imports: spawned workers import this module and
+must pin their thread counts before torch spins up its thread pools.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+import logging
+import multiprocessing
+import os
+import time
+
+# Per-process model, loaded once by _init_worker
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, backend: str, quantization: str, batch_size: int, threads: int):
+    """Pool initializer: pin thread counts, then load this worker's model copy"""
+    global _worker_embeddings
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # only settable before the first parallel op; harmless if already fixed
+
+    from app.services.embedding_backends import create_embeddings
+    _worker_embeddings = create_embeddings(
+        model_name, backend, quantization, batch_size=batch_size, intra_op_threads=threads
+    )
+
+
+def _embed_shard(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class EmbeddingPool:
+    """Shards embed_documents calls across worker processes; vectors come back in input order"""
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        quantization: str = "avx2",
+        workers: int = 2,
+        threads_per_worker: Optional[int] = None,
+        shard_size: int = 64
+    ):
+        """
+        Args:
+            model_name: Embedding model every worker loads
+            backend / quantization: See embedding_backends.create_embeddings
+            workers: Worker processes (each holds a full model copy in RAM)
+            threads_per_worker: Pinned torch/ONNX threads per worker (default: cores / workers)
+            shard_size: Texts per task sent to a worker (also the encode batch size)
+        """
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.shard_size = shard_size
+        self.stats = {"chunks": 0, "seconds": 0.0}
+
+        logging.info(
+            f"Starting embedding pool: {self.workers} workers x {self.threads_per_worker} threads ({backend})"
+        )
+        # spawn (not fork): forked children would inherit the parent's torch thread pools
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, backend, quantization, shard_size, self.threads_per_worker)
+        )
+        # Load the models now so start-up isn't billed to the first book's throughput
+        for future in [self._executor.submit(_embed_shard, ["warm up"]) for _ in range(self.workers)]:
+            future.result()
+
+    def embed_stream(self, batches: Iterable[List[str]]) -> Iterator[List[List[float]]]:
+        """
+        Embed a stream of batches, yielding each batch's vectors in order.
+        Shards of upcoming batches stay queued (2 per worker) so workers keep going
+        while the caller upserts the previous batch. At most as many batches are read
+        ahead, empty ones included, so the caller's per-batch state stays bounded.
+        Throughput stats are wall-clock from the first submission to the last batch returned.
+        """
+        max_in_flight = self.workers * 2
+        pending = []  # (batch_index, future) in submission order
+        sizes: List[int] = []
+        results: Dict[int, List[List[float]]] = {}
+        next_batch = 0
+        iterator = iter(batches)
+        exhausted = False
+        stream_started = None
+        previous_seconds = self.stats["seconds"]
+
+        while True:
+            while not exhausted and len(pending) < max_in_flight and len(sizes) - next_batch < max_in_flight:
+                batch = next(iterator, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                if stream_started is None:
+                    stream_started = time.perf_counter()
+                index = len(sizes)
+                sizes.append(len(batch))
+                results[index] = []
+                # Spread each batch over all workers, capped at shard_size texts per task
+                shard = max(1, min(self.shard_size, -(-len(batch) // self.workers)))
+                for start in range(0, len(batch), shard):
+                    pending.append((index, self._executor.submit(_embed_shard, batch[start:start + shard])))
+
+            # Shards finish in submission order, so batches complete in order too
+            while next_batch < len(sizes) and len(results[next_batch]) == sizes[next_batch]:
+                vectors = results.pop(next_batch)
+                self.stats["chunks"] += len(vectors)
+                self.stats["seconds"] = previous_seconds + time.perf_counter() - stream_started
+                next_batch += 1
+                yield vectors
+
+            if not pending:
+                if exhausted:
+                    return
+                continue  # every batch read so far was empty and has been yielded
+            index, future = pending.pop(0)
+            results[index].extend(future.result())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch using all workers"""
+        if not texts:
+            return []
+        return next(self.embed_stream([texts]))
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.stats["chunks"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
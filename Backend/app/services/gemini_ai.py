@@ -3,7 +3,8 @@ AI service for generating book summaries, Q&A, and podcast scripts
 Using Hugging Face Inference API with Meta Llama 3.2 model
 """
 from huggingface_hub import InferenceClient
-from app.config.settings import HUGGINGFACE_API_TOKEN
+from app.config.settings import HUGGINGFACE_API_TOKEN, LLM_PROVIDER
+from app.services.llm_providers import stub_generate
 import json
 from typing import Dict, Any
 import os
@@ -67,6 +68,8 @@ def chunk_text(text: str, max_chunk_size: int = 8000) -> list[str]:
 
 def generate_with_hf(prompt: str, max_tokens: int = 4000, temperature: float = 0.7, max_retries: int = 3) -> str:
     """Generate text using Hugging Face Inference API with chat completion"""
+    if LLM_PROVIDER == "stub":
+        return stub_generate(prompt, max_tokens)
     
     for retry in range(max_retries):
         try:
@@ -0,0 +1,53 @@
+"""
+Hybrid retrieval: MMR vector search fused with BM25 by reciprocal rank fusion (RRF)
+Each list contributes 1 / (rrf_k + rank) per chunk, so chunks ranked well by either
+retriever rise to the top without calibrating BM25 scores against cosine distances.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from app.services.lexical_index import BM25Index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], rrf_k: int = 60) -> List[str]:
+    """Merge ranked key lists into one ranking, best first"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+def fuse_with_lexical(
+    query: str,
+    vector_docs: List[Document],
+    lexical_index: Optional[BM25Index],
+    fetch_documents: Callable[[List[str]], List[Document]],
+    k: int = 5,
+    lexical_k: int = 10,
+    rrf_k: int = 60
+) -> List[Document]:
+    """
+    Fuse already-retrieved vector results with the BM25 ranking for the query and return
+    the top k chunks. Falls back to vector results alone for books indexed before the
+    lexical index existed (lexical_index is None).
+
+    Args:
+        fetch_documents: chunk ids -> Documents, for chunks only BM25 found
+    """
+    if lexical_index is None:
+        return vector_docs[:k]
+
+    lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(query, lexical_k)]
+    # MMR results carry no ids; chunks are unique per book, so their text is the fusion key
+    by_text = {doc.page_content: doc for doc in vector_docs}
+    lexical_docs = fetch_documents(lexical_ids) if lexical_ids else []
+    for doc in lexical_docs:
+        by_text.setdefault(doc.page_content, doc)
+
+    fused = reciprocal_rank_fusion(
+        [[doc.page_content for doc in vector_docs], [doc.page_content for doc in lexical_docs]],
+        rrf_k
+    )
+    return [by_text[text] for text in fused[:k]]
@@ -0,0 +1,279 @@
+"""
+Background RAG indexing job queue
+Uploads enqueue a job row in MySQL; a separate worker process (`python worker.py`)
+claims jobs, runs `rag_service.process_pdf` and flips `Books.rag_indexed` when done.
+
+Separate worker processes need a shared Chroma server (RAG_CHROMA_HOST): an embedded
+PersistentClient never sees chunks another process wrote. Without one, jobs run on a
+background thread of the API process that queued them, and `worker.py` refuses to start.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal, engine
+from app.config.settings import INDEX_WORKER_POLL_INTERVAL, INDEX_JOB_STALE_AFTER, INDEX_JOB_MAX_ATTEMPTS
+from app.models.books import Books
+from app.models.index_job import IndexJob, IndexJobStatus
+from app.services.chroma_client import uses_chroma_server
+# The worker runs without the API app, so register every mapper Books relates to
+import app.models.borrow  # noqa: F401
+import app.models.users  # noqa: F401
+import app.models.static_content  # noqa: F401
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+import json
+import logging
+import time
+
+# Runs jobs inside the API process when no Chroma server is configured; one at a time
+inline_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-index")
+
+
+def create_index_job_table():
+    """
+    Create the `rag_index_jobs` table if it does not exist (the API and worker.py call this at
+    startup; docs/SETUP.md has the equivalent DDL for databases managed by hand)
+    """
+    try:
+        IndexJob.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        logging.error(f"Failed to create the rag_index_jobs table: {str(e)}")
+
+
+def enqueue_index_job(db: Session, book_id: int, pdf_path: str) -> IndexJob:
+    """Queue a book PDF for background RAG indexing and return the job record"""
+    job = IndexJob(book_id=book_id, pdf_path=pdf_path, status=IndexJobStatus.QUEUED)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logging.info(f"Queued RAG index job {job.job_id} for book {book_id}")
+    if not uses_chroma_server():
+        inline_runner.submit(run_inline_job, job.job_id)
+    return job
+
+
+def get_index_job(db: Session, book_id: int, job_id: int) -> Optional[IndexJob]:
+    """Get an indexing job, scoped to the book it belongs to"""
+    return db.query(IndexJob).filter(
+        IndexJob.job_id == job_id,
+        IndexJob.book_id == book_id
+    ).first()
+
+
+def serialize_index_job(job: IndexJob) -> Dict[str, Any]:
+    """Convert an indexing job into an API response dict"""
+    status = job.status.value if isinstance(job.status, IndexJobStatus) else job.status
+    return {
+        "job_id": job.job_id,
+        "book_id": job.book_id,
+        "status": status,
+        "stage": job.stage,
+        "progress": round((job.progress or 0.0) * 100, 1),  # percentage
+        "attempts": job.attempts,
+        "error": job.error,
+        "stats": json.loads(job.stats_json) if job.stats_json else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "status_url": f"/rag/books/{job.book_id}/index-jobs/{job.job_id}"
+    }
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Requeue RUNNING jobs whose worker stopped reporting progress (crashed/killed).
+    Jobs that already used all attempts are marked FAILED instead.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=INDEX_JOB_STALE_AFTER)
+    stale_jobs = db.query(IndexJob).filter(
+        IndexJob.status == IndexJobStatus.RUNNING,
+        IndexJob.updated_at < cutoff
+    ).with_for_update(skip_locked=True).all()
+
+    for job in stale_jobs:
+        if job.attempts >= INDEX_JOB_MAX_ATTEMPTS:
+            job.status = IndexJobStatus.FAILED
+            job.error = f"Worker stopped responding after {job.attempts} attempts"
+            job.finished_at = datetime.now(timezone.utc)
+        else:
+            job.status = IndexJobStatus.QUEUED
+            job.stage = None
+            job.progress = 0.0
+
+    db.commit()
+    if stale_jobs:
+        logging.warning(f"Recovered {len(stale_jobs)} stale RAG index jobs")
+    return len(stale_jobs)
+
+
+def claim_next_job(db: Session) -> Optional[IndexJob]:
+    """
+    Atomically claim the oldest queued job.
+    SKIP LOCKED lets several worker processes poll the same table safely.
+    """
+    job = db.query(IndexJob).filter(
+        IndexJob.status == IndexJobStatus.QUEUED
+    ).order_by(IndexJob.created_at, IndexJob.job_id).with_for_update(skip_locked=True).first()
+
+    if not job:
+        db.commit()  # release the (empty) locking transaction
+        return None
+    return _mark_running(db, job)
+
+
+def claim_job(db: Session, job_id: int) -> Optional[IndexJob]:
+    """Atomically claim one queued job; None if it is gone or already claimed"""
+    job = db.query(IndexJob).filter(
+        IndexJob.job_id == job_id,
+        IndexJob.status == IndexJobStatus.QUEUED
+    ).with_for_update(skip_locked=True).first()
+
+    if not job:
+        db.commit()
+        return None
+    return _mark_running(db, job)
+
+
+def _mark_running(db: Session, job: IndexJob) -> IndexJob:
+    job.status = IndexJobStatus.RUNNING
+    job.attempts += 1
+    job.stage = "starting"
+    job.progress = 0.0
+    job.error = None
+    job.started_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_index_job(job_id: int) -> Dict[str, Any]:
+    """Run a claimed job to completion, recording progress and the final outcome"""
+    # Imported lazily so the API process doesn't need the worker-side import path
+    from app.services.rag_service import rag_service
+
+    db = SessionLocal()
+    try:
+        job = db.query(IndexJob).filter(IndexJob.job_id == job_id).first()
+        if not job:
+            raise ValueError(f"Index job {job_id} not found")
+
+        last_write = 0.0
+
+        def report_progress(stage: str, fraction: float):
+            """Persist progress, throttled to one write per second unless the stage changes"""
+            nonlocal last_write
+            now = time.time()
+            if stage == job.stage and now - last_write < 1.0:
+                return
+            job.stage = stage
+            job.progress = max(0.0, min(fraction, 1.0))
+            db.commit()
+            last_write = now
+
+        logging.info(f"Running RAG index job {job_id} for book {job.book_id}")
+        try:
+            result = rag_service.process_pdf(job.pdf_path, job.book_id, progress_callback=report_progress)
+        except Exception as e:
+            result = {"success": False, "error": f"PDF processing failed: {str(e)}"}
+
+        job.finished_at = datetime.now(timezone.utc)
+        if result.get("success"):
+            job.status = IndexJobStatus.COMPLETED
+            job.stage = "done"
+            job.progress = 1.0
+            job.stats_json = json.dumps(result)
+            db.query(Books).filter(Books.book_id == job.book_id).update({"rag_indexed": 1})
+            logging.info(f"✓ RAG index job {job_id} completed: {result.get('unique_chunks', 0)} chunks")
+        else:
+            job.status = IndexJobStatus.FAILED
+            job.error = result.get("error", "Unknown error")
+            logging.error(f"✗ RAG index job {job_id} failed: {job.error}")
+
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_inline_job(job_id: int):
+    """Claim and run a job in this process (embedded Chroma mode)"""
+    db = SessionLocal()
+    try:
+        job = claim_job(db, job_id)
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Failed to claim RAG index job {job_id}: {str(e)}")
+        job = None
+    finally:
+        db.close()
+
+    if job:
+        try:
+            run_index_job(job_id)
+        except Exception as e:
+            logging.exception(f"RAG index job {job_id} crashed: {str(e)}")
+
+
+def resume_inline_jobs() -> int:
+    """
+    Embedded Chroma mode, at API startup: run the jobs left queued by a previous process
+    and requeue the ones it was running when it stopped
+    """
+    if uses_chroma_server():
+        return 0
+    db = SessionLocal()
+    try:
+        requeue_stale_jobs(db)
+        job_ids = [job_id for (job_id,) in db.query(IndexJob.job_id).filter(
+            IndexJob.status == IndexJobStatus.QUEUED
+        ).order_by(IndexJob.created_at, IndexJob.job_id).all()]
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Failed to resume RAG index jobs: {str(e)}")
+        return 0
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        inline_runner.submit(run_inline_job, job_id)
+    if job_ids:
+        logging.info(f"Resumed {len(job_ids)} queued RAG index jobs")
+    return len(job_ids)
+
+
+def run_worker(poll_interval: float = INDEX_WORKER_POLL_INTERVAL, once: bool = False):
+    """
+    Worker loop: recover stale jobs, claim the next queued job and run it.
+    With once=True the loop exits when the queue is empty (useful for cron/tests).
+    """
+    if not uses_chroma_server():
+        logging.error("RAG_CHROMA_HOST is not set: API processes would keep querying the previous chunks of "
+                      "books this worker indexes, so jobs run inside the API process instead. "
+                      "Start a Chroma server to use background workers (see app/services/chroma_client.py)")
+        return
+    create_index_job_table()
+    logging.info(f"RAG index worker started (poll interval {poll_interval}s)")
+    while True:
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db)
+            job = claim_next_job(db)
+        except Exception as e:
+            db.rollback()
+            logging.error(f"Failed to claim RAG index job: {str(e)}")
+            job = None
+        finally:
+            db.close()
+
+        if job:
+            try:
+                run_index_job(job.job_id)
+            except Exception as e:
+                logging.exception(f"RAG index job {job.job_id} crashed: {str(e)}")
+            continue
+
+        if once:
+            return
+        time.sleep(poll_interval)
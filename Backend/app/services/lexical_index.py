@@ -0,0 +1,102 @@
+"""
+Per-book BM25 inverted index
+Dense retrieval blurs exact terms - formula names, section numbers, acronyms - so
+process_pdf also writes a lexical index of the book's chunks. It is saved as
+gzipped JSON next to the vector store and queried by the hybrid retriever.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import gzip
+import json
+import math
+import os
+import re
+
+INDEX_VERSION = 1
+
+# Keeps dotted/hyphenated terms whole ("3.2.1", "b-tree", "utf-8") and also indexes their parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from has have how if in into is it its "
+    "of on or so than that the their then there these this those to was were what when where "
+    "which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[._\-/]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk ids; postings map term -> flat [doc index, term frequency, doc index, ...]"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+
+    def add(self, chunk_id: str, text: str):
+        tokens = tokenize(text)
+        index = len(self.ids)
+        self.ids.append(chunk_id)
+        self.lengths.append(len(tokens))
+        for term, frequency in Counter(tokens).items():
+            self.postings.setdefault(term, []).extend((index, frequency))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def idf(self, term: str) -> float:
+        frequency = len(self.postings.get(term, ())) // 2
+        return math.log(1 + (len(self.ids) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, score), best first"""
+        if not self.ids:
+            return []
+        average_length = sum(self.lengths) / len(self.lengths) or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for index, frequency in zip(postings[::2], postings[1::2]):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / average_length)
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[index], score) for index, score in best]
+
+    def save(self, path: str):
+        """Write atomically (temp file + rename) so queries never read a torn index"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION, "k1": self.k1, "b": self.b,
+                "ids": self.ids, "lengths": self.lengths, "postings": self.postings
+            }, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """The saved index, or None if it is missing or from an older format"""
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids, index.lengths, index.postings = data["ids"], data["lengths"], data["postings"]
+        return index
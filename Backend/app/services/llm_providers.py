@@ -0,0 +1,141 @@
+"""
+Selectable LLM providers
+- live: the hosted models (Gemini for RAG answers, Hugging Face Llama for summaries / Q&A / podcasts)
+- stub: a local stand-in that returns deterministic text after a simulated delay, so load tests,
+  profiling and CI exercise the whole pipeline without API keys or network access
+
+The stub derives everything from the prompt: the same prompt always gets the same text and
+the same delay, while different prompts spread over the configured latency distribution
+(log-normal around LLM_STUB_LATENCY_MS) and then "generate" at LLM_STUB_TOKENS_PER_SECOND.
+Prompts asking for a JSON object (the Q&A generator) get a JSON object back.
+"""
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.config.settings import (
+    LLM_PROVIDER, LLM_STUB_LATENCY_MS, LLM_STUB_LATENCY_SIGMA,
+    LLM_STUB_TOKENS_PER_SECOND, LLM_STUB_RESPONSE_TOKENS
+)
+
+PROVIDERS = ("live", "stub")
+
+FILLER_WORDS = "the book explains this concept with examples and relates it to earlier chapters".split()
+
+
+def _rng(prompt: str) -> random.Random:
+    return random.Random(hashlib.sha256(prompt.encode()).digest())
+
+
+def stub_completion(prompt: str, max_tokens: int = LLM_STUB_RESPONSE_TOKENS) -> str:
+    """Deterministic text for a prompt: words drawn from the prompt itself, in sentences"""
+    rng = _rng(prompt)
+    vocabulary = re.findall(r"[A-Za-z][A-Za-z'-]{2,}", prompt[-4000:]) or FILLER_WORDS
+    words = [rng.choice(vocabulary).lower() for _ in range(min(max_tokens, LLM_STUB_RESPONSE_TOKENS))]
+    sentences = []
+    for start in range(0, len(words), 12):
+        sentence = " ".join(words[start:start + 12])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+    text = " ".join(sentences)
+    if "JSON" in prompt and '"question"' in prompt:
+        return json.dumps({"question": f"{sentences[0][:-1]}?" if sentences else "Question?", "answer": text})
+    return text
+
+
+def stub_delays(prompt: str, latency_ms: float = LLM_STUB_LATENCY_MS,
+                latency_sigma: float = LLM_STUB_LATENCY_SIGMA,
+                tokens_per_second: float = LLM_STUB_TOKENS_PER_SECOND) -> Tuple[float, float]:
+    """(seconds to the first token, seconds per further token) for a prompt"""
+    first_token = latency_ms / 1000
+    if latency_sigma > 0:
+        first_token *= math.exp(latency_sigma * _rng(prompt).gauss(0, 1))
+    per_token = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+    return first_token, per_token
+
+
+def stub_generate(prompt: str, max_tokens: int = LLM_STUB_RESPONSE_TOKENS) -> str:
+    """Blocking stub call, timed like a non-streaming API request"""
+    text = stub_completion(prompt, max_tokens)
+    first_token, per_token = stub_delays(prompt)
+    time.sleep(first_token + per_token * len(text.split()))
+    return text
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+class StubChatModel(BaseChatModel):
+    """LangChain chat model backed by stub_completion (invoke / ainvoke / astream)"""
+
+    latency_ms: float = LLM_STUB_LATENCY_MS
+    latency_sigma: float = LLM_STUB_LATENCY_SIGMA
+    tokens_per_second: float = LLM_STUB_TOKENS_PER_SECOND
+    response_tokens: int = LLM_STUB_RESPONSE_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _pieces(self, messages: List[BaseMessage]) -> Tuple[List[str], float, float]:
+        prompt = _prompt_text(messages)
+        words = stub_completion(prompt, self.response_tokens).split(" ")
+        pieces = [word + " " for word in words[:-1]] + words[-1:]
+        first_token, per_token = stub_delays(prompt, self.latency_ms, self.latency_sigma, self.tokens_per_second)
+        return pieces, first_token, per_token
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        pieces, first_token, per_token = self._pieces(messages)
+        time.sleep(first_token + per_token * len(pieces))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(pieces)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        pieces, first_token, per_token = self._pieces(messages)
+        await asyncio.sleep(first_token + per_token * len(pieces))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(pieces)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        pieces, first_token, per_token = self._pieces(messages)
+        time.sleep(first_token)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(per_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        pieces, first_token, per_token = self._pieces(messages)
+        await asyncio.sleep(first_token)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(per_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+def create_chat_model(provider: str = LLM_PROVIDER) -> BaseChatModel:
+    """The chat model RAG answers are generated with"""
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}', expected one of {', '.join(PROVIDERS)}")
+    if provider == "stub":
+        return StubChatModel()
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model="models/gemini-2.5-flash",
+        temperature=0.5  # Balance creativity and accuracy
+    )
@@ -0,0 +1,97 @@
+"""
+Near-duplicate chunk detection with MinHash + LSH
+Each chunk gets a MinHash signature over word shingles; signatures are split into
+bands and bucketed, so a new chunk is only compared against chunks sharing a band
+bucket. That keeps deduplication roughly linear in the number of chunks instead of
+the O(n²) pairwise SequenceMatcher comparison.
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import numpy as np
+import re
+import zlib
+
+
+@lru_cache(maxsize=None)
+def _optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows <= num_perm minimising false positive +
+    false negative probability mass around the Jaccard threshold.
+    """
+    def integrate(f, a, b, steps=100):
+        width = (b - a) / steps
+        return sum(f(a + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positive = integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+        false_negative = integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+        error = false_positive + false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHashDeduplicator:
+    """Streaming near-duplicate filter: call is_duplicate() once per chunk, in order"""
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _optimal_bands(threshold, num_perm)
+
+        # Multiply-shift universal hashing: h(x) = (a*x + b mod 2^64) >> 32, with a odd
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 62, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 62, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [dict() for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = re.findall(r'\w+', text.lower())
+        if len(words) < self.shingle_size:
+            words = words + [""] * (self.shingle_size - len(words))
+        shingles = {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of the text's word shingles"""
+        shingles = self._shingles(text)
+        with np.errstate(over="ignore"):  # uint64 wrap-around is the modulus
+            hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def estimated_jaccard(sig1: np.ndarray, sig2: np.ndarray) -> float:
+        return float(np.mean(sig1 == sig2))
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        True if the text is a near-duplicate (estimated Jaccard >= threshold) of a chunk
+        seen earlier; otherwise the text is remembered and False is returned.
+        """
+        sig = self.signature(text)
+        band_keys = [
+            sig[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        for candidate in candidates:
+            if self.estimated_jaccard(sig, self._signatures[candidate]) >= self.threshold:
+                return True
+
+        index = len(self._signatures)
+        self._signatures.append(sig)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return False
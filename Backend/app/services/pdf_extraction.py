@@ -0,0 +1,135 @@
+"""
+Parallel PDF page extraction for RAG ingestion
+Splits the page range of a PDF across a process pool, extracts and cleans text
+in the workers and yields LangChain documents back in page order.
+
+Kept free of heavy imports (torch, Chroma, LLM clients) because spawned
+worker processes import this module.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+from pypdf import PdfReader
+from typing import Iterator, List, Optional, Tuple
+import multiprocessing
+import logging
+import os
+import re
+
+
+def clean_text(text: str) -> str:
+    """Remove noise from PDF text (headers, footers, metadata)"""
+    # Remove common header/footer patterns
+    text = re.sub(r'(Chapter|Section)\s*\d+.*?\n', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'Page\s*\d+', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\d+\s*/\s*\d+', '', text)  # Page numbers like "5 / 111"
+
+    # Remove metadata noise
+    text = re.sub(r'©.*?\d{4}', '', text)  # Copyright
+    text = re.sub(r'ISBN.*?\n', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\S+@\S+', '', text)  # Email addresses
+    text = re.sub(r'http[s]?://\S+', '', text)  # URLs
+
+    # Clean excessive whitespace
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+# Per-process reader cache so a worker handling several ranges of the same PDF parses it once
+_reader_cache: Tuple[Optional[str], Optional[float], Optional[PdfReader]] = (None, None, None)
+
+
+def _get_reader(pdf_path: str) -> PdfReader:
+    global _reader_cache
+    mtime = os.path.getmtime(pdf_path)
+    cached_path, cached_mtime, reader = _reader_cache
+    if cached_path != pdf_path or cached_mtime != mtime or reader is None:
+        reader = PdfReader(pdf_path)
+        _reader_cache = (pdf_path, mtime, reader)
+    return reader
+
+
+def _page_label(reader: PdfReader, page_number: int) -> str:
+    try:
+        return reader.page_labels[page_number]
+    except Exception:
+        return str(page_number + 1)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int, clean: bool = True) -> List[Tuple[int, str, str]]:
+    """
+    Extract (and by default clean) pages [start, end) of a PDF.
+    Runs inside pool workers; returns (page_number, page_label, text) tuples.
+    With clean=False the raw text keeps its line structure for cross-page stages.
+    """
+    reader = _get_reader(pdf_path)
+    pages = []
+    for page_number in range(start, min(end, len(reader.pages))):
+        text = (reader.pages[page_number].extract_text(extraction_mode="plain") or "").strip()
+        pages.append((page_number, _page_label(reader, page_number), clean_text(text) if clean else text))
+    return pages
+
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF"""
+    return len(_get_reader(pdf_path).pages)
+
+
+def iter_pages(
+    pdf_path: str,
+    max_workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    min_pages_for_pool: int = 32,
+    clean: bool = True
+) -> Iterator[Document]:
+    """
+    Yield cleaned (or raw, with clean=False) page documents in page order.
+
+    Page ranges are farmed out to a process pool; at most 2 ranges per worker are
+    in flight so memory stays bounded while results are reassembled in order.
+    Small PDFs (or max_workers <= 1) are extracted in-process to skip pool start-up.
+
+    Args:
+        pdf_path: Path of the PDF to extract
+        max_workers: Worker process count (default: CPU count)
+        pages_per_task: Pages per submitted range (default: spread ~4 ranges per worker)
+        min_pages_for_pool: Below this page count extraction stays in-process
+        clean: Run clean_text in the workers; pass False when a cross-page stage needs raw lines
+    """
+    total_pages = count_pages(pdf_path)
+    workers = max_workers or os.cpu_count() or 1
+
+    def to_documents(pages: List[Tuple[int, str, str]]) -> Iterator[Document]:
+        for page_number, page_label, text in pages:
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": pdf_path,
+                    "total_pages": total_pages,
+                    "page": page_number,
+                    "page_label": page_label
+                }
+            )
+
+    if workers <= 1 or total_pages < min_pages_for_pool:
+        step = pages_per_task or total_pages or 1
+        for start in range(0, total_pages, step):
+            yield from to_documents(extract_page_range(pdf_path, start, start + step, clean))
+        return
+
+    step = pages_per_task or max(1, -(-total_pages // (workers * 4)))
+    ranges = [(start, min(start + step, total_pages)) for start in range(0, total_pages, step)]
+    logging.info(f"Extracting {total_pages} pages with {workers} workers ({len(ranges)} ranges of {step} pages)")
+
+    # spawn (not fork): the parent may hold torch/Chroma threads that don't survive fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = []
+        next_range = 0
+        max_in_flight = workers * 2
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < max_in_flight:
+                start, end = ranges[next_range]
+                pending.append(executor.submit(extract_page_range, pdf_path, start, end, clean))
+                next_range += 1
+            # Results are consumed strictly in submission order -> page order is preserved
+            yield from to_documents(pending.pop(0).result())
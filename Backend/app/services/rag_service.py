@@ -3,23 +3,65 @@ RAG Service for Library Management System
 Handles PDF preprocessing, vector storage, and intelligent Q&A
 """
 
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.documents import Document
 from difflib import SequenceMatcher
-import re
 import os
-from typing import Dict
+from typing import AsyncIterator, Dict, Callable, Optional, Iterable, Iterator, List, Tuple
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import redis.asyncio as redis
+from redis import Redis
 import json
 import hashlib
 import asyncio
+import time
+import threading
+import numpy as np
+from app.config.settings import (
+    RAG_VECTORSTORE_DIR, RAG_SINGLE_COLLECTION, RAG_LIBRARY_COLLECTION,
+    RAG_EMBEDDING_MODEL, RAG_EMBEDDING_BACKEND, RAG_EMBEDDING_QUANTIZATION,
+    RAG_EMBEDDING_PARITY_CHECK, RAG_EMBEDDING_PARITY_TOLERANCE, RAG_EMBEDDING_CACHE_ENABLED, RAG_EMBEDDING_CACHE_PATH,
+    RAG_EXTRACT_WORKERS, RAG_EXTRACT_PAGES_PER_TASK, RAG_INGEST_BATCH_SIZE,
+    RAG_EMBED_WORKERS, RAG_EMBED_THREADS_PER_WORKER, RAG_EMBED_SHARD_SIZE,
+    RAG_NEAR_DEDUP_ENABLED, RAG_NEAR_DEDUP_THRESHOLD, RAG_NEAR_DEDUP_NUM_PERM,
+    RAG_BOILERPLATE_FILTER_ENABLED, RAG_BOILERPLATE_BAND_LINES, RAG_BOILERPLATE_MIN_PAGE_FRACTION,
+    RAG_PAGE_STAGE_WINDOW, RAG_VECTORSTORE_CACHE_SIZE,
+    RAG_QUERY_THREADS, RAG_LLM_MAX_CONCURRENCY,
+    RAG_SEMANTIC_CACHE_ENABLED, RAG_SEMANTIC_CACHE_THRESHOLD, RAG_SEMANTIC_CACHE_MAX_ENTRIES,
+    RAG_SINGLE_FLIGHT_ENABLED, RAG_SINGLE_FLIGHT_LOCK_TTL, RAG_SINGLE_FLIGHT_POLL_MS,
+    RAG_HYBRID_RETRIEVAL, RAG_LEXICAL_INDEX_DIR, RAG_HYBRID_RRF_K, RAG_LEXICAL_CACHE_SIZE,
+    RAG_PASSAGE_CACHE_SIZE, RAG_PASSAGE_CACHE_TTL, RAG_BATCH_LLM_CONCURRENCY, RAG_CONTEXT_TOKEN_BUDGET
+)
+from app.services.boilerplate_filter import RepeatedLineFilter
+from app.services.chroma_client import create_chroma_client
+from app.services.embedding_backends import create_embeddings, check_parity, embedding_model_id
+from app.services.embedding_cache import EmbeddingCache, chunk_digest
+from app.services.embedding_pool import EmbeddingPool
+from app.services.hybrid_retrieval import fuse_with_lexical
+from app.services.lexical_index import BM25Index
+from app.services.near_dedup import MinHashDeduplicator
+from app.services.pdf_extraction import clean_text, count_pages, iter_pages
+from app.services.semantic_cache import SemanticCache
+from app.services.context_assembler import assemble_context, token_counter
+from app.services.llm_providers import create_chat_model
+from app.services.cache_versions import (
+    aget_generation, aget_generations, abump_generation, bump_generation, get_generation,
+    start_invalidation_listener
+)
+from app.utils.lru_cache import LRUCache
+
+# MMR settings shared by single, batch and multi-book retrieval
+MMR_LAMBDA_MULT = 0.7  # 70% relevance, 30% diversity
+MMR_FETCH_FACTOR = 3  # candidates fetched per chunk returned
+
+LLM_CALLS_KEY = "rag_stats:llm_calls"  # LLM calls made by every API process since Redis was emptied
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(lineno)d - %(message)s',
@@ -42,24 +84,88 @@ class RAGService:
         # Local embeddings - FASTEST option with good accuracy
         # all-MiniLM-L6-v2: 2x faster (384 dim), excellent for speed
         # all-mpnet-base-v2: Slower (768 dim), slightly better accuracy - STANDARD
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2",
-            model_kwargs={'device': 'cpu'},  # Use 'cuda' if you have GPU
-            encode_kwargs={'normalize_embeddings': True, 'batch_size': 64}  # Maximum batch size for speed
+        # RAG_EMBEDDING_BACKEND: torch (default), onnx or onnx-int8 (faster on CPU-only nodes)
+        backend = RAG_EMBEDDING_BACKEND
+        self.embeddings = create_embeddings(RAG_EMBEDDING_MODEL, backend, RAG_EMBEDDING_QUANTIZATION)
+        if backend != "torch" and RAG_EMBEDDING_PARITY_CHECK:
+            reference = create_embeddings(RAG_EMBEDDING_MODEL, "torch")
+            parity = check_parity(reference, self.embeddings, tolerance=RAG_EMBEDDING_PARITY_TOLERANCE)
+            logging.info(f"Embedding parity {backend} vs torch: {parity}")
+            if not parity["passed"]:
+                logging.warning(f"{backend} embeddings drift beyond tolerance, falling back to torch")
+                self.embeddings, backend = reference, "torch"
+        self.embedding_backend = backend
+        self.count_tokens = token_counter(self.embeddings)  # local token counts for the context budget
+        
+        # Content-addressed embedding cache shared across reindexes/re-uploads (namespaced per backend)
+        self.embedding_cache = EmbeddingCache(
+            RAG_EMBEDDING_CACHE_PATH,
+            embedding_model_id(RAG_EMBEDDING_MODEL, backend, RAG_EMBEDDING_QUANTIZATION)
+        ) if RAG_EMBEDDING_CACHE_ENABLED else None
+        
+        # Multi-process embedding pool for bulk ingestion (lazy: only the indexing worker pays for it)
+        self.embedding_pool = None
+        # Ingestion parallelism; bulk ingest sets both to 1/0 in its workers (parallel across books instead)
+        self.extract_workers = RAG_EXTRACT_WORKERS
+        self.embed_workers = RAG_EMBED_WORKERS
+        
+        # Chunking: larger chunks = fewer chunks = faster processing, reduced overlap for speed
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=800,
+            chunk_overlap=100,
+            separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ": ", " ", ""],
+            length_function=len
         )
         
+        # Cross-page stages run on raw page text (line structure intact) before clean_text.
+        # Each stage exposes process(texts, stats) -> texts over a window of pages.
+        self.page_stages = []
+        if RAG_BOILERPLATE_FILTER_ENABLED:
+            self.page_stages.append(RepeatedLineFilter(
+                band_lines=RAG_BOILERPLATE_BAND_LINES,
+                min_page_fraction=RAG_BOILERPLATE_MIN_PAGE_FRACTION
+            ))
+        
         # Vector store directory
-        self.vectorstore_path = "static/vectordb"
+        self.vectorstore_path = RAG_VECTORSTORE_DIR
         os.makedirs(self.vectorstore_path, exist_ok=True)
         
-        # Redis client for caching
+        # One Chroma client for the process; per-book vectorstore handles are kept in an LRU
+        # and dropped when a book is reindexed or deleted
+        self.chroma_client = None
+        self.chroma_lock = threading.Lock()  # client and handle creation race when a cold worker gets a burst
+        self.vectorstores = LRUCache(RAG_VECTORSTORE_CACHE_SIZE)
+        self.lexical_indexes = LRUCache(RAG_LEXICAL_CACHE_SIZE)  # book_id -> (file mtime, BM25Index)
+        self.passages = LRUCache(RAG_PASSAGE_CACHE_SIZE)  # (book_id, generation, query, k) -> (stored at, result)
+        
+        # Query path stays off the event loop: blocking embedding/Chroma calls go to a bounded
+        # thread pool, the LLM is awaited natively and capped by a semaphore
+        self.query_executor = ThreadPoolExecutor(max_workers=RAG_QUERY_THREADS, thread_name_prefix="rag-query")
+        self.llm_semaphore = asyncio.Semaphore(RAG_LLM_MAX_CONCURRENCY)
+        self.llm_calls = 0
+        self.context_tokens_saved = 0
+        
+        # Identical questions in flight in this worker share one computation (cache key -> task)
+        self.inflight_queries: Dict[str, asyncio.Task] = {}
+        
+        # Redis client for caching (the sync one is for the indexer, which runs outside the event loop)
         self.redis_client = redis.Redis(host='localhost', port=6379, db=0)
+        self.sync_redis_client = Redis(host='localhost', port=6379, db=0)
         
-        # LLM for generation
-        self.llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0.5  # Balance creativity and accuracy
-        )
+        # Books are reindexed by other processes (the index worker), which publish a cache generation
+        # bump; a listener thread started with the first cached handle drops this process's entries
+        self.invalidation_listener = None
+        self.invalidations_subscribed = False
+        
+        # Answers of paraphrased questions, matched by question embedding
+        self.semantic_cache = SemanticCache(
+            self.redis_client,
+            threshold=RAG_SEMANTIC_CACHE_THRESHOLD,
+            max_entries=RAG_SEMANTIC_CACHE_MAX_ENTRIES
+        ) if RAG_SEMANTIC_CACHE_ENABLED else None
+        
+        # LLM for generation (Gemini, or the local stub with LLM_PROVIDER=stub)
+        self.llm = create_chat_model()
         
         # Library assistant prompt template
         self.prompt_template = """You are an intelligent library assistant helping students understand study materials. You have access to book excerpts and your own knowledge base.
@@ -78,128 +184,495 @@ Book Content:
 Student Question: {question}
 
 Comprehensive Answer (combining book content and relevant knowledge):"""
+        self.prompt = ChatPromptTemplate.from_template(self.prompt_template)
+        # {"context", "question"} -> answer; retrieval stays out of the chain so one retrieval
+        # feeds both the prompt context and the returned sources
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
+        
+        # Multi-book prompt: excerpts are numbered and labelled with their book so the answer can cite them
+        self.multi_book_prompt_template = """You are an intelligent library assistant helping students study a topic across several books. Each excerpt below is numbered and labelled with its book and page.
+
+Guidelines:
+1. **Primary Source**: Build the answer from the excerpts, and point out where the books differ
+2. **Citations**: Mark every statement taken from an excerpt with its number, e.g. [2]; cite several numbers when books agree
+3. **Fill Knowledge Gaps**: Use your own knowledge where the excerpts are incomplete, and say when you do
+4. **Educational Tone**: Explain as if teaching a student who wants deep understanding
+
+Book Excerpts:
+{context}
+
+Student Question: {question}
+
+Comprehensive Answer (with [n] citations):"""
+        self.multi_book_prompt = ChatPromptTemplate.from_template(self.multi_book_prompt_template)
+        self.multi_book_chain = self.multi_book_prompt | self.llm | StrOutputParser()
     
     def clean_text(self, text: str) -> str:
         """Remove noise from PDF text (headers, footers, metadata)"""
-        # Remove common header/footer patterns
-        text = re.sub(r'(Chapter|Section)\s*\d+.*?\n', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'Page\s*\d+', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'\d+\s*/\s*\d+', '', text)  # Page numbers like "5 / 111"
-        
-        # Remove metadata noise
-        text = re.sub(r'©.*?\d{4}', '', text)  # Copyright
-        text = re.sub(r'ISBN.*?\n', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'\S+@\S+', '', text)  # Email addresses
-        text = re.sub(r'http[s]?://\S+', '', text)  # URLs
-        
-        # Clean excessive whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return clean_text(text)
     
     def is_similar(self, text1: str, text2: str, threshold: float = 0.95) -> bool:
         """Check if two texts are similar (for deduplication) - using 0.95 to be less aggressive"""
         return SequenceMatcher(None, text1, text2).ratio() > threshold
     
-    def process_pdf(self, pdf_path: str, book_id: int) -> Dict:
+    def _collection_name(self, book_id: int) -> str:
+        """Chroma collection holding a book's chunks (the shared library collection in single-collection mode)"""
+        return RAG_LIBRARY_COLLECTION if RAG_SINGLE_COLLECTION else f"book_{book_id}"
+    
+    def _book_filter(self, book_id: int) -> Optional[Dict]:
+        """Chroma `where` filter scoping the collection to one book (None for per-book collections)"""
+        return {"book_id": book_id} if RAG_SINGLE_COLLECTION else None
+    
+    def _count_book_chunks(self, collection, book_id: int) -> int:
+        where = self._book_filter(book_id)
+        if where is None:
+            return collection.count()
+        return len(collection.get(where=where, include=[])["ids"])
+    
+    def _has_book_chunks(self, collection, book_id: int) -> bool:
+        """Whether a book has any chunk indexed; reads at most one id, unlike _count_book_chunks"""
+        where = self._book_filter(book_id)
+        if where is None:
+            return collection.count() > 0
+        return bool(collection.get(where=where, limit=1, include=[])["ids"])
+    
+    def _books_with_chunks(self, book_ids: List[int]) -> List[int]:
+        """Books of the shared library collection that have chunks (one limit=1 read each)"""
+        collection = self._get_vectorstore(book_ids[0])._collection
+        return [book_id for book_id in book_ids if self._has_book_chunks(collection, book_id)]
+    
+    def _get_client(self):
+        if self.chroma_client is None:
+            with self.chroma_lock:
+                if self.chroma_client is None:
+                    self.chroma_client = create_chroma_client(self.vectorstore_path)
+        return self.chroma_client
+    
+    def _get_vectorstore(self, book_id: int) -> Chroma:
+        """Cached Chroma handle for a book's collection (one shared handle in single-collection mode)"""
+        collection_name = self._collection_name(book_id)
+        vectorstore = self.vectorstores.get(collection_name)
+        if vectorstore is None:
+            self._ensure_invalidation_listener()
+            client = self._get_client()
+            with self.chroma_lock:
+                # Another thread may have opened it while this one waited
+                if collection_name in self.vectorstores:
+                    return self.vectorstores.get(collection_name)
+                vectorstore = Chroma(
+                    client=client,
+                    collection_name=collection_name,
+                    embedding_function=self.embeddings
+                )
+                self.vectorstores.put(collection_name, vectorstore)
+        return vectorstore
+    
+    def _assemble_sections(self, docs: List[Document],
+                           header: Optional[Callable[[int, Document], str]] = None) -> Tuple[str, List[List[Document]]]:
+        """
+        Prompt context from retrieved chunks (overlaps merged, duplicates dropped, trimmed to the
+        token budget) and the chunks behind each section it kept, which are the answer's sources
+        """
+        context, sections, stats = assemble_context(docs, self.count_tokens, RAG_CONTEXT_TOKEN_BUDGET, header)
+        self.context_tokens_saved += stats["tokens_saved"]
+        logging.info(f"RAG context: {len(docs)} chunks -> {stats['sections']} sections, "
+                     f"{stats['tokens_before']} -> {stats['tokens_after']} tokens ({stats['tokens_saved']} saved)")
+        return context, sections
+    
+    def _assemble_context(self, docs: List[Document]) -> Tuple[str, List[Document]]:
+        """Single-book context and the chunks it kept"""
+        context, sections = self._assemble_sections(docs)
+        return context, [doc for section in sections for doc in section]
+    
+    def _lexical_index_path(self, book_id: int) -> str:
+        return os.path.join(RAG_LEXICAL_INDEX_DIR, f"book_{book_id}.json.gz")
+    
+    def _get_lexical_index(self, book_id: int) -> Optional[BM25Index]:
+        """A book's BM25 index, reloaded when the indexer rewrote the file; None if it has none"""
+        path = self._lexical_index_path(book_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self.lexical_indexes.pop(book_id)
+            return None
+        cached = self.lexical_indexes.get(book_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        index = BM25Index.load(path)
+        self.lexical_indexes.put(book_id, (mtime, index))
+        return index
+    
+    def _fetch_chunks(self, book_id: int, chunk_ids: List[str]) -> List[Document]:
+        """Chunks by id, in the order asked for"""
+        found = self._get_vectorstore(book_id)._collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=document, metadata=metadata or {})
+            for chunk_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+    
+    def _fuse_lexical(self, book_id: int, num_chunks: int, question: str, docs: List[Document]) -> List[Document]:
+        """Fuse a wider MMR list with the book's BM25 ranking, keeping num_chunks"""
+        return fuse_with_lexical(
+            question,
+            docs,
+            self._get_lexical_index(book_id),
+            lambda chunk_ids: self._fetch_chunks(book_id, chunk_ids),
+            k=num_chunks,
+            lexical_k=num_chunks * 2,
+            rrf_k=RAG_HYBRID_RRF_K
+        )
+    
+    def _retrieve(self, book_id: int, num_chunks: int, question: str,
+                  vector: Optional[List[float]] = None, hybrid: Optional[bool] = None) -> List[Document]:
+        """
+        MMR retrieval for one question, fused with BM25 when hybrid retrieval is on
+        (RAG_HYBRID_RETRIEVAL unless given). Uses the question's vector when it was already
+        embedded (semantic cache lookup), and the same MMR as batch queries, so both return
+        the same chunks in MMR selection order.
+        """
+        if hybrid is None:
+            hybrid = RAG_HYBRID_RETRIEVAL
+        if vector is None:
+            vector = self.embeddings.embed_query(question)
+        # Hybrid retrieval fuses a wider vector list with the lexical one, then keeps num_chunks
+        [docs] = self._mmr_batch(book_id, [vector], num_chunks * 2 if hybrid else num_chunks)
+        return self._fuse_lexical(book_id, num_chunks, question, docs) if hybrid else docs
+    
+    def invalidate_book(self, book_id: int):
+        """Drop cached handles and passages of a book (after reindexing or deleting it)"""
+        if not RAG_SINGLE_COLLECTION:
+            self.vectorstores.pop(self._collection_name(book_id))
+        self.lexical_indexes.pop(book_id)
+        self.passages.pop_where(lambda key: key[0] == book_id)
+    
+    def _ensure_invalidation_listener(self):
+        if self.invalidation_listener is None:
+            with self.chroma_lock:
+                if self.invalidation_listener is None:
+                    self.invalidation_listener = start_invalidation_listener(
+                        self.sync_redis_client, self.invalidate_book, self._on_invalidation_subscription, "RAG service"
+                    )
+    
+    def _on_invalidation_subscription(self, subscribed: bool):
+        """Bumps published while unsubscribed were missed, so nothing cached may predate a resubscription"""
+        self.invalidations_subscribed = subscribed
+        if subscribed:
+            for cache in (self.vectorstores, self.lexical_indexes, self.passages):
+                cache.clear()
+    
+    async def _run_blocking(self, fn: Callable, *args):
+        """Run a blocking call (embedding, vector search) on the query thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.query_executor, fn, *args)
+    
+    async def _count_llm_call(self):
+        """Count an LLM call in this process and in the Redis total shared by all API processes"""
+        self.llm_calls += 1
+        try:
+            await self.redis_client.incr(LLM_CALLS_KEY)
+        except Exception as e:
+            logging.warning(f"Could not count LLM call in Redis: {str(e)}")
+    
+    async def cache_stats(self) -> Dict:
+        total_llm_calls = await self.redis_client.get(LLM_CALLS_KEY)
+        return {
+            "llm_calls": self.llm_calls,
+            "llm_calls_all_processes": int(total_llm_calls or 0),
+            "invalidations_subscribed": self.invalidations_subscribed,
+            "context_tokens_saved": self.context_tokens_saved,
+            "semantic": await self.semantic_cache.stats() if self.semantic_cache else None,
+            "vectorstores": self.vectorstores.stats(),
+            "passages": self.passages.stats()
+        }
+    
+    def _iter_page_stages(self, pages: Iterable[Document], stats: Dict) -> Iterator[Document]:
+        """
+        Run the cross-page stages over windows of raw pages, then clean each page.
+        Also counts the chunks the unfiltered pages would have produced, so the
+        stages' effect on chunk count can be reported.
+        """
+        for window in self._batched(pages, RAG_PAGE_STAGE_WINDOW):
+            texts = [page.page_content for page in window]
+            stats["chunks_before_page_stages"] += sum(
+                len(self.text_splitter.split_text(clean_text(text))) for text in texts
+            )
+            for stage in self.page_stages:
+                texts = stage.process(texts, stats)
+            for page, text in zip(window, texts):
+                page.page_content = clean_text(text)
+                yield page
+    
+    def _iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Split pages into overlapping chunks one page at a time (chunks never span pages)"""
+        for page in pages:
+            yield from self.text_splitter.split_documents([page])
+    
+    def _iter_unique_chunks(self, chunks: Iterable[Document], book_id: int, stats: Dict) -> Iterator[Document]:
+        """
+        Drop too-short chunks and exact duplicates, tagging survivors with the book_id.
+        Each survivor gets a content-addressed id, so unchanged text keeps its id across reindexes.
+        """
+        seen_hashes = set()  # Stable digests (built-in hash() is salted per process)
+        
+        for split in chunks:
+            stats["total_chunks"] += 1
+            content = split.page_content.strip()
+            
+            # Skip chunks that are too short
+            if len(content) < 50:
+                continue
+            
+            # Fast hash-based deduplication (exact matches only)
+            content_hash = chunk_digest(content.lower())
+            if content_hash in seen_hashes:
+                continue
+            
+            seen_hashes.add(content_hash)
+            split.id = f"book_{book_id}_{content_hash}"
+            split.metadata['book_id'] = book_id
+            yield split
+    
+    def _iter_without_near_duplicates(self, chunks: Iterable[Document], stats: Dict) -> Iterator[Document]:
+        """Drop chunks that are near-duplicates (MinHash/LSH) of an earlier chunk, e.g. repeated boilerplate"""
+        deduplicator = MinHashDeduplicator(threshold=RAG_NEAR_DEDUP_THRESHOLD, num_perm=RAG_NEAR_DEDUP_NUM_PERM)
+        for split in chunks:
+            if deduplicator.is_duplicate(split.page_content):
+                stats["near_duplicates"] += 1
+                continue
+            yield split
+    
+    def _get_embedding_pool(self) -> Optional[EmbeddingPool]:
+        """Embedding process pool for ingestion, started on first use (embed_workers > 1)"""
+        if self.embed_workers <= 1:
+            return None
+        if self.embedding_pool is None:
+            self.embedding_pool = EmbeddingPool(
+                RAG_EMBEDDING_MODEL,
+                backend=self.embedding_backend,
+                quantization=RAG_EMBEDDING_QUANTIZATION,
+                workers=self.embed_workers,
+                threads_per_worker=RAG_EMBED_THREADS_PER_WORKER or None,
+                shard_size=RAG_EMBED_SHARD_SIZE
+            )
+        return self.embedding_pool
+    
+    def _embed_stream(self, batches: Iterable[List[str]], stats: Dict) -> Iterator[List[List[float]]]:
+        """Run the model over a stream of text batches (pool if configured, else in-process)"""
+        pool = self._get_embedding_pool()
+        if pool is not None:
+            seconds_before = pool.stats["seconds"]
+            for vectors in pool.embed_stream(batches):
+                stats["embed_seconds"] = pool.stats["seconds"] - seconds_before
+                yield vectors
+            return
+        
+        for texts in batches:
+            started = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts) if texts else []
+            stats["embed_seconds"] += time.perf_counter() - started
+            yield vectors
+    
+    def _iter_embedded(self, batches: Iterable[List[str]], stats: Dict) -> Iterator[List[List[float]]]:
+        """
+        Embed a stream of text batches, yielding each batch's vectors in order.
+        Cached vectors are reused and only cache misses reach the model.
         """
-        Complete PDF processing pipeline:
-        1. Load PDF
-        2. Clean text (remove headers, footers, noise)
-        3. Chunk text intelligently
-        4. Deduplicate chunks (remove 85%+ similar)
-        5. Generate embeddings
-        6. Store in ChromaDB vector store
+        lookups = deque()  # (digests, vectors found in cache, indexes to embed) per batch in flight
+        
+        def misses() -> Iterator[List[str]]:
+            for texts in batches:
+                digests = [chunk_digest(text) for text in texts]
+                cached = self.embedding_cache.get_many(digests) if self.embedding_cache else {}
+                missing = [i for i, digest in enumerate(digests) if digest not in cached]
+                stats["cache_hits"] += len(texts) - len(missing)
+                stats["cache_misses"] += len(missing)
+                lookups.append((digests, cached, missing))
+                yield [texts[i] for i in missing]
+        
+        for new_vectors in self._embed_stream(misses(), stats):
+            digests, cached, missing = lookups.popleft()
+            fresh = {digests[i]: vector for i, vector in zip(missing, new_vectors)}
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(fresh)
+            cached.update(fresh)
+            yield [cached[digest] for digest in digests]
+    
+    @staticmethod
+    def _batched(items: Iterable, size: int) -> Iterator[List]:
+        """Group an iterable into lists of at most `size` items"""
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, size))
+            if not batch:
+                return
+            yield batch
+    
+    def process_pdf(self, pdf_path: str, book_id: int,
+                    progress_callback: Optional[Callable[[str, float], None]] = None) -> Dict:
+        """
+        Streaming, incremental PDF processing pipeline (memory bounded by batch size, not book size):
+        1. Load PDF pages (parallel extraction, yielded in page order)
+        2. Strip repeated running headers/footers across pages, clean text (remove noise)
+        3. Chunk text intelligently, page by page
+        4. Deduplicate chunks (exact matches, then MinHash/LSH near-duplicates)
+        5. Generate embeddings in fixed-size batches (optionally sharded across an embedding process pool)
+        6. Upsert new chunks into the ChromaDB collection, then delete chunks that vanished
+        7. Write the book's BM25 lexical index (for hybrid retrieval)
+        
+        Chunk ids are content hashes, so reindexing only embeds changed text and the
+        existing collection stays queryable throughout.
+        
+        Args:
+            pdf_path: Path of the uploaded PDF
+            book_id: ID of the book being indexed
+            progress_callback: Optional fn(stage, fraction) called as the pipeline advances
         
         Returns: Processing statistics
         """
+        def report(stage: str, fraction: float):
+            if progress_callback:
+                progress_callback(stage, fraction)
+        
         try:
-            # Step 1: Load PDF
+            # Step 1 & 2: Load PDF and clean text (page ranges extracted in parallel worker processes)
+            report("loading", 0.0)
             logging.info(f"Loading PDF from: {pdf_path}")
-            loader = PyPDFLoader(pdf_path)
-            docs = loader.load()
+            total_pages = count_pages(pdf_path)
             
-            if not docs:
+            if total_pages == 0:
                 logging.error("PDF loading failed or PDF is empty")
                 return {
                     "success": False,
                     "error": "Failed to load PDF or PDF is empty"
                 }
             
-            logging.info(f"Loaded {len(docs)} pages from PDF")
+            logging.info(f"Streaming {total_pages} pages through the ingestion pipeline")
+            stats = {
+                "pages": 0, "total_chunks": 0, "unique_chunks": 0,
+                "chunks_before_page_stages": 0, "boilerplate_lines_removed": 0,
+                "near_duplicates": 0, "chunks_added": 0, "chunks_unchanged": 0, "chunks_removed": 0,
+                "cache_hits": 0, "cache_misses": 0, "embed_seconds": 0.0
+            }
             
-            # Step 2: Clean text
-            for doc in docs:
-                doc.page_content = self.clean_text(doc.page_content)
+            def counted(pages: Iterable[Document]) -> Iterator[Document]:
+                for page in pages:
+                    stats["pages"] += 1
+                    yield page
             
-            # Step 3: Chunk text intelligently (optimized for speed and accuracy)
-            logging.info("Chunking text...")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=800,  # Larger chunks = fewer chunks = faster processing
-                chunk_overlap=100,  # Reduced overlap for speed
-                separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ": ", " ", ""],
-                length_function=len
-            )
-            splits = text_splitter.split_documents(docs)
-            logging.info(f"Created {len(splits)} chunks")
+            # Workers clean pages themselves unless cross-page stages need the raw lines first
+            pages = counted(iter_pages(
+                pdf_path,
+                max_workers=self.extract_workers,
+                pages_per_task=RAG_EXTRACT_PAGES_PER_TASK or None,
+                clean=not self.page_stages
+            ))
+            if self.page_stages:
+                pages = self._iter_page_stages(pages, stats)
             
-            # Step 4: Fast deduplication (optimized for speed)
-            logging.info("Deduplicating chunks...")
-            unique_splits = []
-            seen_hashes = set()  # Fast hash-based lookup
+            # Step 3 & 4: Chunk and deduplicate lazily - nothing is materialised beyond one batch
+            unique_chunks = self._iter_unique_chunks(self._iter_chunks(pages), book_id, stats)
+            if RAG_NEAR_DEDUP_ENABLED:
+                unique_chunks = self._iter_without_near_duplicates(unique_chunks, stats)
             
-            for split in splits:
-                content = split.page_content.strip()
-                
-                # Skip chunks that are too short
-                if len(content) < 50:
-                    continue
-                
-                # Fast hash-based deduplication (exact matches only)
-                content_hash = hash(content.lower())
-                if content_hash in seen_hashes:
-                    continue
-                
-                seen_hashes.add(content_hash)
-                split.metadata['book_id'] = book_id
-                unique_splits.append(split)
+            # Step 5 & 6: Embed and upsert in fixed-size batches (incremental against the existing index)
+            collection_name = self._collection_name(book_id)
+            collection = self._get_vectorstore(book_id)._collection
+            
+            # Chunk ids already in the index, with their page (citations must follow text that moved)
+            existing = collection.get(where=self._book_filter(book_id), include=["metadatas"])
+            existing_pages = {
+                chunk_id: (metadata or {}).get("page")
+                for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+            }
+            seen_ids = set()
+            lexical_index = BM25Index()  # rebuilt from every chunk, including unchanged ones
+            logging.info(f"Collection {collection_name} currently holds {len(existing_pages)} chunks of book {book_id}")
+            
+            staged = deque()  # batches whose vectors are still being computed
+            
+            def texts_to_embed() -> Iterator[List[str]]:
+                for batch in self._batched(unique_chunks, RAG_INGEST_BATCH_SIZE):
+                    stats["unique_chunks"] += len(batch)
+                    seen_ids.update(doc.id for doc in batch)
+                    for doc in batch:
+                        lexical_index.add(doc.id, doc.page_content)
+                    new_docs = [doc for doc in batch if doc.id not in existing_pages]
+                    moved_docs = [
+                        doc for doc in batch
+                        if doc.id in existing_pages and existing_pages[doc.id] != doc.metadata.get("page")
+                    ]
+                    staged.append((batch, new_docs, moved_docs))
+                    # Only new text is embedded; existing chunks stay queryable untouched
+                    yield [doc.page_content for doc in new_docs]
             
-            if not unique_splits:
-                logging.error(f"No valid chunks after deduplication (started with {len(splits)} chunks)")
+            for vectors in self._iter_embedded(texts_to_embed(), stats):
+                batch, new_docs, moved_docs = staged.popleft()
+                if new_docs:
+                    collection.upsert(
+                        ids=[doc.id for doc in new_docs],
+                        embeddings=vectors,
+                        documents=[doc.page_content for doc in new_docs],
+                        metadatas=[doc.metadata for doc in new_docs]
+                    )
+                if moved_docs:
+                    collection.update(
+                        ids=[doc.id for doc in moved_docs],
+                        metadatas=[doc.metadata for doc in moved_docs]
+                    )
+                stats["chunks_added"] += len(new_docs)
+                stats["chunks_unchanged"] += len(batch) - len(new_docs)
+                logging.info(f"Processed {stats['unique_chunks']} chunks ({stats['pages']}/{total_pages} pages), {stats['chunks_added']} new")
+                report("embedding", stats["pages"] / total_pages)
+            
+            if stats["unique_chunks"] == 0:
+                logging.error(f"No valid chunks after deduplication (started with {stats['total_chunks']} chunks)")
                 return {
                     "success": False,
                     "error": "No valid chunks after deduplication (PDF might be too short or corrupted)"
                 }
             
-            logging.info(f"Deduplicated to {len(unique_splits)} unique chunks")
-            
-            # Step 5 & 6: Generate embeddings and store in ChromaDB (with progress tracking)
-            collection_name = f"book_{book_id}"
-            logging.info(f"Generating embeddings for {len(unique_splits)} chunks (this may take a few minutes)...")
-            logging.info(f"Processing in batches of 32... Progress: 0%")
-            
-            # Create/update vector store for this book (batch processing is handled internally)
-            vectorstore = Chroma.from_documents(
-                documents=unique_splits,
-                embedding=self.embeddings,
-                collection_name=collection_name,
-                persist_directory=self.vectorstore_path
-            )
+            # Remove chunks whose text vanished - only after the new ones are in place
+            report("cleanup", 1.0)
+            vanished_ids = [chunk_id for chunk_id in existing_pages if chunk_id not in seen_ids]
+            for batch in self._batched(vanished_ids, RAG_INGEST_BATCH_SIZE):
+                collection.delete(ids=batch)
+            stats["chunks_removed"] = len(vanished_ids)
+            lexical_index.save(self._lexical_index_path(book_id))
+            self.invalidate_book(book_id)
+            try:
+                bump_generation(self.sync_redis_client, book_id)  # cached answers came from the old chunks
+            except Exception as cache_error:
+                logging.warning(f"Could not invalidate cached answers for book {book_id}: {str(cache_error)}")
             
-            logging.info(f"Vector store created successfully ({len(unique_splits)} embeddings generated)")
+            logging.info(f"Vector store updated successfully ({stats['chunks_added']} added, {stats['chunks_unchanged']} unchanged, {stats['chunks_removed']} removed)")
             
             # Calculate deduplication percentage
-            dedup_percentage = ((len(splits) - len(unique_splits)) / len(splits) * 100) if splits else 0
+            total_chunks = stats["total_chunks"]
+            dedup_percentage = ((total_chunks - stats["unique_chunks"]) / total_chunks * 100) if total_chunks else 0
+            embedded = stats["cache_hits"] + stats["cache_misses"]
+            cache_hit_rate = (stats["cache_hits"] / embedded * 100) if embedded else 100.0
+            chunks_per_second = (stats["cache_misses"] / stats["embed_seconds"]) if stats["embed_seconds"] else 0.0
             
             result = {
                 "success": True,
-                "total_pages": len(docs),
-                "total_chunks": len(splits),
-                "unique_chunks": len(unique_splits),
+                "total_pages": stats["pages"],
+                "total_chunks": total_chunks,
+                "unique_chunks": stats["unique_chunks"],
                 "deduplication_percentage": round(dedup_percentage, 2),
+                "near_duplicates_removed": stats["near_duplicates"],
+                "boilerplate_lines_removed": stats["boilerplate_lines_removed"],
+                "boilerplate_chunk_reduction": max(0, stats["chunks_before_page_stages"] - total_chunks) if self.page_stages else 0,
+                "chunks_added": stats["chunks_added"],
+                "chunks_unchanged": stats["chunks_unchanged"],
+                "chunks_removed": stats["chunks_removed"],
+                "embedding_cache_hits": stats["cache_hits"],
+                "embedding_cache_misses": stats["cache_misses"],
+                "embedding_cache_hit_rate": round(cache_hit_rate, 2),
+                "embedding_chunks_per_second": round(chunks_per_second, 1),
                 "collection_name": collection_name,
-                "message": f"Successfully indexed {len(unique_splits)} unique chunks from {len(docs)} pages"
+                "message": f"Successfully indexed {stats['unique_chunks']} unique chunks from {stats['pages']} pages"
             }
-            logging.info(f"RAG indexing complete: {result['message']}")
+            logging.info(f"RAG indexing complete: {result['message']} (embedding cache hit rate {result['embedding_cache_hit_rate']}%, {result['embedding_chunks_per_second']} chunks/s)")
             return result
             
         except Exception as e:
@@ -208,10 +681,103 @@ Comprehensive Answer (combining book content and relevant knowledge):"""
                 "error": f"PDF processing failed: {str(e)}"
             }
     
+    @staticmethod
+    def _query_cache_key(book_id: int, generation: int, question: str, num_chunks: int) -> str:
+        """Redis key of a cached answer, from book_id, its cache generation, question and num_chunks"""
+        cache_key_data = f"{book_id}:{generation}:{question}:{num_chunks}"
+        return hashlib.sha256(cache_key_data.encode()).hexdigest()
+    
+    def _answer_result(self, question: str, answer: str, docs: List[Document]) -> Dict:
+        return {
+            "success": True,
+            "question": question,
+            "answer": answer,
+            "sources": self._source_previews(docs),
+            "num_chunks_used": len(docs)
+        }
+    
+    @staticmethod
+    def _source_previews(docs: List[Document]) -> List[Dict]:
+        """Source chunks for transparency (the documents the answer was generated from)"""
+        return [
+            {
+                "page": doc.metadata.get('page', 'N/A'),
+                "preview": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
+            }
+            for doc in docs
+        ]
+    
+    async def _semantic_lookup(self, book_id: int, generation: int, question: str, num_chunks: int,
+                               vector: Optional[List[float]] = None) -> Tuple[Optional[List[float]], Optional[Dict]]:
+        """
+        Embed the question (unless its vector is given) and look for a cached answer to a paraphrase of it.
+        Returns (question vector, cached result or None); failures only cost the lookup.
+        """
+        if self.semantic_cache is None:
+            return vector, None
+        try:
+            if vector is None:
+                vector = await self._run_blocking(self.embeddings.embed_query, question)
+            result = await self.semantic_cache.lookup(book_id, num_chunks, vector, generation)
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed: {str(e)}")
+            return vector, None
+        if result:
+            logging.info(f"RAG semantic cache hit for book {book_id} (similarity {result['semantic_similarity']})")
+            result.pop("cached_at", None)
+            result["matched_question"] = result["question"]
+            result["question"] = question
+        return vector, result
+    
+    async def _semantic_store(self, book_id: int, generation: int, num_chunks: int, question: str,
+                              vector: Optional[List[float]], result: Dict):
+        if self.semantic_cache is None or vector is None:
+            return
+        try:
+            await self.semantic_cache.put(book_id, num_chunks, question, vector, result, generation)
+        except Exception as e:
+            logging.warning(f"Semantic cache write failed: {str(e)}")
+    
+    async def _check_book_index(self, book_id: int) -> Optional[Dict]:
+        """Error result if the book's index can't be loaded or is empty, None if it can be queried"""
+        collection_name = self._collection_name(book_id)
+        logging.info(f"Querying book {book_id}, collection: {collection_name}")
+        
+        # Load existing vectorstore with error handling
+        try:
+            vectorstore = await self._run_blocking(self._get_vectorstore, book_id)
+            
+            # Check if collection exists and has documents
+            try:
+                try:
+                    has_chunks = await self._run_blocking(self._has_book_chunks, vectorstore._collection, book_id)
+                except Exception:
+                    # Cached handle may point at a collection another process dropped and recreated
+                    self.invalidate_book(book_id)
+                    self.vectorstores.pop(collection_name)
+                    vectorstore = await self._run_blocking(self._get_vectorstore, book_id)
+                    has_chunks = await self._run_blocking(self._has_book_chunks, vectorstore._collection, book_id)
+                if not has_chunks:
+                    logging.error(f"Collection {collection_name} is empty")
+                    return {
+                        "success": False,
+                        "error": f"Book {book_id} has not been indexed yet. Please wait for RAG indexing to complete or re-upload the book."
+                    }
+            except Exception as count_error:
+                logging.warning(f"Could not verify collection: {str(count_error)}")
+            return None
+                
+        except Exception as load_error:
+            logging.error(f"Error loading vectorstore: {str(load_error)}")
+            return {
+                "success": False,
+                "error": f"Book {book_id} index not found. The book may not have been indexed yet. Please re-upload the book or wait for indexing to complete."
+            }
+    
     async def query_book(self, book_id: int, question: str, num_chunks: int = 5) -> Dict:
         """
         Query a specific book using RAG (async with caching):
-        1. Check cache first
+        1. Check cache first (identical questions in flight, in any worker, share one computation)
         2. Load vectorstore for book
         3. Retrieve relevant chunks using MMR (Maximal Marginal Relevance)
         4. Format context
@@ -225,10 +791,21 @@ Comprehensive Answer (combining book content and relevant knowledge):"""
         
         Returns: Answer with sources
         """
-        # Create cache key from book_id, question, and num_chunks
-        cache_key_data = f"{book_id}:{question}:{num_chunks}"
-        cache_key = hashlib.sha256(cache_key_data.encode()).hexdigest()
+        generation = await aget_generation(self.redis_client, book_id)
+        cache_key = self._query_cache_key(book_id, generation, question, num_chunks)
         
+        # Single flight: identical questions already in progress in this worker await the same task
+        # (shielded, so a disconnecting client doesn't cancel the answer others are waiting for)
+        task = self.inflight_queries.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._query_book(book_id, generation, question, num_chunks, cache_key))
+            self.inflight_queries[cache_key] = task
+            task.add_done_callback(lambda _: self.inflight_queries.pop(cache_key, None))
+        else:
+            logging.info(f"Joining in-flight RAG query for book {book_id}")
+        return await asyncio.shield(task)
+    
+    async def _query_book(self, book_id: int, generation: int, question: str, num_chunks: int, cache_key: str) -> Dict:
         try:
             # Check cache first
             cached_result = await self.redis_client.get(cache_key)
@@ -238,147 +815,414 @@ Comprehensive Answer (combining book content and relevant knowledge):"""
             
             logging.info(f"RAG query cache miss for book {book_id}, processing...")
             
-            collection_name = f"book_{book_id}"
+            # Paraphrase of a question answered before?
+            question_vector, semantic_result = await self._semantic_lookup(book_id, generation, question, num_chunks)
+            if semantic_result:
+                return semantic_result
             
-            logging.info(f"Querying book {book_id}, collection: {collection_name}")
+            if not RAG_SINGLE_FLIGHT_ENABLED:
+                return await self._answer_question(book_id, generation, question, num_chunks, cache_key, question_vector)
             
-            # Load existing vectorstore with error handling
+            # Single flight across workers: the lock holder answers, the others wait for its cached result
+            lock = self.redis_client.lock(f"rag_lock:{cache_key}", timeout=RAG_SINGLE_FLIGHT_LOCK_TTL, thread_local=False)
+            locked = await lock.acquire(blocking=False)
+            if not locked:
+                logging.info(f"Identical RAG query for book {book_id} running in another worker, waiting for it")
+                cached_result = await self._wait_for_answer(cache_key, lock.name)
+                if cached_result:
+                    return json.loads(cached_result)
+                # Holder failed or timed out without an answer - answer it here
+                locked = await lock.acquire(blocking=False)
             try:
-                vectorstore = Chroma(
-                    collection_name=collection_name,
-                    embedding_function=self.embeddings,
-                    persist_directory=self.vectorstore_path
-                )
+                return await self._answer_question(book_id, generation, question, num_chunks, cache_key, question_vector)
+            finally:
+                if locked:
+                    try:
+                        await lock.release()
+                    except Exception as release_error:
+                        logging.warning(f"Could not release RAG query lock: {str(release_error)}")
+            
+        except Exception as e:
+            logging.error(f"Query failed with exception: {str(e)}")
+            logging.exception("Query failed")
+            result = {
+                "success": False,
+                "error": f"Query failed: {str(e)}"
+            }
+            # Cache error result for 5 minutes
+            await self.redis_client.setex(cache_key, 300, json.dumps(result))
+            return result
+    
+    async def _wait_for_answer(self, cache_key: str, lock_name: str) -> Optional[bytes]:
+        """Poll the answer cache until another worker's lock is gone; None if it left no answer"""
+        deadline = time.monotonic() + RAG_SINGLE_FLIGHT_LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(RAG_SINGLE_FLIGHT_POLL_MS / 1000)
+            cached_result = await self.redis_client.get(cache_key)
+            if cached_result:
+                return cached_result
+            if not await self.redis_client.exists(lock_name):
+                return await self.redis_client.get(cache_key)
+        return None
+    
+    async def _answer_question(self, book_id: int, generation: int, question: str, num_chunks: int, cache_key: str,
+                               question_vector: Optional[List[float]]) -> Dict:
+        """Retrieve, generate and cache an answer (the expensive part of query_book)"""
+        index_error = await self._check_book_index(book_id)
+        if index_error:
+            # Cache error result for 5 minutes
+            await self.redis_client.setex(cache_key, 300, json.dumps(index_error))
+            return index_error
+        
+        # Generate answer with error handling
+        logging.info(f"Generating answer for question: {question[:50]}...")
+        try:
+            # Retrieve once: the same chunks are the prompt context and the cited sources
+            retrieved_docs = await self._run_blocking(self._retrieve, book_id, num_chunks, question, question_vector)
+            context, used_docs = self._assemble_context(retrieved_docs)
+            await self._count_llm_call()
+            async with self.llm_semaphore:
+                answer = await self.answer_chain.ainvoke({"context": context, "question": question})
+            logging.info("Answer generated successfully")
+        except Exception as gen_error:
+            logging.error(f"Error generating answer: {str(gen_error)}")
+            result = {
+                "success": False,
+                "error": f"Failed to generate answer. LLM error: {str(gen_error)}"
+            }
+            # Cache error result for 5 minutes
+            await self.redis_client.setex(cache_key, 300, json.dumps(result))
+            return result
+        
+        result = self._answer_result(question, answer, used_docs)
+        
+        # Cache successful result for 2 hours (7200 seconds)
+        await self.redis_client.setex(cache_key, 7200, json.dumps(result))
+        await self._semantic_store(book_id, generation, num_chunks, question, question_vector, result)
+        logging.info(f"RAG query result cached for book {book_id}")
+        
+        return result
+    
+    def _mmr_batch(self, book_id: int, vectors: List[List[float]], k: int) -> List[List[Document]]:
+        """
+        MMR for many query vectors with a single Chroma query.
+        Each list is in MMR selection order.
+        """
+        found = self._get_vectorstore(book_id)._collection.query(
+            query_embeddings=vectors,
+            n_results=k * MMR_FETCH_FACTOR,
+            where=self._book_filter(book_id),
+            include=["documents", "metadatas", "embeddings"]
+        )
+        results = []
+        for vector, documents, metadatas, embeddings in zip(vectors, found["documents"], found["metadatas"], found["embeddings"]):
+            if not documents:
+                results.append([])
+                continue
+            selected = maximal_marginal_relevance(
+                np.array(vector, dtype=np.float32), embeddings, k=k, lambda_mult=MMR_LAMBDA_MULT
+            )
+            # In selection order, so the most relevant chunk comes first
+            results.append([Document(page_content=documents[i], metadata=metadatas[i] or {}) for i in selected])
+        return results
+    
+    async def query_book_batch(self, book_id: int, questions: List[str], num_chunks: int = 5) -> Dict:
+        """
+        Answer many questions about one book in one go:
+        1. Look all questions up in the answer cache with one MGET
+        2. Embed the remaining questions in one embed_documents call (also used for the semantic cache)
+        3. Retrieve for all of them with one Chroma query (MMR per question, BM25 fusion if enabled)
+        4. Generate answers concurrently, at most RAG_BATCH_LLM_CONCURRENCY at a time
+        
+        Returns: One result per question, in order, each with a `cache` status: hit | semantic | miss
+        """
+        try:
+            generation = await aget_generation(self.redis_client, book_id)
+            cache_keys = [self._query_cache_key(book_id, generation, question, num_chunks) for question in questions]
+            results: List[Optional[Dict]] = [None] * len(questions)
+            for i, cached in enumerate(await self.redis_client.mget(cache_keys)):
+                if cached:
+                    results[i] = dict(json.loads(cached), cache="hit")
+            
+            # Identical questions in the batch are answered once
+            pending: Dict[str, List[int]] = {}
+            for i, question in enumerate(questions):
+                if results[i] is None:
+                    pending.setdefault(question, []).append(i)
+            logging.info(f"Batch RAG query for book {book_id}: {len(questions)} questions, {len(pending)} to answer")
+            
+            if pending:
+                unique_questions = list(pending)
+                vectors = await self._run_blocking(self.embeddings.embed_documents, unique_questions)
                 
-                # Check if collection exists and has documents
-                try:
-                    collection = vectorstore._collection
-                    doc_count = collection.count()
-                    if doc_count == 0:
-                        logging.error(f"Collection {collection_name} is empty")
-                        result = {
-                            "success": False,
-                            "error": f"Book {book_id} has not been indexed yet. Please wait for RAG indexing to complete or re-upload the book."
-                        }
-                        # Cache error result for 5 minutes
-                        await self.redis_client.setex(cache_key, 300, json.dumps(result))
+                misses = []
+                for question, vector in zip(unique_questions, vectors):
+                    _, semantic_result = await self._semantic_lookup(book_id, generation, question, num_chunks, vector)
+                    if semantic_result:
+                        for i in pending[question]:
+                            results[i] = dict(semantic_result, cache="semantic")
+                    else:
+                        misses.append((question, vector))
+                
+                if misses:
+                    index_error = await self._check_book_index(book_id)
+                    if index_error:
+                        for question, _ in misses:
+                            for i in pending[question]:
+                                results[i] = dict(index_error, question=question, cache="miss")
+                        misses = []
+                
+                if misses:
+                    vector_k = num_chunks * 2 if RAG_HYBRID_RETRIEVAL else num_chunks
+                    retrieved = await self._run_blocking(self._mmr_batch, book_id, [vector for _, vector in misses], vector_k)
+                    if RAG_HYBRID_RETRIEVAL:
+                        retrieved = [
+                            await self._run_blocking(self._fuse_lexical, book_id, num_chunks, question, docs)
+                            for (question, _), docs in zip(misses, retrieved)
+                        ]
+                    
+                    batch_semaphore = asyncio.Semaphore(RAG_BATCH_LLM_CONCURRENCY)
+                    
+                    async def answer(question: str, vector: List[float], docs: List[Document]) -> Dict:
+                        context, used_docs = self._assemble_context(docs)
+                        try:
+                            async with batch_semaphore, self.llm_semaphore:
+                                await self._count_llm_call()
+                                text = await self.answer_chain.ainvoke({"context": context, "question": question})
+                        except Exception as gen_error:
+                            logging.error(f"Error generating answer: {str(gen_error)}")
+                            return {
+                                "success": False,
+                                "question": question,
+                                "error": f"Failed to generate answer. LLM error: {str(gen_error)}"
+                            }
+                        result = self._answer_result(question, text, used_docs)
+                        await self.redis_client.setex(self._query_cache_key(book_id, generation, question, num_chunks), 7200, json.dumps(result))
+                        await self._semantic_store(book_id, generation, num_chunks, question, vector, result)
                         return result
-                    logging.info(f"Found {doc_count} chunks in collection")
-                except Exception as count_error:
-                    logging.warning(f"Could not verify collection: {str(count_error)}")
                     
-            except Exception as load_error:
-                logging.error(f"Error loading vectorstore: {str(load_error)}")
-                result = {
-                    "success": False,
-                    "error": f"Book {book_id} index not found. The book may not have been indexed yet. Please re-upload the book or wait for indexing to complete."
-                }
-                # Cache error result for 5 minutes
-                await self.redis_client.setex(cache_key, 300, json.dumps(result))
-                return result
-            
-            # MMR retriever for diverse, relevant chunks
-            # MMR = Maximal Marginal Relevance
-            # - Balances relevance (similarity to query) with diversity (different from each other)
-            # - Prevents retrieving 5 chunks that all say the same thing
-            retriever = vectorstore.as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": num_chunks,  # Return this many chunks
-                    "fetch_k": num_chunks * 3,  # Initially fetch 3x candidates
-                    "lambda_mult": 0.7  # 70% relevance, 30% diversity
-                }
+                    answered = await asyncio.gather(*[
+                        answer(question, vector, docs) for (question, vector), docs in zip(misses, retrieved)
+                    ])
+                    for (question, _), result in zip(misses, answered):
+                        for i in pending[question]:
+                            results[i] = dict(result, cache="miss")
+            
+            return {"success": True, "results": results}
+            
+        except Exception as e:
+            logging.exception("Batch query failed")
+            return {
+                "success": False,
+                "error": f"Batch query failed: {str(e)}"
+            }
+    
+    def _nearest_chunks(self, book_id: int, where: Optional[Dict], vector: List[float],
+                        n_results: int) -> List[Tuple[str, Dict, List[float], float]]:
+        """Nearest chunks in a book's collection as (document, metadata, embedding, distance)"""
+        found = self._get_vectorstore(book_id)._collection.query(
+            query_embeddings=[vector],
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "embeddings", "distances"]
+        )
+        return [
+            (document, metadata or {}, embedding, distance)
+            for document, metadata, embedding, distance in zip(
+                found["documents"][0], found["metadatas"][0], found["embeddings"][0], found["distances"][0]
             )
+        ]
+    
+    async def query_books(self, books: Dict[int, str], question: str, num_chunks: int = 5) -> Dict:
+        """
+        Answer one question from several books (e.g. every textbook of a course category):
+        1. Check the answer cache
+        2. Embed the question once
+        3. Fetch MMR candidates from every book's collection concurrently
+           (one filtered query in single-collection mode)
+        4. Re-rank the pooled candidates with one global MMR pass and keep num_chunks
+        5. Assemble them like a single-book context (overlaps merged, token budget), one
+           numbered "[n] title, page" section per merged excerpt
+        6. Generate one answer whose citations [n] point at the numbered sources
+        
+        Args:
+            books: book_id -> title of the books to search
+            question: Student's question
+            num_chunks: Number of chunks used as context across all books
+        
+        Returns: Answer with sources tagged by book, plus the books that had no index
+        """
+        book_ids = sorted(books)
+        try:
+            generations = await aget_generations(self.redis_client, book_ids)
+            scope = ",".join(f"{book_id}.{generations[book_id]}" for book_id in book_ids)
+            cache_key = hashlib.sha256(f"multi:{scope}:{question}:{num_chunks}".encode()).hexdigest()
+            cached_result = await self.redis_client.get(cache_key)
+            if cached_result:
+                logging.info(f"Multi-book RAG query cache hit for books {book_ids}")
+                return json.loads(cached_result)
             
-            # Format retrieved chunks
-            def format_docs(docs):
-                return "\n\n".join(doc.page_content for doc in docs)
+            retrieval_start = time.perf_counter()
+            vector = await self._run_blocking(self.embeddings.embed_query, question)
+            fetch_k = num_chunks * MMR_FETCH_FACTOR
+            if RAG_SINGLE_COLLECTION:
+                where = {"book_id": book_ids[0]} if len(book_ids) == 1 else {"book_id": {"$in": book_ids}}
+                searches = [(book_ids[0], where, fetch_k * len(book_ids))]
+            else:
+                searches = [(book_id, None, fetch_k) for book_id in book_ids]
+            found = await asyncio.gather(*[
+                self._run_blocking(self._nearest_chunks, book_id, where, vector, n_results)
+                for book_id, where, n_results in searches
+            ], return_exceptions=True)
             
-            # Build RAG chain
-            prompt = ChatPromptTemplate.from_template(self.prompt_template)
+            candidates = []
+            books_searched = []
+            for (book_id, _, _), hits in zip(searches, found):
+                if isinstance(hits, Exception):
+                    logging.warning(f"Multi-book retrieval failed for book {book_id}: {str(hits)}")
+                    continue
+                candidates.extend(hits)
+                if hits:
+                    books_searched.append(book_id)  # per-book collection exists and has chunks
+            if RAG_SINGLE_COLLECTION and candidates:
+                # One query over the shared collection: low-ranked books may have no candidates
+                books_searched = await self._run_blocking(self._books_with_chunks, book_ids)
+            books_skipped = [book_id for book_id in book_ids if book_id not in books_searched]
+            if not candidates:
+                return {
+                    "success": False,
+                    "error": "None of the selected books has been indexed yet. Please wait for RAG indexing to complete."
+                }
             
-            rag_chain = (
-                {"context": retriever | format_docs, "question": RunnablePassthrough()}
-                | prompt
-                | self.llm
-                | StrOutputParser()
+            # Global re-rank: one MMR pass over every book's candidates, nearest first
+            candidates.sort(key=lambda candidate: candidate[3])
+            selected = maximal_marginal_relevance(
+                np.array(vector, dtype=np.float32),
+                [embedding for _, _, embedding, _ in candidates],
+                k=num_chunks,
+                lambda_mult=MMR_LAMBDA_MULT
             )
+            docs = [Document(page_content=candidates[i][0], metadata=candidates[i][1]) for i in selected]
+            retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
+            logging.info(f"Multi-book retrieval: {len(candidates)} candidates from {len(books_searched)} books "
+                         f"in {retrieval_ms:.1f}ms")
             
-            # Generate answer with error handling
-            logging.info(f"Generating answer for question: {question[:50]}...")
+            # Numbered sections, so the answer's [n] citations point at the sources below
+            context, sections = self._assemble_sections(
+                docs,
+                lambda n, doc: f"[{n}] {books.get(doc.metadata.get('book_id'), 'Unknown book')}, "
+                               f"page {doc.metadata.get('page', 'N/A')}"
+            )
             try:
-                answer = rag_chain.invoke(question)
-                logging.info("Answer generated successfully")
+                await self._count_llm_call()
+                async with self.llm_semaphore:
+                    answer = await self.multi_book_chain.ainvoke({"context": context, "question": question})
             except Exception as gen_error:
                 logging.error(f"Error generating answer: {str(gen_error)}")
-                result = {
+                return {
                     "success": False,
                     "error": f"Failed to generate answer. LLM error: {str(gen_error)}"
                 }
-                # Cache error result for 5 minutes
-                await self.redis_client.setex(cache_key, 300, json.dumps(result))
-                return result
-            
-            # Get source chunks for transparency
-            try:
-                retrieved_docs = retriever.invoke(question)
-                sources = [
-                    {
-                        "page": doc.metadata.get('page', 'N/A'),
-                        "preview": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-                    }
-                    for doc in retrieved_docs
-                ]
-            except Exception as retrieve_error:
-                logging.warning(f"Could not retrieve source docs: {str(retrieve_error)}")
-                sources = []
-                retrieved_docs = []
             
+            sources = [
+                dict(preview, citation=n, book_id=doc.metadata.get("book_id"),
+                     book_title=books.get(doc.metadata.get("book_id")))
+                for n, section in enumerate(sections, start=1)
+                for doc, preview in zip(section, self._source_previews(section))
+            ]
             result = {
                 "success": True,
                 "question": question,
                 "answer": answer,
                 "sources": sources,
-                "num_chunks_used": len(retrieved_docs)
+                "num_chunks_used": len(sources),
+                "books_searched": books_searched,
+                "books_skipped": books_skipped
             }
-            
-            # Cache successful result for 2 hours (7200 seconds)
             await self.redis_client.setex(cache_key, 7200, json.dumps(result))
-            logging.info(f"RAG query result cached for book {book_id}")
-            
             return result
             
         except Exception as e:
-            logging.error(f"Query failed with exception: {str(e)}")
-            logging.exception("Query failed")
-            result = {
+            logging.exception("Multi-book query failed")
+            return {
                 "success": False,
                 "error": f"Query failed: {str(e)}"
             }
-            # Cache error result for 5 minutes
-            await self.redis_client.setex(cache_key, 300, json.dumps(result))
-            return result
+    
+    async def stream_query_book(self, book_id: int, question: str, num_chunks: int = 5) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of query_book. Yields events as {"event", "data"} dicts:
+        - sources: the retrieved chunks, sent as soon as retrieval finishes
+        - token: the next piece of the answer as the LLM produces it
+        - done / error: end of the stream
+        The completed answer is written to the same Redis caches as query_book,
+        and a cached (or semantically matched) answer is replayed as sources + one token.
+        """
+        try:
+            generation = await aget_generation(self.redis_client, book_id)
+            cache_key = self._query_cache_key(book_id, generation, question, num_chunks)
+            cached_result = await self.redis_client.get(cache_key)
+            question_vector = None
+            if cached_result:
+                logging.info(f"RAG stream cache hit for book {book_id}")
+                result = json.loads(cached_result)
+            else:
+                question_vector, result = await self._semantic_lookup(book_id, generation, question, num_chunks)
+            if result:
+                if not result.get("success"):
+                    yield {"event": "error", "data": {"error": result.get("error")}}
+                    return
+                yield {"event": "sources", "data": result["sources"]}
+                yield {"event": "token", "data": result["answer"]}
+                yield {"event": "done", "data": {"num_chunks_used": result["num_chunks_used"], "cached": True}}
+                return
+            
+            index_error = await self._check_book_index(book_id)
+            if index_error:
+                await self.redis_client.setex(cache_key, 300, json.dumps(index_error))
+                yield {"event": "error", "data": {"error": index_error["error"]}}
+                return
+            
+            retrieved_docs = await self._run_blocking(self._retrieve, book_id, num_chunks, question, question_vector)
+            context, used_docs = self._assemble_context(retrieved_docs)
+            sources = self._source_previews(used_docs)
+            yield {"event": "sources", "data": sources}
+            
+            pieces = []
+            await self._count_llm_call()
+            async with self.llm_semaphore:
+                async for piece in self.answer_chain.astream({"context": context, "question": question}):
+                    pieces.append(piece)
+                    yield {"event": "token", "data": piece}
+            
+            result = self._answer_result(question, "".join(pieces), used_docs)
+            await self.redis_client.setex(cache_key, 7200, json.dumps(result))
+            await self._semantic_store(book_id, generation, num_chunks, question, question_vector, result)
+            logging.info(f"Streamed RAG answer cached for book {book_id}")
+            yield {"event": "done", "data": {"num_chunks_used": len(used_docs), "cached": False}}
+            
+        except Exception as e:
+            logging.exception("Streaming query failed")
+            yield {"event": "error", "data": {"error": f"Query failed: {str(e)}"}}
     
     async def delete_book_index(self, book_id: int) -> Dict:
         """Delete vector store for a book and clear all cached queries"""
         try:
-            collection_name = f"book_{book_id}"
-            
-            # Delete ChromaDB collection
-            vectorstore = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.vectorstore_path
-            )
-            vectorstore.delete_collection()
+            collection_name = self._collection_name(book_id)
             
-            # Clear all cached queries for this book
-            # Use pattern matching to delete all keys that start with book_id
-            cache_pattern = f"rag_query_{book_id}_*"
-            # Note: Redis SCAN and DELETE pattern is complex in async
-            # For now, we'll just proceed with the index deletion
-            # In production, you might want to implement a more sophisticated cache clearing
+            # Delete the book's ChromaDB collection (or its chunks from the shared collection)
+            vectorstore = await self._run_blocking(self._get_vectorstore, book_id)
+            if RAG_SINGLE_COLLECTION:
+                await self._run_blocking(lambda: vectorstore._collection.delete(where=self._book_filter(book_id)))
+            else:
+                await self._run_blocking(vectorstore.delete_collection)
+            if os.path.exists(self._lexical_index_path(book_id)):
+                os.remove(self._lexical_index_path(book_id))
+            self.invalidate_book(book_id)
             
+            # Clear all cached queries for this book: keys embed the book's cache generation,
+            # so one INCR orphans every cached answer (they expire with their TTL)
+            await abump_generation(self.redis_client, book_id)
             logging.info(f"Cleared cached queries for book {book_id}")
             
             return {
@@ -394,22 +1238,15 @@ Comprehensive Answer (combining book content and relevant knowledge):"""
     def check_index_status(self, book_id: int) -> Dict:
         """Check if a book is indexed in ChromaDB"""
         try:
-            collection_name = f"book_{book_id}"
-            
-            # Try to load the collection
-            vectorstore = Chroma(
-                collection_name=collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.vectorstore_path
-            )
+            collection_name = self._collection_name(book_id)
             
             # Check if collection has documents
             # Note: Chroma returns the collection even if it's empty
             # We need to check if it actually has documents
             try:
                 # Try to get count - if collection doesn't exist, this will fail
-                collection = vectorstore._client.get_collection(collection_name)
-                count = collection.count()
+                collection = self._get_client().get_collection(collection_name)
+                count = self._count_book_chunks(collection, book_id)
                 
                 return {
                     "indexed": count > 0,
@@ -429,12 +1266,131 @@ Comprehensive Answer (combining book content and relevant knowledge):"""
         except Exception as e:
             return {
                 "indexed": False,
-                "collection_name": f"book_{book_id}",
+                "collection_name": self._collection_name(book_id),
                 "document_count": 0,
                 "error": str(e),
                 "message": "Failed to check index status"
             }
 
+    
+    @staticmethod
+    def _passages(hits: Iterable) -> List[Dict]:
+        """(chunk_id, document, metadata, distance) hits -> passages with book, page and similarity"""
+        # Embeddings are L2-normalised, so Chroma's squared L2 distance d maps to cosine 1 - d/2
+        return [
+            {
+                "chunk_id": chunk_id,
+                "book_id": (metadata or {}).get("book_id"),
+                "page": (metadata or {}).get("page", "N/A"),
+                "similarity": round(1 - distance / 2, 4),
+                "content": document
+            }
+            for chunk_id, document, metadata, distance in hits
+        ]
+    
+    def search_book(self, book_id: int, query: str, k: int = 5) -> Dict:
+        """
+        Top-k passages of one book for a query, straight from the vector store (no LLM).
+        Plain similarity search on the cached collection handle; results are kept in a
+        small in-process LRU for RAG_PASSAGE_CACHE_TTL seconds, keyed by the book's cache
+        generation so a reindex in another process is seen at once.
+        
+        Returns: Passages ranked by similarity, each with its page
+        """
+        try:
+            generation = get_generation(self.sync_redis_client, book_id)
+            cache_key = (book_id, generation, " ".join(query.lower().split()), k)
+        except Exception as e:
+            logging.warning(f"Could not read the cache generation of book {book_id}, searching uncached: {str(e)}")
+            cache_key = None
+        cached = self.passages.get(cache_key) if cache_key else None
+        if cached is not None and time.monotonic() - cached[0] < RAG_PASSAGE_CACHE_TTL:
+            return dict(cached[1], cached=True)
+        
+        try:
+            collection = self._get_vectorstore(book_id)._collection
+            found = collection.query(
+                query_embeddings=[self.embeddings.embed_query(query)],
+                n_results=k,
+                where=self._book_filter(book_id),
+                include=["documents", "metadatas", "distances"]
+            )
+            result = {
+                "success": True,
+                "book_id": book_id,
+                "query": query,
+                "results": self._passages(zip(found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0]))
+            }
+        except Exception as e:
+            logging.exception(f"Passage search failed for book {book_id}")
+            return {
+                "success": False,
+                "error": f"Passage search failed: {str(e)}"
+            }
+        
+        if cache_key:
+            self.passages.put(cache_key, (time.monotonic(), result))
+        return dict(result, cached=False)
+    
+    def search_library(self, query: str, book_ids: Optional[List[int]] = None, k: int = 10) -> Dict:
+        """
+        Vector search across many (or all) books at once.
+        Single-collection mode runs one filtered search; with per-book collections the
+        query is embedded once and each collection is searched with the same vector.
+        
+        Args:
+            query: Search text
+            book_ids: Books to search (None = whole library)
+            k: Number of passages to return
+        
+        Returns: Passages ranked by similarity, each tagged with its book_id and page
+        """
+        try:
+            query_vector = self.embeddings.embed_query(query)
+            client = self._get_client()
+            include = ["documents", "metadatas", "distances"]
+            
+            if RAG_SINGLE_COLLECTION:
+                where = None
+                if book_ids:
+                    where = {"book_id": book_ids[0]} if len(book_ids) == 1 else {"book_id": {"$in": book_ids}}
+                try:
+                    collections = [client.get_collection(RAG_LIBRARY_COLLECTION)]
+                except Exception:
+                    collections = []
+            else:
+                where = None
+                names = [f"book_{book_id}" for book_id in book_ids] if book_ids else [
+                    getattr(c, "name", c) for c in client.list_collections()
+                    if getattr(c, "name", c).startswith("book_")
+                ]
+                collections = []
+                for name in names:
+                    try:
+                        collections.append(client.get_collection(name))
+                    except Exception:
+                        continue  # book not indexed
+            
+            hits = []
+            for collection in collections:
+                found = collection.query(query_embeddings=[query_vector], n_results=k, where=where, include=include)
+                hits.extend(zip(found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0]))
+            hits.sort(key=lambda hit: hit[3])
+            results = self._passages(hits[:k])
+            return {
+                "success": True,
+                "query": query,
+                "book_ids": book_ids,
+                "collections_searched": len(collections),
+                "results": results
+            }
+        except Exception as e:
+            logging.exception("Library search failed")
+            return {
+                "success": False,
+                "error": f"Search failed: {str(e)}"
+            }
+
 
 # Singleton instance
 rag_service = RAGService()
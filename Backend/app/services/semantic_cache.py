@@ -0,0 +1,101 @@
+"""
+Semantic answer cache for RAG queries
+The exact-match cache misses paraphrases ("What is normalization?" vs "what is
+normalisation"), so answers are also stored per (book, num_chunks) next to the
+embedding of their question. A new question reuses the answer of the most similar
+cached question when their cosine similarity clears the threshold.
+
+Redis layout (all keys expire with the answers):
+- rag_semantic:{book_id}:g{generation}:{num_chunks}:vectors  hash question digest -> float32 vector bytes
+- rag_semantic:{book_id}:g{generation}:{num_chunks}:answers  hash question digest -> JSON result
+- rag_semantic:stats                                         hash with hits / misses counters
+The book's cache generation (see cache_versions) is part of the key, so a reindexed or
+deleted book's answers are never matched again.
+"""
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import time
+
+import numpy as np
+
+STATS_KEY = "rag_semantic:stats"
+
+
+def best_match(query_vector: List[float], vectors: Dict[bytes, bytes]) -> Tuple[Optional[bytes], float]:
+    """Field of the stored vector most similar to the query (vectors are L2-normalised) and its cosine"""
+    if not vectors:
+        return None, 0.0
+    fields = list(vectors)
+    matrix = np.frombuffer(b"".join(vectors[field] for field in fields), dtype=np.float32)
+    matrix = matrix.reshape(len(fields), -1)
+    query = np.asarray(query_vector, dtype=np.float32)
+    if matrix.shape[1] != query.shape[0]:
+        return None, 0.0  # cached under a different embedding model
+    similarities = matrix @ query
+    best = int(np.argmax(similarities))
+    return fields[best], float(similarities[best])
+
+
+class SemanticCache:
+    """Per-book cache of answers looked up by question embedding similarity"""
+
+    def __init__(self, redis_client, threshold: float = 0.95, max_entries: int = 100, ttl: int = 7200):
+        """
+        Args:
+            redis_client: redis.asyncio client
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            max_entries: Questions kept per (book, num_chunks); the oldest are dropped first
+            ttl: Seconds answers live (refreshed on every write)
+        """
+        self.redis_client = redis_client
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(book_id: int, num_chunks: int, generation: int) -> Tuple[str, str]:
+        prefix = f"rag_semantic:{book_id}:g{generation}:{num_chunks}"
+        return f"{prefix}:vectors", f"{prefix}:answers"
+
+    async def lookup(self, book_id: int, num_chunks: int, query_vector: List[float],
+                     generation: int = 0) -> Optional[Dict]:
+        """Cached result of the closest question above the threshold, with its similarity, else None"""
+        vectors_key, answers_key = self._keys(book_id, num_chunks, generation)
+        field, similarity = best_match(query_vector, await self.redis_client.hgetall(vectors_key))
+        cached = await self.redis_client.hget(answers_key, field) if field and similarity >= self.threshold else None
+        await self.redis_client.hincrby(STATS_KEY, "hits" if cached else "misses", 1)
+        if not cached:
+            return None
+        result = json.loads(cached)
+        result["semantic_similarity"] = round(similarity, 4)
+        return result
+
+    async def put(self, book_id: int, num_chunks: int, question: str, query_vector: List[float], result: Dict,
+                  generation: int = 0):
+        vectors_key, answers_key = self._keys(book_id, num_chunks, generation)
+        field = hashlib.sha256(question.strip().lower().encode()).hexdigest()
+        entry = dict(result, cached_at=time.time())
+        await self.redis_client.hset(vectors_key, field, np.asarray(query_vector, dtype=np.float32).tobytes())
+        await self.redis_client.hset(answers_key, field, json.dumps(entry))
+        await self.redis_client.expire(vectors_key, self.ttl)
+        await self.redis_client.expire(answers_key, self.ttl)
+
+        if await self.redis_client.hlen(answers_key) > self.max_entries:
+            answers = await self.redis_client.hgetall(answers_key)
+            by_age = sorted(answers, key=lambda f: json.loads(answers[f]).get("cached_at", 0))
+            stale = by_age[:len(by_age) - self.max_entries]
+            await self.redis_client.hdel(vectors_key, *stale)
+            await self.redis_client.hdel(answers_key, *stale)
+
+    async def stats(self) -> Dict:
+        counters = await self.redis_client.hgetall(STATS_KEY)
+        hits = int(counters.get(b"hits", 0))
+        misses = int(counters.get(b"misses", 0))
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups * 100, 2) if lookups else 0.0,
+            "threshold": self.threshold
+        }
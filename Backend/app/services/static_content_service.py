@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.models.static_content import StaticContent
 from app.services.gemini_ai import generate_all_content
 from app.services.audio_generation import generate_podcast_audio
+from app.services.cache_versions import bump_generation
 import os
 import redis
 
@@ -45,15 +46,8 @@ def create_static_content(db: Session, book_id: int, pdf_path: str) -> StaticCon
         db.commit()
         db.refresh(new_content)
         
-        # Invalidate cache for this book's static content
-        summary_cache_key = f"summary_{book_id}"
-        qa_cache_key = f"qa_{book_id}"
-        podcast_cache_key = f"podcast_{book_id}"
-        audio_cache_key = f"audio_url_{book_id}"
-        redis_client.delete(summary_cache_key)
-        redis_client.delete(qa_cache_key)
-        redis_client.delete(podcast_cache_key)
-        redis_client.delete(audio_cache_key)
+        # Invalidate cache for this book's static content (and anything else cached for the book)
+        bump_generation(redis_client, book_id)
         
         return new_content
         
@@ -97,15 +91,8 @@ def regenerate_static_content(db: Session, book_id: int, pdf_path: str) -> Stati
         db.commit()
         db.refresh(content)
         
-        # Invalidate cache for this book's static content
-        summary_cache_key = f"summary_{book_id}"
-        qa_cache_key = f"qa_{book_id}"
-        podcast_cache_key = f"podcast_{book_id}"
-        audio_cache_key = f"audio_url_{book_id}"
-        redis_client.delete(summary_cache_key)
-        redis_client.delete(qa_cache_key)
-        redis_client.delete(podcast_cache_key)
-        redis_client.delete(audio_cache_key)
+        # Invalidate cache for this book's static content (and anything else cached for the book)
+        bump_generation(redis_client, book_id)
         
         return content
         
@@ -6,12 +6,15 @@ from app.models.category import Category
 import app.schemas.static_content_schemas as schemas_static_content
 from app.services.gemini_ai import generate_summary, generate_qa_pairs, generate_podcast_script
 from app.services.audio_generation import generate_podcast_audio
+from app.services.cache_versions import get_generation, versioned_key
+from app.services.content_cache import ContentCache
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import redis
 import json
 
 redis_client = redis.Redis(host='localhost', port=6379, db=0)
+content_cache = ContentCache(redis_client)  # summary / Q&A / audio: per-process LRU in front of Redis
 
 
 def search_books(
@@ -74,16 +77,14 @@ def search_books(
 
 def get_or_generate_summary(db: Session, book_id: int) -> Dict[str, Any]:
     """Get summary for a book (read-only for students)"""
-    cache_key = f"summary_{book_id}"
-    
-    # Check cache first
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        cached_result = json.loads(cached_data)
-        if cached_result.get("status") == "not_found":
-            raise ValueError(cached_result["error"])
-        return cached_result
-    
+    result = content_cache.get_or_load("summary", book_id, lambda: _load_summary(db, book_id))
+    if result.get("status") == "not_found":
+        raise ValueError(result["error"])
+    return result
+
+
+def _load_summary(db: Session, book_id: int) -> Tuple[Dict[str, Any], int]:
+    """Summary from the database with its cache TTL in seconds"""
     # Check if book exists
     book = db.query(Books).filter(Books.book_id == book_id).first()
     if not book:
@@ -98,8 +99,7 @@ def get_or_generate_summary(db: Session, book_id: int) -> Dict[str, Any]:
             "status": "not_found",
             "error": f"Summary not available for book {book_id}. Please contact admin to generate static content."
         }
-        redis_client.setex(cache_key, 3600, json.dumps(not_found_result))
-        raise ValueError(f"Summary not available for book {book_id}. Please contact admin to generate static content.")
+        return not_found_result, 3600
     
     result = {
         "book_id": book_id,
@@ -108,23 +108,19 @@ def get_or_generate_summary(db: Session, book_id: int) -> Dict[str, Any]:
     }
     
     # Cache the result (24 hours TTL since summaries don't change)
-    redis_client.setex(cache_key, 86400, json.dumps(result))
-    
-    return result
+    return result, 86400
 
 
 def get_or_generate_qa(db: Session, book_id: int) -> Dict[str, Any]:
     """Get Q&A pairs for a book (read-only for students)"""
-    cache_key = f"qa_{book_id}"
-    
-    # Check cache first
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        cached_result = json.loads(cached_data)
-        if cached_result.get("status") == "not_found":
-            raise ValueError(cached_result["error"])
-        return cached_result
-    
+    result = content_cache.get_or_load("qa", book_id, lambda: _load_qa(db, book_id))
+    if result.get("status") == "not_found":
+        raise ValueError(result["error"])
+    return result
+
+
+def _load_qa(db: Session, book_id: int) -> Tuple[Dict[str, Any], int]:
+    """Q&A pairs from the database with their cache TTL in seconds"""
     # Check if book exists
     book = db.query(Books).filter(Books.book_id == book_id).first()
     if not book:
@@ -139,8 +135,7 @@ def get_or_generate_qa(db: Session, book_id: int) -> Dict[str, Any]:
             "status": "not_found",
             "error": f"Q&A not available for book {book_id}. Please contact admin to generate static content."
         }
-        redis_client.setex(cache_key, 3600, json.dumps(not_found_result))
-        raise ValueError(f"Q&A not available for book {book_id}. Please contact admin to generate static content.")
+        return not_found_result, 3600
     
     result = {
         "book_id": book_id,
@@ -149,14 +144,12 @@ def get_or_generate_qa(db: Session, book_id: int) -> Dict[str, Any]:
     }
     
     # Cache the result (24 hours TTL since Q&A don't change)
-    redis_client.setex(cache_key, 86400, json.dumps(result))
-    
-    return result
+    return result, 86400
 
 
 def get_or_generate_podcast(db: Session, book_id: int) -> Dict[str, Any]:
     """Get or generate podcast script for a book"""
-    cache_key = f"podcast_{book_id}"
+    cache_key = versioned_key(f"podcast_{book_id}", get_generation(redis_client, book_id))
     
     # Check cache first
     cached_data = redis_client.get(cache_key)
@@ -211,16 +204,14 @@ def get_or_generate_podcast(db: Session, book_id: int) -> Dict[str, Any]:
 
 def get_or_generate_audio(db: Session, book_id: int) -> Dict[str, Any]:
     """Get audio file for a book (read-only for students)"""
-    cache_key = f"audio_url_{book_id}"
-    
-    # Check cache first
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        cached_result = json.loads(cached_data)
-        if cached_result.get("status") == "not_found":
-            raise ValueError(cached_result["error"])
-        return cached_result
-    
+    result = content_cache.get_or_load("audio_url", book_id, lambda: _load_audio(db, book_id))
+    if result.get("status") == "not_found":
+        raise ValueError(result["error"])
+    return result
+
+
+def _load_audio(db: Session, book_id: int) -> Tuple[Dict[str, Any], int]:
+    """Audio URL from the database with its cache TTL in seconds"""
     # Check if book exists
     book = db.query(Books).filter(Books.book_id == book_id).first()
     if not book:
@@ -235,8 +226,7 @@ def get_or_generate_audio(db: Session, book_id: int) -> Dict[str, Any]:
             "status": "not_found",
             "error": f"Audio not available for book {book_id}. Please contact admin to generate static content."
         }
-        redis_client.setex(cache_key, 3600, json.dumps(not_found_result))
-        raise ValueError(f"Audio not available for book {book_id}. Please contact admin to generate static content.")
+        return not_found_result, 3600
     
     result = {
         "book_id": book_id,
@@ -245,9 +235,7 @@ def get_or_generate_audio(db: Session, book_id: int) -> Dict[str, Any]:
     }
     
     # Cache the result (24 hours TTL since audio URLs don't change)
-    redis_client.setex(cache_key, 86400, json.dumps(result))
-    
-    return result
+    return result, 86400
 
 
 def get_static_content(db: Session, book_id: int):
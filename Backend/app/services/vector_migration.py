@@ -0,0 +1,58 @@
+"""
+Migration from per-book Chroma collections (`book_{id}`) to the single library collection
+Stored vectors are copied as they are (no re-embedding) and every chunk is tagged with
+its book_id, so RAG_SINGLE_COLLECTION can be switched on afterwards.
+"""
+from typing import Dict
+import logging
+import re
+
+BOOK_COLLECTION = re.compile(r"^book_(\d+)$")
+
+
+def migrate_to_single_collection(client, target_name: str, batch_size: int = 500,
+                                 delete_source: bool = False) -> Dict:
+    """
+    Copy every book_{id} collection into target_name.
+
+    Args:
+        client: chromadb client for the vector store directory
+        target_name: Library collection to fill (created if missing)
+        batch_size: Chunks copied per round trip
+        delete_source: Drop each per-book collection once it has been copied
+
+    Returns: {"books": n, "chunks": n} migrated
+    """
+    target = client.get_or_create_collection(target_name)
+    names = sorted(getattr(c, "name", c) for c in client.list_collections())
+    books, chunks = 0, 0
+
+    for name in names:
+        match = BOOK_COLLECTION.match(name)
+        if not match:
+            continue
+        book_id = int(match.group(1))
+        source = client.get_collection(name)
+        total = source.count()
+
+        for offset in range(0, total, batch_size):
+            page = source.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            metadatas = [dict(metadata or {}, book_id=book_id) for metadata in page["metadatas"]]
+            target.upsert(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=metadatas
+            )
+
+        copied = len(target.get(where={"book_id": book_id}, include=[])["ids"])
+        if copied < total:
+            raise RuntimeError(f"Book {book_id}: only {copied}/{total} chunks arrived in {target_name}")
+        if delete_source:
+            client.delete_collection(name)
+
+        books += 1
+        chunks += total
+        logging.info(f"Migrated {name}: {total} chunks")
+
+    return {"books": books, "chunks": chunks}
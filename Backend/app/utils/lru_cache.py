@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded least-recently-used map with hit/miss/eviction counters.
+    With `weigh`, max_size bounds the total weight of the values (e.g. bytes) instead of their count.
+    """
+
+    def __init__(self, max_size: int, on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+                 weigh: Optional[Callable[[Any], int]] = None):
+        self.max_size = max(1, max_size)
+        self.on_evict = on_evict
+        self.weigh = weigh or (lambda value: 1)
+        self.weight = 0
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        evicted = []
+        with self._lock:
+            if key in self._items:
+                self.weight -= self.weigh(self._items[key])
+            self._items[key] = value
+            self._items.move_to_end(key)
+            self.weight += self.weigh(value)
+            while self.weight > self.max_size and len(self._items) > 1:
+                old_key, old_value = self._items.popitem(last=False)
+                self.weight -= self.weigh(old_value)
+                evicted.append((old_key, old_value))
+                self.evictions += 1
+        for old_key, old_value in evicted:
+            if self.on_evict:
+                self.on_evict(old_key, old_value)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value or build, cache and return it.
+        The factory runs outside the lock; if two threads race, the first value stored wins.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        created = factory()
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        self.put(key, created)
+        return created
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            value = self._items.pop(key)
+            self.weight -= self.weigh(value)
+            return value
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches; returns how many were removed"""
+        with self._lock:
+            keys = [key for key in self._items if predicate(key)]
+            for key in keys:
+                self.weight -= self.weigh(self._items.pop(key))
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+        }
@@ -0,0 +1,86 @@
+"""
+Embedding backend benchmark: throughput of torch vs onnx vs onnx-int8 on CPU,
+plus cosine parity of each ONNX backend against the PyTorch vectors.
+
+Usage (from Backend/):
+    python benchmarks/embedding_backends.py --pdf static/books/some_book.pdf
+    python benchmarks/embedding_backends.py --chunks 1000 --backends torch onnx-int8
+
+Exits with status 1 if a backend drifts beyond the cosine tolerance.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.config.settings import RAG_EMBEDDING_MODEL, RAG_EMBEDDING_QUANTIZATION, RAG_EMBEDDING_PARITY_TOLERANCE
+from app.services.embedding_backends import BACKENDS, PARITY_SAMPLE, create_embeddings, cosine_similarity
+from app.services.pdf_extraction import iter_pages
+
+
+def load_chunks(pdf_path, limit):
+    """Real chunks from a PDF (same splitter settings as RAGService), or synthetic ones"""
+    if not pdf_path:
+        return [f"{sentence} (variant {i})" for i in range(limit // len(PARITY_SAMPLE) + 1)
+                for sentence in PARITY_SAMPLE][:limit]
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    chunks = []
+    for page in iter_pages(pdf_path):
+        chunks.extend(splitter.split_text(page.page_content))
+        if len(chunks) >= limit:
+            break
+    return chunks[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG embedding backends")
+    parser.add_argument("--pdf", help="PDF to take chunks from (default: synthetic sentences)")
+    parser.add_argument("--chunks", type=int, default=512, help="Number of chunks to embed")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default=RAG_EMBEDDING_MODEL)
+    parser.add_argument("--quantization", default=RAG_EMBEDDING_QUANTIZATION)
+    parser.add_argument("--tolerance", type=float, default=RAG_EMBEDDING_PARITY_TOLERANCE)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf, args.chunks)
+    print(f"Embedding {len(chunks)} chunks with {args.model}\n")
+
+    reference_vectors = None
+    failed = False
+    print(f"{'backend':<10} {'load s':>8} {'chunks/s':>10} {'query ms':>9} {'min cos':>9} {'mean cos':>9}")
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        start = time.perf_counter()
+        embeddings = create_embeddings(args.model, backend, args.quantization)
+        load_seconds = time.perf_counter() - start
+
+        embeddings.embed_documents(chunks[:8])  # warm-up
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(chunks)
+        throughput = len(chunks) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for question in PARITY_SAMPLE:
+            embeddings.embed_query(question)
+        query_ms = (time.perf_counter() - start) * 1000 / len(PARITY_SAMPLE)
+
+        if reference_vectors is None:
+            reference_vectors = vectors
+        similarities = [cosine_similarity(a, b) for a, b in zip(reference_vectors, vectors)]
+        min_cos, mean_cos = min(similarities), sum(similarities) / len(similarities)
+        failed |= min_cos < 1 - args.tolerance
+
+        if backend in args.backends:
+            print(f"{backend:<10} {load_seconds:>8.1f} {throughput:>10.1f} {query_ms:>9.1f} {min_cos:>9.4f} {mean_cos:>9.4f}")
+
+    if failed:
+        print(f"\nFAIL: a backend fell below cosine {1 - args.tolerance:.3f} against torch")
+        sys.exit(1)
+    print(f"\nOK: all backends within cosine tolerance {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
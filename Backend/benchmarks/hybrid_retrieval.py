@@ -0,0 +1,80 @@
+"""
+Retrieval benchmark: MMR vector search vs hybrid (MMR + BM25, reciprocal rank fusion)
+on an indexed book. Queries are generated from the book's own chunks, so the chunk a
+query came from is the known-relevant answer:
+- keyword: the chunk's three rarest terms (section numbers, acronyms, formula names)
+- sentence: one sentence of the chunk, as a student might paste it
+
+Both modes run RAGService._retrieve, the retrieval step of every query path (question
+embedding, batched MMR, then BM25 fusion for hybrid). Reports recall@k (source chunk
+retrieved) and p50/p95 latency per mode.
+
+Usage (from Backend/, after indexing or reindexing the book):
+    python benchmarks/hybrid_retrieval.py --book-id 16
+    python benchmarks/hybrid_retrieval.py --book-id 16 --queries 300 --k 5
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lexical_index import tokenize
+from app.services.rag_service import rag_service
+
+
+def build_queries(chunks, lexical_index, count, seed):
+    """(kind, query, source chunk text) tuples sampled from the book"""
+    rng = random.Random(seed)
+    queries = []
+    for text in rng.sample(chunks, min(count, len(chunks))):
+        terms = sorted(set(tokenize(text)), key=lexical_index.idf, reverse=True)[:3]
+        if terms:
+            queries.append(("keyword", " ".join(terms), text))
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 8]
+        if sentences:
+            queries.append(("sentence", rng.choice(sentences), text))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid BM25 + vector retrieval")
+    parser.add_argument("--book-id", type=int, required=True, help="An indexed book")
+    parser.add_argument("--queries", type=int, default=200, help="Chunks to generate queries from")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per query (num_chunks)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    lexical_index = rag_service._get_lexical_index(args.book_id)
+    if lexical_index is None:
+        sys.exit(f"Book {args.book_id} has no lexical index yet - reindex it first")
+    collection = rag_service._get_vectorstore(args.book_id)._collection
+    chunks = collection.get(where=rag_service._book_filter(args.book_id), include=["documents"])["documents"]
+    queries = build_queries(chunks, lexical_index, args.queries, args.seed)
+    print(f"Book {args.book_id}: {len(chunks)} chunks, {len(queries)} queries, k={args.k}\n")
+
+    modes = {"mmr": False, "hybrid": True}
+    print(f"{'retrieval':<10} {'kind':<9} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, hybrid in modes.items():
+        rag_service._retrieve(args.book_id, args.k, queries[0][1], hybrid=hybrid)  # warm-up
+        for kind in ("keyword", "sentence"):
+            hits, latencies = 0, []
+            for query_kind, query, source in queries:
+                if query_kind != kind:
+                    continue
+                start = time.perf_counter()
+                docs = rag_service._retrieve(args.book_id, args.k, query, hybrid=hybrid)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(doc.page_content == source for doc in docs)
+            if not latencies:
+                continue
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+            print(f"{name:<10} {kind:<9} {hits / len(latencies):>9.3f} {statistics.median(latencies):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+End-to-end RAG query benchmark on a fully local stack: the real embedding model,
+Chroma index and Redis, with the LLM replaced by the deterministic stub
+(LLM_PROVIDER=stub unless set otherwise). Useful for profiling everything around
+the LLM call and for CI, where no API key or network is available.
+
+Questions carry a per-run tag so the answer cache starts cold. Reports p50/p95
+end-to-end latency and throughput at the given concurrency.
+
+Usage (from Backend/, with Redis running and the book indexed):
+    python benchmarks/rag_query.py --book-id 16
+    LLM_STUB_LATENCY_MS=1500 python benchmarks/rag_query.py --book-id 16 --queries 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+os.environ.setdefault("LLM_PROVIDER", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.rag_service import rag_service
+
+QUESTIONS = [
+    "What is the main theme of the book?",
+    "What are the key takeaways from the book?",
+    "How can this book be applied to real-world scenarios?",
+    "Which definitions does the book introduce first?",
+    "What examples does the book use to explain its core ideas?",
+]
+
+
+async def run(book_id: int, queries: int, concurrency: int, num_chunks: int):
+    tag = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} [{tag}-{i}]"
+        async with semaphore:
+            start = time.perf_counter()
+            result = await rag_service.query_book(book_id, question, num_chunks)
+            latencies.append((time.perf_counter() - start) * 1000)
+            failures += not result["success"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(queries)])
+    elapsed = time.perf_counter() - start
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    print(f"Book {book_id}: {queries} queries, concurrency {concurrency}, LLM provider {os.environ['LLM_PROVIDER']}")
+    print(f"p50 {statistics.median(latencies):.0f} ms  p95 {p95:.0f} ms  "
+          f"throughput {queries / elapsed:.1f} q/s  failures {failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG queries end to end with a local LLM stub")
+    parser.add_argument("--book-id", type=int, required=True, help="An indexed book")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--num-chunks", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.book_id, args.queries, args.concurrency, args.num_chunks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Bulk-index a directory of PDFs as library books.
+
+Each PDF becomes a book ("Author - Title.pdf" is parsed, otherwise the file name is the title)
+and is RAG-indexed across a process pool. Progress is checkpointed to a state file, so rerunning
+the same command after a crash resumes where it stopped:
+  python ingest.py D:/department_pdfs
+  python ingest.py D:/department_pdfs --workers 4 --category "Computer Science" --confidential
+"""
+
+import argparse
+import logging
+import os
+
+from app.services.bulk_ingest import run_bulk_ingest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Register and RAG-index a directory of PDFs")
+    parser.add_argument("directory", help="Directory to scan for PDFs (recursively)")
+    parser.add_argument("--state", default=os.path.join("static", "ingest_state.json"),
+                        help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--workers", type=int, default=None, help="Books indexed in parallel (default: CPU count)")
+    parser.add_argument("--category", action="append", default=[], help="Category for every book (repeatable)")
+    parser.add_argument("--confidential", action="store_true", help="Mark books confidential (no student AI generation)")
+    parser.add_argument("--copies", type=int, default=1, help="Total copies per book")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry books that failed in a previous run")
+    parser.add_argument("--no-recursive", action="store_true", help="Only scan the top-level directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(lineno)d - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    run_bulk_ingest(
+        args.directory,
+        args.state,
+        workers=args.workers,
+        categories=args.category,
+        is_public=not args.confidential,
+        total_copies=args.copies,
+        retry_failed=args.retry_failed,
+        recursive=not args.no_recursive
+    )
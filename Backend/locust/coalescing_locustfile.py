@@ -0,0 +1,59 @@
+"""
+Thundering-herd scenario for RAG request coalescing: every user asks the same few
+questions about one book at the same moment, like a class told to ask the bot.
+
+    locust -f locust/coalescing_locustfile.py --host http://127.0.0.1:8000 \
+        -u 200 -r 200 --run-time 1m --headless
+
+Questions carry a per-run tag so the answer cache starts cold. At the end the
+server's LLM call count (GET /rag/cache/stats, summed over all API processes in
+Redis) is compared with the number of unique questions; with single flight they match. Run with
+RAG_SEMANTIC_CACHE_ENABLED=false, or earlier runs' answers may be reused instead.
+With LLM_PROVIDER=stub on the API the scenario runs without any LLM API.
+"""
+import json
+import os
+import random
+import uuid
+
+import requests
+from locust import HttpUser, task, constant, events
+
+BOOK_ID = int(os.getenv("LOCUST_BOOK_ID", "16"))
+RUN_TAG = uuid.uuid4().hex[:8]
+QUESTIONS = [
+    f"{question} [{RUN_TAG}]"
+    for question in [
+        "What is the main theme of the book?",
+        "What are the key takeaways from the book?",
+        "How can this book be applied to real-world scenarios?",
+    ]
+]
+llm_calls_before = None
+
+
+def _llm_calls(environment):
+    return requests.get(f"{environment.host}/rag/cache/stats", timeout=10).json()["llm_calls_all_processes"]
+
+
+@events.test_start.add_listener
+def record_llm_calls(environment, **kwargs):
+    global llm_calls_before
+    llm_calls_before = _llm_calls(environment)
+
+
+@events.test_stop.add_listener
+def report_llm_calls(environment, **kwargs):
+    calls = _llm_calls(environment) - llm_calls_before
+    print(f"\nLLM calls: {calls} for {len(QUESTIONS)} unique questions "
+          f"({environment.stats.get(f'/rag/books/{BOOK_ID}/query', 'POST').num_requests} queries)")
+
+
+class ClassroomUser(HttpUser):
+    wait_time = constant(1)
+
+    @task
+    def ask_same_question(self):
+        payload = {"question": random.choice(QUESTIONS), "num_chunks": 5}
+        self.client.post(f"/rag/books/{BOOK_ID}/query", data=json.dumps(payload),
+                         headers={"Content-Type": "application/json"})
@@ -1,3 +1,9 @@
+"""
+General API load test. Point it at an API started with LLM_PROVIDER=stub to load-test
+without Gemini / Hugging Face (see docs/LOAD_TESTING.md).
+
+    locust -f locust/locustfile.py --host http://127.0.0.1:8000
+"""
 import json
 from locust import HttpUser, task, between
 import random
@@ -9,6 +15,11 @@ class APIUser(HttpUser):
     def call_root(self):
         self.client.get("/")
         
+    @task(1)
+    def call_health(self):
+        # Should stay flat while RAG queries are saturated
+        self.client.get("/health")
+        
     @task(3)
     def call_rag_query(self):
         book_id= random.randint(15,50)
@@ -0,0 +1,30 @@
+"""Move per-book Chroma collections into the single library collection.
+
+  python migrate_vectorstore.py                # copy, keep the per-book collections
+  python migrate_vectorstore.py --delete-old   # copy, then drop each per-book collection
+
+Then set RAG_SINGLE_COLLECTION=true and restart the API and index workers.
+"""
+
+import argparse
+import logging
+
+from app.config.settings import RAG_VECTORSTORE_DIR, RAG_LIBRARY_COLLECTION
+from app.services.chroma_client import create_chroma_client
+from app.services.vector_migration import migrate_to_single_collection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate per-book vector collections to one library collection")
+    parser.add_argument("--path", default=RAG_VECTORSTORE_DIR, help="Chroma persistence directory (ignored when RAG_CHROMA_HOST is set)")
+    parser.add_argument("--collection", default=RAG_LIBRARY_COLLECTION, help="Target library collection")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chunks copied per batch")
+    parser.add_argument("--delete-old", action="store_true", help="Delete per-book collections after copying")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(lineno)d - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    client = create_chroma_client(args.path)
+    result = migrate_to_single_collection(client, args.collection, args.batch_size, args.delete_old)
+    print(f"Migrated {result['chunks']} chunks from {result['books']} books into '{args.collection}'")
@@ -97,7 +97,7 @@ def test_create_book():
         
         response = client.post("/admin/books/", data=data, files=files)
         
-        assert response.status_code == 201
+        assert response.status_code == 202
         response_data = response.json()
         assert response_data["message"] == "Book added successfully"
         assert response_data["title"] == "New Book"
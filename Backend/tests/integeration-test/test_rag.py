@@ -0,0 +1,396 @@
+import os
+import sys
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, backend_path)
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config.database import get_db
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from app.services.rag_service import rag_service, LLM_CALLS_KEY
+import asyncio
+import json
+import pytest
+
+client = TestClient(app)
+
+def _redis_client():
+    """Empty answer cache whose single-flight lock is always free"""
+    redis_client = MagicMock(get=AsyncMock(return_value=None), setex=AsyncMock(), incr=AsyncMock(),
+                             mget=AsyncMock(side_effect=lambda keys: [None] * len(keys)))
+    redis_client.lock.return_value = MagicMock(acquire=AsyncMock(return_value=True), release=AsyncMock())
+    return redis_client
+
+def _fake_llm(**kwargs):
+    """Answer with a FakeListChatModel in both answer chains"""
+    llm = FakeListChatModel(**kwargs)
+    return patch.multiple(rag_service,
+                          answer_chain=rag_service.prompt | llm | StrOutputParser(),
+                          multi_book_chain=rag_service.multi_book_prompt | llm | StrOutputParser())
+
+def _vectorstore(text, page):
+    """Collection handle whose searches return one chunk"""
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [[text]],
+        "metadatas": [[{"page": page}]],
+        "embeddings": [[rag_service.embeddings.embed_query(text)]]
+    }
+    return vectorstore
+
+@pytest.fixture(autouse=True)
+def mock_dependencies():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides = {}
+
+def test_get_index_job_status():
+    with patch('app.routes.rag.get_index_job') as mock_get_index_job, \
+         patch('app.routes.rag.serialize_index_job') as mock_serialize:
+        mock_get_index_job.return_value = MagicMock()
+        mock_serialize.return_value = {
+            "job_id": 7,
+            "book_id": 1,
+            "status": "RUNNING",
+            "stage": "embedding",
+            "progress": 42.0
+        }
+        
+        response = client.get("/rag/books/1/index-jobs/7")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["job_id"] == 7
+        assert data["status"] == "RUNNING"
+        assert data["progress"] == 42.0
+        mock_get_index_job.assert_called_once()
+
+def test_get_index_job_status_not_found():
+    with patch('app.routes.rag.get_index_job') as mock_get_index_job:
+        mock_get_index_job.return_value = None
+        
+        response = client.get("/rag/books/1/index-jobs/99")
+        
+        assert response.status_code == 404
+
+def test_reindex_book_queues_incremental_job():
+    with patch('app.routes.rag.enqueue_index_job') as mock_enqueue, \
+         patch('app.routes.rag.serialize_index_job') as mock_serialize:
+        mock_book = MagicMock()
+        mock_book.title = "Database Systems"
+        mock_book.pdf_url = "static/pdfs/db.pdf"
+        mock_db = app.dependency_overrides[get_db]()
+        mock_db.query().filter().first.return_value = mock_book
+        mock_serialize.return_value = {"job_id": 3, "status": "QUEUED"}
+        
+        response = client.post("/rag/books/1/reindex")
+        
+        assert response.status_code == 202
+        assert response.json()["index_job"]["status"] == "QUEUED"
+        mock_enqueue.assert_called_once_with(mock_db, 1, "static/pdfs/db.pdf")
+
+def test_search_library_attaches_book_titles():
+    with patch('app.routes.rag.rag_service.search_library') as mock_search:
+        mock_search.return_value = {
+            "success": True,
+            "query": "locking",
+            "book_ids": None,
+            "collections_searched": 1,
+            "results": [{"chunk_id": "book_3_ab", "book_id": 3, "page": 12, "similarity": 0.81, "content": "Two-phase locking"}]
+        }
+        mock_db = app.dependency_overrides[get_db]()
+        mock_db.query().filter().all.return_value = [(3, "Database Systems")]
+        
+        response = client.post("/rag/search", json={"query": "locking", "k": 5})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["results"][0]["book_title"] == "Database Systems"
+        mock_search.assert_called_once_with("locking", None, 5)
+
+def test_search_library_rejects_empty_query():
+    response = client.post("/rag/search", json={"query": "  "})
+    assert response.status_code == 400
+
+def test_query_book_retrieves_once_for_answer_and_sources():
+    vectorstore = _vectorstore("A B-tree keeps keys sorted.", 4)
+    redis_client = _redis_client()
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", redis_client), \
+         patch.object(rag_service, "semantic_cache", None), \
+         _fake_llm(responses=["Sorted keys."]):
+        result = asyncio.run(rag_service.query_book(1, "What is a B-tree?", num_chunks=1))
+    
+    assert result["success"] is True
+    assert result["answer"] == "Sorted keys."
+    assert result["sources"] == [{"page": 4, "preview": "A B-tree keeps keys sorted."}]
+    vectorstore._collection.query.assert_called_once()
+
+def test_query_book_sources_are_the_chunks_sent_to_the_llm():
+    text = "A B-tree keeps keys sorted and balanced."
+    vector = rag_service.embeddings.embed_query(text)
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [[text, text]], "metadatas": [[{"page": 4}, {"page": 9}]], "embeddings": [[vector, vector]]
+    }
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", _redis_client()), \
+         patch.object(rag_service, "semantic_cache", None), \
+         _fake_llm(responses=["Sorted keys."]):
+        result = asyncio.run(rag_service.query_book(1, "What is a B-tree, exactly?", num_chunks=2))
+    
+    # The page 9 copy was dropped from the context, so it is not cited either
+    assert result["sources"] == [{"page": 4, "preview": text}]
+    assert result["num_chunks_used"] == 1
+
+def test_semantic_cache_miss_embeds_the_question_once():
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [["A B-tree keeps keys sorted."]], "metadatas": [[{"page": 4}]], "embeddings": [[[0.2, 0.1]]]
+    }
+    embeddings = MagicMock()
+    embeddings.embed_query.return_value = [0.1, 0.2]
+    semantic_cache = MagicMock(lookup=AsyncMock(return_value=None), put=AsyncMock())
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", _redis_client()), \
+         patch.object(rag_service, "semantic_cache", semantic_cache), \
+         patch.object(rag_service, "embeddings", embeddings), \
+         _fake_llm(responses=["Sorted keys."]):
+        result = asyncio.run(rag_service.query_book(1, "What is a B-tree, really?", num_chunks=1))
+    
+    assert result["sources"] == [{"page": 4, "preview": "A B-tree keeps keys sorted."}]
+    embeddings.embed_query.assert_called_once_with("What is a B-tree, really?")
+    assert vectorstore._collection.query.call_args.kwargs["query_embeddings"] == [[0.1, 0.2]]
+
+def test_query_stream_sends_sources_then_tokens_and_caches_answer():
+    mock_db = app.dependency_overrides[get_db]()
+    mock_db.query().filter().first.return_value = MagicMock(title="Database Systems")
+    vectorstore = _vectorstore("Normal forms remove anomalies.", 9)
+    redis_client = _redis_client()
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", redis_client), \
+         patch.object(rag_service, "semantic_cache", None), \
+         _fake_llm(responses=["Remove anomalies."]):
+        response = client.post("/rag/books/1/query/stream", json={"question": "Why normalize?", "num_chunks": 1})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    answer = "".join(json.loads(lines[1].removeprefix("data: ")) for lines in events[1:-1])
+    assert answer == "Remove anomalies."
+    cached = json.loads(redis_client.setex.call_args.args[2])
+    assert cached["answer"] == "Remove anomalies." and cached["sources"][0]["page"] == 9
+
+def test_identical_concurrent_queries_share_one_llm_call():
+    vectorstore = _vectorstore("Locks are held until commit.", 2)
+    redis_client = _redis_client()
+    
+    async def ask_together():
+        return await asyncio.gather(*[rag_service.query_book(2, "What is strict 2PL?", 1) for _ in range(5)])
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", redis_client), \
+         patch.object(rag_service, "semantic_cache", None), \
+         _fake_llm(responses=["Until commit."], sleep=0.05):
+        llm_calls = rag_service.llm_calls
+        results = asyncio.run(ask_together())
+    
+    assert [result["answer"] for result in results] == ["Until commit."] * 5
+    assert rag_service.llm_calls - llm_calls == 1
+    # Also counted in Redis, where the load test sums the calls of every API process
+    redis_client.incr.assert_awaited_once_with(LLM_CALLS_KEY)
+    vectorstore._collection.query.assert_called_once()
+
+def test_passages_returns_scored_chunks():
+    with patch('app.routes.rag.rag_service.search_book') as mock_search:
+        mock_search.return_value = {
+            "success": True,
+            "book_id": 4,
+            "query": "write-ahead log",
+            "results": [{"chunk_id": "book_4_cd", "book_id": 4, "page": 31, "similarity": 0.77, "content": "WAL"}],
+            "cached": False
+        }
+        
+        response = client.get("/rag/books/4/passages", params={"q": "write-ahead log", "k": 3})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["results"][0]["page"] == 31
+        mock_search.assert_called_once_with(4, "write-ahead log", 3)
+
+def test_search_book_serves_repeats_from_cache():
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "ids": [["book_5_ab"]], "documents": [["Undo logging"]], "metadatas": [[{"page": 7}]], "distances": [[0.4]]
+    }
+    
+    sync_redis_client = MagicMock()
+    sync_redis_client.get.return_value = None
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "sync_redis_client", sync_redis_client):
+        rag_service.passages.clear()
+        first = rag_service.search_book(5, "undo  logging", 2)
+        second = rag_service.search_book(5, "Undo logging", 2)
+        sync_redis_client.get.return_value = b"1"  # book reindexed by the worker
+        third = rag_service.search_book(5, "Undo logging", 2)
+        rag_service.passages.clear()
+    
+    assert first["cached"] is False and second["cached"] is True and third["cached"] is False
+    assert second["results"] == [{"chunk_id": "book_5_ab", "book_id": None, "page": 7, "similarity": 0.8, "content": "Undo logging"}]
+    assert vectorstore._collection.query.call_count == 2
+
+def test_batch_retrieval_keeps_mmr_selection_order():
+    # By distance: "Locks", then its near-duplicate, then "Logs"; MMR picks "Logs" second
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [["Locks", "Locks again", "Logs"]],
+        "metadatas": [[{"page": 1}, {"page": 2}, {"page": 3}]],
+        "embeddings": [[[0.9, 0.436, 0.0], [0.89, 0.456, 0.0], [0.85, -0.5, 0.166]]]
+    }
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore):
+        [docs] = rag_service._mmr_batch(1, [[1.0, 0.0, 0.0]], 3)
+    
+    assert [doc.page_content for doc in docs] == ["Locks", "Logs", "Locks again"]
+
+def test_batch_query_answers_in_order_with_cache_status():
+    mock_db = app.dependency_overrides[get_db]()
+    mock_db.query().filter().first.return_value = MagicMock(title="Database Systems")
+    cached = {"success": True, "question": "What is 1NF?", "answer": "Atomic values.", "sources": [], "num_chunks_used": 0}
+    redis_client = _redis_client()
+    redis_client.mget = AsyncMock(return_value=[json.dumps(cached), None, None])
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [["2NF removes partial dependencies."]],
+        "metadatas": [[{"page": 12}]],
+        "embeddings": [[rag_service.embeddings.embed_query("2NF")]]
+    }
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", return_value=True), \
+         patch.object(rag_service, "redis_client", redis_client), \
+         patch.object(rag_service, "semantic_cache", None), \
+         _fake_llm(responses=["No partial dependencies."]):
+        llm_calls = rag_service.llm_calls
+        response = client.post("/rag/books/1/query/batch", json={
+            "questions": ["What is 1NF?", "What is 2NF?", "What is 2NF?"], "num_chunks": 1
+        })
+    
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["cache"] for r in results] == ["hit", "miss", "miss"]
+    assert results[0]["answer"] == "Atomic values."
+    assert results[1]["answer"] == results[2]["answer"] == "No partial dependencies."
+    assert results[1]["sources"][0]["page"] == 12
+    assert response.json()["cache_summary"] == {"hit": 1, "semantic": 0, "miss": 2}
+    assert rag_service.llm_calls - llm_calls == 1
+    vectorstore._collection.query.assert_called_once()
+
+def test_batch_query_rejects_too_many_questions():
+    response = client.post("/rag/books/1/query/batch", json={"questions": ["Q?"] * 51})
+    assert response.status_code == 400
+
+def test_multi_book_query_merges_books_into_one_cited_answer():
+    mock_db = app.dependency_overrides[get_db]()
+    mock_db.query().filter().all.return_value = [(1, "Database Systems"), (2, "Transaction Processing"), (3, "Unindexed")]
+    
+    def collection(book_id, text):
+        vectorstore = MagicMock()
+        vectorstore._collection.query.return_value = {
+            "documents": [[text]],
+            "metadatas": [[{"book_id": book_id, "page": book_id * 10}]],
+            "embeddings": [[rag_service.embeddings.embed_query(text)]],
+            "distances": [[0.2 * book_id]]
+        }
+        return vectorstore
+    vectorstores = {1: collection(1, "Two-phase locking guarantees serializability."),
+                    2: collection(2, "Strict 2PL holds write locks until commit.")}
+    
+    def get_vectorstore(book_id):
+        if book_id not in vectorstores:
+            raise ValueError("Collection book_3 does not exist")
+        return vectorstores[book_id]
+    
+    with patch.object(rag_service, "_get_vectorstore", side_effect=get_vectorstore), \
+         patch.object(rag_service, "redis_client", _redis_client()), \
+         _fake_llm(responses=["Both books rely on locking [1][2]."]):
+        llm_calls = rag_service.llm_calls
+        response = client.post("/rag/query", json={
+            "question": "How is serializability enforced?", "book_ids": [1, 2, 3], "num_chunks": 2
+        })
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"] == "Both books rely on locking [1][2]."
+    assert [(s["citation"], s["book_id"], s["book_title"]) for s in body["sources"]] == [
+        (1, 1, "Database Systems"), (2, 2, "Transaction Processing")
+    ]
+    assert body["books_searched"] == [1, 2] and body["books_skipped"] == [3]
+    assert rag_service.llm_calls - llm_calls == 1
+
+def test_multi_book_query_counts_low_ranked_books_as_searched():
+    vectorstore = MagicMock()
+    vectorstore._collection.query.return_value = {
+        "documents": [["Two-phase locking guarantees serializability."]],
+        "metadatas": [[{"book_id": 1, "page": 10}]],
+        "embeddings": [[rag_service.embeddings.embed_query("locking")]],
+        "distances": [[0.1]]
+    }
+    
+    with patch("app.services.rag_service.RAG_SINGLE_COLLECTION", True), \
+         patch.object(rag_service, "_get_vectorstore", return_value=vectorstore), \
+         patch.object(rag_service, "_has_book_chunks", side_effect=lambda collection, book_id: book_id != 3), \
+         patch.object(rag_service, "redis_client", _redis_client()), \
+         _fake_llm(responses=["Locking [1]."]):
+        result = asyncio.run(rag_service.query_books(
+            {1: "Database Systems", 2: "Transaction Processing", 3: "Unindexed"}, "How is serializability enforced?", 1
+        ))
+    
+    # Book 2 is indexed but none of its chunks made the shared candidate list
+    assert result["books_searched"] == [1, 2] and result["books_skipped"] == [3]
+
+def test_multi_book_query_needs_books_or_category():
+    response = client.post("/rag/query", json={"question": "What is 2PL?"})
+    assert response.status_code == 400
+
+def test_delete_index_invalidates_cached_answers_with_one_incr():
+    mock_db = app.dependency_overrides[get_db]()
+    mock_db.query().filter().first.return_value = MagicMock(title="Database Systems")
+    redis_client = _redis_client()
+    redis_client.incr = AsyncMock(return_value=1)
+    redis_client.publish = AsyncMock()
+    
+    with patch.object(rag_service, "_get_vectorstore", return_value=MagicMock()), \
+         patch.object(rag_service, "redis_client", redis_client):
+        response = client.delete("/rag/books/1/index")
+    
+    assert response.status_code == 200
+    redis_client.incr.assert_awaited_once_with("cache_gen:1")
+    redis_client.publish.assert_awaited_once_with("cache_gen:invalidate", 1)
+    redis_client.scan_iter.assert_not_called()
+
+def test_has_book_chunks_reads_one_id_in_single_collection_mode():
+    collection = MagicMock()
+    collection.get.return_value = {"ids": ["book_7_abc"]}
+    with patch("app.services.rag_service.RAG_SINGLE_COLLECTION", True):
+        assert rag_service._has_book_chunks(collection, 7) is True
+    collection.get.assert_called_once_with(where={"book_id": 7}, limit=1, include=[])
@@ -0,0 +1,67 @@
+import queue
+import time
+
+import pytest
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def subscribe(self, channel):
+        self.messages.put({"type": "subscribe", "channel": channel, "data": 1})
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    """
+    Sync Redis shared by every simulated process, with one subscriber.
+    Counts GETs of content keys (not cache generations) and records what was published.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.content_gets = 0
+        self.published = []
+        self.messages = queue.Queue()
+
+    def get(self, key):
+        if not key.startswith("cache_gen:"):
+            self.content_gets += 1
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode()
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+        return int(self.values[key])
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        self.messages.put({"type": "message", "channel": channel, "data": str(message).encode()})
+
+    def pubsub(self):
+        return FakePubSub(self.messages)
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def wait_for():
+    """Poll until a condition set by a listener thread holds (fails after 2 seconds)"""
+    def wait(condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert condition()
+    return wait
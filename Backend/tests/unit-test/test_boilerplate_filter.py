@@ -0,0 +1,49 @@
+from app.services.boilerplate_filter import RepeatedLineFilter
+
+
+def make_page(number, body):
+    return "\n".join([
+        "Journal of Data Systems - Vol 12",
+        f"Chapter notes, page {number}",
+        body,
+        "Licensed to Example University Library",
+    ])
+
+
+def test_repeated_header_and_footer_lines_are_removed():
+    topics = ["indexes", "joins", "locking", "recovery", "schemas", "queries", "buffers", "hashing"]
+    texts = [make_page(i, f"Body text about {topic}.\nMore on {topic} here.\nSummary of {topic}.")
+             for i, topic in enumerate(topics, start=1)]
+    stats = {}
+    stripped = RepeatedLineFilter().process(texts, stats)
+
+    for topic, text in zip(topics, stripped):
+        assert "Journal of Data Systems" not in text
+        assert "Licensed to Example" not in text
+        assert "Chapter notes, page" not in text  # numbering differs per page but normalizes equal
+        assert f"Body text about {topic}." in text
+        assert f"Summary of {topic}." in text
+    assert stats["boilerplate_lines_removed"] == 8 * 3
+
+
+def test_body_lines_outside_the_band_are_kept():
+    repeated_body = "\n".join(f"line {c}" for c in "abcdefgh")
+    texts = [f"top {c}\n{repeated_body}\nbottom {c}" for c in "pqrstuvw"]
+    stats = {}
+    # "line b" .. "line g" repeat on every page but sit outside the 1-line band
+    stripped = RepeatedLineFilter(band_lines=1).process(texts, stats)
+    assert all("line d" in text for text in stripped)
+
+
+def test_small_windows_are_left_untouched():
+    texts = [make_page(i, "body") for i in range(3)]
+    stats = {}
+    assert RepeatedLineFilter(min_pages=4).process(texts, stats) == texts
+    assert stats == {}
+
+
+def test_pages_are_never_stripped_to_nothing():
+    texts = [f"Slide {i}\nTopic {i} overview" for i in range(1, 9)]
+    stats = {}
+    assert RepeatedLineFilter().process(texts, stats) == texts
+    assert stats["boilerplate_lines_removed"] == 0
@@ -0,0 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from app.services.bulk_ingest import (
+    IngestState, _init_index_worker, _worker_parallelism, scan_pdfs, title_author_from_filename
+)
+
+
+def test_scan_finds_pdfs_recursively_in_stable_order(tmp_path):
+    (tmp_path / "b").mkdir()
+    for name in ["z.pdf", "a.PDF", "notes.txt", "b/c.pdf"]:
+        (tmp_path / name).write_bytes(b"%PDF-1.4")
+
+    found = scan_pdfs(str(tmp_path))
+    assert [p.replace(str(tmp_path), "") for p in found] == ["/a.PDF", "/z.pdf", "/b/c.pdf"]
+    assert len(scan_pdfs(str(tmp_path), recursive=False)) == 2
+
+
+def test_title_and_author_from_filename():
+    assert title_author_from_filename("/x/Ramez Elmasri - Fundamentals of Database Systems.pdf") == (
+        "Fundamentals of Database Systems", "Ramez Elmasri"
+    )
+    assert title_author_from_filename("/x/operating_systems_notes.pdf") == ("operating systems notes", "Unknown")
+
+
+def test_state_checkpoints_survive_a_restart(tmp_path):
+    path = str(tmp_path / "state" / "ingest.json")
+    state = IngestState(path)
+    state.update("/pdfs/a.pdf", book_id=1, status="registered", pages=10)
+    state.update("/pdfs/b.pdf", book_id=2, status="registered", pages=5)
+    state.update("/pdfs/b.pdf", status="indexed")
+    state.update("/pdfs/c.pdf", book_id=3, status="failed", error="boom")
+
+    resumed = IngestState(path)
+    assert resumed.books["/pdfs/a.pdf"]["book_id"] == 1
+    assert resumed.pending() == ["/pdfs/a.pdf"]
+    assert resumed.pending(retry_failed=True) == ["/pdfs/a.pdf", "/pdfs/c.pdf"]
+
+
+def test_book_workers_do_not_start_their_own_pools(monkeypatch):
+    monkeypatch.setenv("RAG_EXTRACT_WORKERS", "7")
+    monkeypatch.setenv("RAG_EMBED_WORKERS", "4")
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context,
+                             initializer=_init_index_worker, initargs=(1,)) as executor:
+        assert executor.submit(_worker_parallelism).result(timeout=120) == (1, 0)
@@ -0,0 +1,30 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.cache_versions import (
+    aget_generations, bump_generation, get_generation, versioned_key
+)
+from app.services.rag_service import RAGService
+
+
+def test_bumping_a_book_changes_only_its_keys(fake_redis):
+    before = [versioned_key(f"summary_{book_id}", get_generation(fake_redis, book_id)) for book_id in (1, 2)]
+
+    bump_generation(fake_redis, 1)
+    after = [versioned_key(f"summary_{book_id}", get_generation(fake_redis, book_id)) for book_id in (1, 2)]
+
+    assert before == ["summary_1:g0", "summary_2:g0"]
+    assert after == ["summary_1:g1", "summary_2:g0"]
+    assert fake_redis.published == [("cache_gen:invalidate", 1)]
+
+
+def test_answer_cache_key_depends_on_generation():
+    assert RAGService._query_cache_key(1, 0, "What is 2PL?", 5) != RAGService._query_cache_key(1, 1, "What is 2PL?", 5)
+    assert RAGService._query_cache_key(1, 3, "What is 2PL?", 5) == RAGService._query_cache_key(1, 3, "What is 2PL?", 5)
+
+
+def test_generations_of_many_books_take_one_round_trip():
+    fake_redis = MagicMock(mget=AsyncMock(return_value=[b"4", None]))
+
+    assert asyncio.run(aget_generations(fake_redis, [7, 9])) == {7: 4, 9: 0}
+    fake_redis.mget.assert_awaited_once_with(["cache_gen:7", "cache_gen:9"])
@@ -0,0 +1,13 @@
+from unittest.mock import patch
+
+import app.services.chroma_client as chroma_client
+
+
+def test_chroma_server_is_used_when_configured(tmp_path, monkeypatch):
+    monkeypatch.setattr(chroma_client, "RAG_CHROMA_HOST", "chroma.internal")
+    with patch.object(chroma_client.chromadb, "HttpClient") as http_client:
+        assert chroma_client.create_chroma_client(str(tmp_path)) is http_client.return_value
+    http_client.assert_called_once_with(host="chroma.internal", port=chroma_client.RAG_CHROMA_PORT)
+
+    monkeypatch.setattr(chroma_client, "RAG_CHROMA_HOST", "")
+    assert not chroma_client.uses_chroma_server()
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from app.services.cache_versions import bump_generation
+from app.services.content_cache import ContentCache
+
+
+@pytest.fixture
+def subscribed_cache(wait_for):
+    def create(redis_client, **kwargs):
+        cache = ContentCache(redis_client, max_bytes=10_000, ttl=60, enabled=True, **kwargs)
+        cache._local_enabled()  # starts the listener
+        wait_for(lambda: cache.subscribed)
+        return cache
+    return create
+
+
+def test_hot_key_is_served_from_process_memory(fake_redis, subscribed_cache):
+    cache = subscribed_cache(fake_redis)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {"book_id": 1, "summary_text": "x" * 500, "status": "exists"}, 86400
+
+    for _ in range(5):
+        assert cache.get_or_load("summary", 1, load)["summary_text"] == "x" * 500
+
+    assert len(loads) == 1 and fake_redis.content_gets == 1
+    assert json.loads(fake_redis.values["summary_1:g0"])["status"] == "exists"
+    stats = cache.stats()
+    assert stats["local"]["hits"] == 4 and stats["local"]["hit_rate"] == 80.0
+    assert stats["redis"]["misses"] == 1 and stats["redis"]["hit_rate"] == 0.0
+
+
+def test_generation_bump_drops_local_copies_in_every_process(fake_redis, subscribed_cache, wait_for):
+    worker = subscribed_cache(fake_redis)
+    worker.get_or_load("summary", 1, lambda: ({"summary_text": "old"}, 86400))
+    worker.get_or_load("summary", 2, lambda: ({"summary_text": "other"}, 86400))
+
+    bump_generation(fake_redis, 1)  # e.g. admin regenerates book 1 in another worker
+    wait_for(lambda: worker.invalidations == 1)
+
+    assert ("summary", 1) not in worker.local and ("summary", 2) in worker.local
+    assert worker.get_or_load("summary", 1, lambda: ({"summary_text": "new"}, 86400)) == {"summary_text": "new"}
+
+
+def test_value_loaded_during_an_invalidation_is_not_kept_locally(fake_redis, subscribed_cache, wait_for):
+    cache = subscribed_cache(fake_redis)
+
+    def load_while_regenerated():
+        bump_generation(fake_redis, 1)
+        wait_for(lambda: cache.invalidations == 1)
+        return {"summary_text": "maybe stale"}, 86400
+
+    cache.get_or_load("summary", 1, load_while_regenerated)
+
+    assert ("summary", 1) not in cache.local
@@ -0,0 +1,53 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.context_assembler import assemble_context, estimate_tokens, merge_sections
+
+
+def test_adjacent_chunks_of_a_page_merge_without_the_overlap():
+    page = " ".join(f"Sentence {i} explains how write-ahead logging keeps commits durable." for i in range(20))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100, separators=[". ", " ", ""])
+    first, second = splitter.split_text(page)[:2]
+    docs = [Document(page_content=second, metadata={"page": 4}), Document(page_content=first, metadata={"page": 4})]
+
+    [(text, section_docs)] = merge_sections(docs)
+
+    assert text.startswith(first) and text.endswith(second)
+    assert len(text) < len(first) + len(second)
+    assert section_docs == docs
+
+
+def test_near_identical_chunks_are_sent_once():
+    text = "Two-phase locking has a growing phase and a shrinking phase; no lock is acquired after the first release."
+    docs = [
+        Document(page_content=text, metadata={"page": 3}),
+        Document(page_content=text.replace("; no", ", no"), metadata={"page": 90}),
+        Document(page_content="Timestamp ordering avoids locks entirely.", metadata={"page": 91}),
+    ]
+
+    assert merge_sections(docs) == [(text, [docs[0]]), ("Timestamp ordering avoids locks entirely.", [docs[2]])]
+
+
+def test_context_is_trimmed_to_the_token_budget_in_rank_order():
+    docs = [Document(page_content=f"Chunk {i}. " + "word " * 150, metadata={"page": i}) for i in range(5)]
+
+    context, sections, stats = assemble_context(docs, estimate_tokens, token_budget=500)
+
+    assert context.startswith("Chunk 0.")
+    # Only the chunks that made it into the context are reported back
+    assert [doc.metadata["page"] for section in sections for doc in section] == list(range(stats["sections"]))
+    assert stats["sections"] < len(docs)
+    assert stats["tokens_after"] <= 500 < stats["tokens_before"]
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"]
+
+
+def test_headers_number_the_kept_sections_within_the_budget():
+    docs = [Document(page_content=f"Excerpt {i}. " + "word " * 150, metadata={"book_id": i, "page": i}) for i in range(5)]
+
+    context, sections, stats = assemble_context(
+        docs, estimate_tokens, token_budget=500, header=lambda n, doc: f"[{n}] Book {doc.metadata['book_id']}"
+    )
+
+    assert context.startswith("[1] Book 0\nExcerpt 0.")
+    assert f"[{len(sections)}] Book {len(sections) - 1}\n" in context
+    assert stats["tokens_after"] <= 500
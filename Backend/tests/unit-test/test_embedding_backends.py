@@ -0,0 +1,44 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_backends import check_parity, create_embeddings, embedding_model_id
+
+
+class FixedEmbeddings(Embeddings):
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def _vector(self, text):
+        return [float(len(text)), 1.0 + self.noise, float(text.count(" "))]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def test_parity_passes_for_identical_backends():
+    result = check_parity(FixedEmbeddings(), FixedEmbeddings())
+    assert result["passed"] is True
+    assert result["min_cosine"] == pytest.approx(1.0)
+
+
+def test_parity_fails_beyond_tolerance():
+    result = check_parity(FixedEmbeddings(), FixedEmbeddings(noise=40.0), tolerance=0.01)
+    assert result["passed"] is False
+    assert result["min_cosine"] < 0.99
+
+
+def test_cache_namespace_separates_quantized_vectors():
+    model = "sentence-transformers/all-mpnet-base-v2"
+    assert embedding_model_id(model, "torch", "avx2") == model
+    assert embedding_model_id(model, "onnx-int8", "avx2") != embedding_model_id(model, "onnx-int8", "arm64")
+    assert embedding_model_id(model, "onnx", "avx2") != model
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_embeddings("some/model", backend="tensorrt")
+    with pytest.raises(ValueError):
+        create_embeddings("some/model", backend="onnx-int8", quantization="sse2")
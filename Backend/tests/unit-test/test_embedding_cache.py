@@ -0,0 +1,38 @@
+import pytest
+from app.services.embedding_cache import EmbeddingCache, chunk_digest, normalize_chunk_text
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "test-model")
+    yield cache
+    cache.close()
+
+
+def test_chunk_digest_is_stable_and_whitespace_insensitive():
+    assert chunk_digest("Normal  form\nrules") == chunk_digest(" Normal form rules ")
+    assert chunk_digest("Normal form rules") != chunk_digest("Normal form rule")
+    # sha256 hex digest, identical across processes (unlike built-in hash())
+    assert len(chunk_digest("abc")) == 64
+    assert normalize_chunk_text("a\t\tb\n") == "a b"
+
+
+def test_put_and_get_roundtrip(cache):
+    cache.put_many({"d1": [0.25, -0.5, 1.0], "d2": [0.0, 0.125, 0.75]})
+
+    found = cache.get_many(["d1", "d2", "missing"])
+
+    assert found["d1"] == [0.25, -0.5, 1.0]
+    assert found["d2"] == [0.0, 0.125, 0.75]
+    assert "missing" not in found
+    assert cache.count() == 2
+
+
+def test_entries_are_scoped_by_model(tmp_path, cache):
+    cache.put_many({"d1": [1.0, 2.0]})
+    other = EmbeddingCache(cache.db_path, "other-model")
+    try:
+        assert other.get_many(["d1"]) == {}
+        assert cache.get_many(["d1"]) == {"d1": [1.0, 2.0]}
+    finally:
+        other.close()
@@ -0,0 +1,47 @@
+from concurrent.futures import Future
+from app.services.embedding_pool import EmbeddingPool
+
+
+class InlineExecutor:
+    """Runs each shard at submit time and counts the submissions"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, texts):
+        self.submitted += 1
+        future = Future()
+        future.set_result([[float(len(text))] for text in texts])
+        return future
+
+
+def _pool(workers=2):
+    pool = EmbeddingPool.__new__(EmbeddingPool)
+    pool.workers = workers
+    pool.shard_size = 2
+    pool.stats = {"chunks": 0, "seconds": 0.0}
+    pool._executor = InlineExecutor()
+    return pool
+
+
+def test_embed_stream_yields_batches_in_order():
+    pool = _pool()
+    batches = [["a", "bb", "ccc"], [], ["dddd"]]
+    assert list(pool.embed_stream(batches)) == [[[1.0], [2.0], [3.0]], [], [[4.0]]]
+    assert pool.stats["chunks"] == 4
+
+
+def test_embed_stream_reads_ahead_a_bounded_number_of_empty_batches():
+    pool = _pool()
+    pulled = []
+
+    def batches():
+        for index in range(100):
+            pulled.append(index)
+            yield []
+
+    stream = pool.embed_stream(batches())
+    assert next(stream) == []
+    assert len(pulled) <= pool.workers * 2
+    assert sum(1 for _ in stream) == 99
+    assert pool._executor.submitted == 0
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from app.config.database import Base
+from app.models.books import Books
+from app.models.index_job import IndexJob, IndexJobStatus
+import app.models.borrow  # noqa: F401 - register related mappers
+import app.models.users  # noqa: F401
+import app.models.static_content  # noqa: F401
+from sqlalchemy.pool import StaticPool
+from app.services import index_jobs
+from app.services.index_jobs import enqueue_index_job, claim_next_job, get_index_job, serialize_index_job
+
+
+class InlineRunner:
+    """Stands in for the API's background executor and records what it was given"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = InlineRunner()
+    monkeypatch.setattr(index_jobs, "inline_runner", runner)
+    return runner
+
+
+@pytest.fixture
+def db(monkeypatch, runner):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Books.__table__, IndexJob.__table__])
+    monkeypatch.setattr(index_jobs, "SessionLocal", sessionmaker(bind=engine))
+    session = sessionmaker(bind=engine)()
+    session.add(Books(book_id=1, title="Book", author="Author", total_copies=1, available_copies=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_enqueue_creates_queued_job(db):
+    job = enqueue_index_job(db, 1, "static/pdfs/book.pdf")
+    assert job.status == IndexJobStatus.QUEUED
+    assert job.progress == 0.0
+    assert get_index_job(db, 1, job.job_id).job_id == job.job_id
+    # Jobs are scoped to their book
+    assert get_index_job(db, 2, job.job_id) is None
+
+
+def test_claim_next_job_is_fifo_and_marks_running(db):
+    first = enqueue_index_job(db, 1, "a.pdf")
+    second = enqueue_index_job(db, 1, "b.pdf")
+
+    claimed = claim_next_job(db)
+    assert claimed.job_id == first.job_id
+    assert claimed.status == IndexJobStatus.RUNNING
+    assert claimed.attempts == 1
+
+    assert claim_next_job(db).job_id == second.job_id
+    assert claim_next_job(db) is None
+
+
+def test_serialize_index_job_reports_percentage(db):
+    job = enqueue_index_job(db, 1, "a.pdf")
+    job.progress = 0.5
+    data = serialize_index_job(job)
+    assert data["status"] == "QUEUED"
+    assert data["progress"] == 50.0
+    assert data["status_url"] == f"/rag/books/1/index-jobs/{job.job_id}"
+
+
+def test_without_chroma_server_jobs_run_in_the_api_process(db, runner, monkeypatch):
+    ran = []
+    monkeypatch.setattr(index_jobs, "run_index_job", ran.append)
+    job = enqueue_index_job(db, 1, "a.pdf")
+
+    (fn, args), = runner.submitted
+    fn(*args)
+    db.refresh(job)
+    assert ran == [job.job_id]
+    assert job.status == IndexJobStatus.RUNNING
+    # A worker polling the same table cannot claim it a second time
+    assert claim_next_job(db) is None
+
+
+def test_worker_refuses_to_start_without_chroma_server(db, monkeypatch):
+    monkeypatch.setattr(index_jobs, "claim_next_job", lambda db: pytest.fail("worker claimed a job"))
+    index_jobs.run_worker(once=True)
+
+
+def test_with_chroma_server_jobs_wait_for_a_worker(db, runner, monkeypatch):
+    monkeypatch.setattr(index_jobs, "uses_chroma_server", lambda: True)
+    enqueue_index_job(db, 1, "a.pdf")
+    assert runner.submitted == []
+    assert claim_next_job(db).status == IndexJobStatus.RUNNING
+
+
+def test_create_index_job_table_is_idempotent(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Books.__table__])
+    monkeypatch.setattr(index_jobs, "engine", engine)
+
+    index_jobs.create_index_job_table()
+    index_jobs.create_index_job_table()
+    assert "rag_index_jobs" in inspect(engine).get_table_names()
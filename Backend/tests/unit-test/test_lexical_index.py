@@ -0,0 +1,41 @@
+from app.services.hybrid_retrieval import reciprocal_rank_fusion
+from app.services.lexical_index import BM25Index, tokenize
+
+
+def test_tokenize_keeps_section_numbers_and_compound_terms():
+    tokens = tokenize("See Section 3.2.1 on the B-tree and UTF-8 encoding")
+
+    assert "3.2.1" in tokens
+    assert "b-tree" in tokens and "tree" in tokens
+    assert "utf-8" in tokens
+    assert "the" not in tokens
+
+
+def test_exact_term_ranks_its_chunk_first():
+    index = BM25Index()
+    index.add("c1", "Normalization removes update anomalies from relations.")
+    index.add("c2", "Boyce-Codd normal form (BCNF) is stricter than 3NF.")
+    index.add("c3", "Transactions follow the ACID properties.")
+
+    assert index.search("what is BCNF", k=2)[0][0] == "c2"
+    assert index.search("unrelated words", k=2) == []
+
+
+def test_index_round_trips_through_disk(tmp_path):
+    index = BM25Index()
+    index.add("c1", "Two-phase locking guarantees serializability.")
+    index.add("c2", "Write-ahead logging makes commits durable.")
+    path = str(tmp_path / "book_1.json.gz")
+
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert loaded.search("write-ahead log", k=1) == index.search("write-ahead log", k=1)
+    assert BM25Index.load(str(tmp_path / "missing.json.gz")) is None
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "a", "c"]])
+
+    assert fused[:2] == ["a", "c"]  # found by both lists beats a single first place
+    assert set(fused) == {"a", "b", "c", "d"}
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.llm_providers import StubChatModel, create_chat_model, stub_completion, stub_delays
+
+
+def test_stub_is_deterministic_per_prompt():
+    prompt = "Book Content: normalization removes update anomalies. Student Question: What is 3NF?"
+
+    assert stub_completion(prompt) == stub_completion(prompt)
+    assert stub_completion(prompt) != stub_completion(prompt + "?")
+    assert stub_delays(prompt, 800, 0.5, 50) == stub_delays(prompt, 800, 0.5, 50)
+    assert stub_delays(prompt, 800, 0.0, 50) == (0.8, 0.02)
+
+
+def test_stub_answers_json_prompts_with_json():
+    prompt = 'Output format (JSON object only, no extra text):\n{"question": "Your question here?", "answer": "..."}'
+
+    pair = json.loads(stub_completion(prompt))
+
+    assert pair["question"].endswith("?") and pair["answer"]
+
+
+def test_stub_chat_model_streams_the_same_text_it_returns():
+    model = StubChatModel(latency_ms=0, latency_sigma=0, tokens_per_second=0, response_tokens=30)
+
+    async def run():
+        streamed = [chunk.content async for chunk in model.astream("What is two-phase locking?")]
+        return "".join(streamed), (await model.ainvoke("What is two-phase locking?")).content
+
+    streamed, answer = asyncio.run(run())
+
+    assert streamed == answer and len(answer.split()) == 30
+    with pytest.raises(ValueError):
+        create_chat_model("openai")
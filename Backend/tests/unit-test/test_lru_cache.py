@@ -0,0 +1,49 @@
+from app.utils.lru_cache import LRUCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    evicted = []
+    cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert evicted == ["b"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_or_create_builds_once_and_counts_hits():
+    cache = LRUCache(4)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_create((1, 5), build)
+    assert cache.get_or_create((1, 5), build) is first
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_pop_where_invalidates_matching_keys():
+    cache = LRUCache(8)
+    for key in [(1, 5), (1, 10), (2, 5)]:
+        cache.put(key, key)
+
+    assert cache.pop_where(lambda key: key[0] == 1) == 2
+    assert len(cache) == 1 and (2, 5) in cache
+
+
+def test_weighted_cache_is_bounded_by_total_weight():
+    cache = LRUCache(100, weigh=len)
+    cache.put("a", "x" * 40)
+    cache.put("b", "x" * 40)
+    cache.put("a", "x" * 10)  # replacing a value re-weighs it
+    cache.put("c", "x" * 60)
+
+    assert cache.weight == 70 and "b" not in cache
+    cache.pop("a")
+    assert cache.weight == 60
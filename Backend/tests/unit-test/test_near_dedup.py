@@ -0,0 +1,33 @@
+from app.services.near_dedup import MinHashDeduplicator
+
+BOILERPLATE = (
+    "This copy is licensed to Example University Library for personal study only and "
+    "may not be redistributed, resold or shared without the written permission of the publisher. "
+    "Reproduction of any part of this work beyond that permitted by the copyright act is unlawful. "
+    "Requests for permission or further information should be addressed to the permissions "
+    "department of the publisher at the address printed on the copyright page of this edition."
+)
+
+
+def test_near_duplicate_boilerplate_is_detected():
+    dedup = MinHashDeduplicator(threshold=0.8)
+    assert dedup.is_duplicate(BOILERPLATE) is False
+    assert dedup.is_duplicate(BOILERPLATE.replace("personal study", "personal  study")) is True
+    assert dedup.is_duplicate(BOILERPLATE.replace("Example", "Sample")) is True
+
+
+def test_distinct_chunks_are_kept():
+    dedup = MinHashDeduplicator(threshold=0.8)
+    chunks = [
+        "Normalization decomposes relations to remove update anomalies and redundancy.",
+        "A B-tree keeps keys sorted and balanced so lookups touch few disk pages.",
+        "Two-phase locking guarantees conflict serializability of concurrent transactions.",
+    ]
+    assert [dedup.is_duplicate(chunk) for chunk in chunks] == [False, False, False]
+
+
+def test_signatures_are_deterministic():
+    first = MinHashDeduplicator().signature(BOILERPLATE)
+    second = MinHashDeduplicator().signature(BOILERPLATE)
+    assert (first == second).all()
+    assert MinHashDeduplicator.estimated_jaccard(first, second) == 1.0
@@ -0,0 +1,29 @@
+import pytest
+import pymupdf
+from app.services.pdf_extraction import clean_text, iter_pages
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    pdf_path = str(tmp_path / "sample.pdf")
+    doc = pymupdf.open()
+    for i in range(12):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}\nBody text for page number {i} about databases.\nWrite to me@example.com")
+    doc.save(pdf_path)
+    return pdf_path
+
+
+def test_clean_text_removes_noise():
+    text = "Page 4\nNormalization reduces redundancy.\nSee https://example.com or mail a@b.com\n5 / 111"
+    assert clean_text(text) == "Normalization reduces redundancy. See or mail"
+
+
+def test_parallel_extraction_matches_serial(sample_pdf):
+    serial = list(iter_pages(sample_pdf, max_workers=1))
+    parallel = list(iter_pages(sample_pdf, max_workers=2, pages_per_task=5, min_pages_for_pool=1))
+
+    assert [doc.page_content for doc in parallel] == [doc.page_content for doc in serial]
+    assert [doc.metadata["page"] for doc in parallel] == list(range(12))
+    assert "me@example.com" not in parallel[0].page_content
+    assert "page number 3" in parallel[3].page_content
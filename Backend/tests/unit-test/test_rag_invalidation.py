@@ -0,0 +1,22 @@
+from unittest.mock import MagicMock
+
+from app.services.cache_versions import bump_generation
+from app.services.rag_service import rag_service
+
+
+def test_reindex_in_another_process_evicts_api_handles(monkeypatch, fake_redis, wait_for):
+    monkeypatch.setattr(rag_service, "sync_redis_client", fake_redis)
+    monkeypatch.setattr(rag_service, "invalidation_listener", None)
+    rag_service._ensure_invalidation_listener()
+    wait_for(lambda: rag_service.invalidations_subscribed)
+
+    rag_service.vectorstores.put(rag_service._collection_name(1), MagicMock())
+    rag_service.passages.put((1, 0, "locking", 5), MagicMock())
+    rag_service.passages.put((2, 0, "locking", 5), MagicMock())
+
+    bump_generation(fake_redis, 1)  # what the index worker does after reindexing book 1
+    wait_for(lambda: (1, 0, "locking", 5) not in rag_service.passages)
+
+    assert rag_service._collection_name(1) not in rag_service.vectorstores
+    assert (2, 0, "locking", 5) in rag_service.passages
+    rag_service.passages.clear()
@@ -0,0 +1,41 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+
+from app.services.semantic_cache import SemanticCache, best_match
+
+
+def _vector(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_best_match_picks_most_similar_question():
+    stored = {b"normalization": _vector(1, 0, 0).tobytes(), b"locking": _vector(0, 1, 0).tobytes()}
+
+    field, similarity = best_match(list(_vector(0.95, 0.1, 0)), stored)
+
+    assert field == b"normalization"
+    assert similarity > 0.99
+
+
+def test_best_match_ignores_vectors_of_another_model():
+    assert best_match([0.1, 0.2], {b"q": _vector(1, 0, 0).tobytes()}) == (None, 0.0)
+
+
+def test_lookup_returns_answer_only_above_threshold():
+    redis_client = MagicMock(
+        hgetall=AsyncMock(return_value={b"q": _vector(1, 0, 0).tobytes()}),
+        hget=AsyncMock(return_value=json.dumps({"question": "What is normalization?", "answer": "..."})),
+        hincrby=AsyncMock()
+    )
+    cache = SemanticCache(redis_client, threshold=0.95)
+
+    hit = asyncio.run(cache.lookup(1, 5, list(_vector(1, 0.05, 0))))
+    miss = asyncio.run(cache.lookup(1, 5, list(_vector(1, 1, 0))))
+
+    assert hit["question"] == "What is normalization?" and hit["semantic_similarity"] >= 0.95
+    assert miss is None
+    assert [c.args[1] for c in redis_client.hincrby.call_args_list] == ["hits", "misses"]
@@ -0,0 +1,27 @@
+import chromadb
+
+from app.services.vector_migration import migrate_to_single_collection
+
+
+def test_per_book_collections_move_into_library_collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    for book_id, chunks in [(1, 3), (2, 2)]:
+        collection = client.get_or_create_collection(f"book_{book_id}")
+        collection.add(
+            ids=[f"book_{book_id}_{i}" for i in range(chunks)],
+            embeddings=[[float(book_id), float(i), 1.0] for i in range(chunks)],
+            documents=[f"book {book_id} chunk {i}" for i in range(chunks)],
+            metadatas=[{"page": i} for i in range(chunks)]
+        )
+    client.get_or_create_collection("unrelated")
+
+    result = migrate_to_single_collection(client, "library", batch_size=2, delete_source=True)
+
+    library = client.get_collection("library")
+    assert result == {"books": 2, "chunks": 5}
+    assert library.count() == 5
+    book_two = library.get(where={"book_id": 2}, include=["metadatas", "embeddings"])
+    assert sorted(book_two["ids"]) == ["book_2_0", "book_2_1"]
+    assert all(metadata["page"] in (0, 1) for metadata in book_two["metadatas"])
+    names = {getattr(c, "name", c) for c in client.list_collections()}
+    assert names == {"library", "unrelated"}
@@ -0,0 +1,25 @@
+"""Background worker for queued RAG indexing jobs.
+
+Run one or more alongside the API server:
+  python worker.py            # poll forever
+  python worker.py --once     # drain the queue, then exit
+"""
+
+import argparse
+import logging
+
+from app.services.index_jobs import run_worker
+from app.config.settings import INDEX_WORKER_POLL_INTERVAL
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued RAG indexing jobs")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--poll-interval", type=float, default=INDEX_WORKER_POLL_INTERVAL,
+                        help="Seconds to wait between queue polls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(lineno)d - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    run_worker(poll_interval=args.poll_interval, once=args.once)